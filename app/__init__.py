@@ -5,6 +5,8 @@ import os
 from . import database
 from . import models
 from .blueprints import main
+from .blueprints.main import caching
+from .blueprints.main import slow_requests
 
 def create_app(config_path='config.ini', api='https://api.moalmanac.org', populating: bool = False):
     app = flask.Flask(__name__)
@@ -12,6 +14,7 @@ def create_app(config_path='config.ini', api='https://api.moalmanac.org', popula
 
     config = database.read_config_ini(path=config_path)
     app.config['INI_CONFIG'] = config
+    app.config['CONFIG_MODIFIED'] = os.stat(config_path).st_mtime
     app.config['API_URL'] = api
 
     db_filename = config['app'].get('cache') if populating else 'cache.sqlite3'
@@ -19,6 +22,12 @@ def create_app(config_path='config.ini', api='https://api.moalmanac.org', popula
     models.Base.metadata.create_all(bind=engine)
 
     app.config['SESSION_FACTORY'] = session_factory
+    app.config['CACHE_PATH'] = engine.url.database
+
+    if config.has_section('cache'):
+        caching.configure(config=config['cache'])
+    if config.has_section('slow_requests'):
+        slow_requests.configure(config=config['slow_requests'])
 
     flask_bootstrap.Bootstrap5(app)
     app.register_blueprint(main.main_bp)
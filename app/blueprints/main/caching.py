@@ -0,0 +1,221 @@
+"""
+caching.py
+
+In-process caches scoped to the release of the local cache database.
+
+Content served by the browser only changes when the local cache is repopulated for a new release, so values derived
+from it can be kept for the lifetime of a worker. Each cache is a size-bounded LRU registered by name, and all
+registered caches are cleared when the local cache database is replaced or repopulated. Caches of values that come
+from elsewhere, such as the MOAlmanac API, may also expire entries after a time to live.
+"""
+
+import collections
+import os
+import threading
+import time
+import typing
+
+# Registered caches by name
+caches = {}
+
+_release_lock = threading.Lock()
+_release = {"identity": None, "release": None}
+
+
+class LRUCache:
+    """
+    A size-bounded, least recently used cache that counts hits, misses, and evictions.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float | None = None):
+        """
+        Initializes the LRUCache class.
+
+        Args:
+            name (str): The name of the cache, used when reporting statistics.
+            maxsize (int): The maximum number of entries to keep. A maxsize of 0 disables the cache.
+            ttl (float | None): Seconds after which entries expire, or None to keep entries until they are evicted.
+                Expired entries are counted as evictions.
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = collections.OrderedDict()
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self):
+        """
+        Removes all entries. Statistics are kept.
+        """
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        """
+        Retrieves the value stored for `key`, marking it as recently used.
+
+        Args:
+            key (typing.Hashable): The key to look up.
+            default (typing.Any): The value to return if `key` is not cached.
+
+        Returns:
+            typing.Any: The cached value, or `default`.
+        """
+        with self._lock:
+            if key in self._expires and self._expires[key] <= time.monotonic():
+                del self._data[key]
+                del self._expires[key]
+                self.evictions += 1
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def resize(self, maxsize: int):
+        """
+        Changes the maximum number of entries, evicting the least recently used entries if necessary.
+
+        Args:
+            maxsize (int): The maximum number of entries to keep.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def set(self, key: typing.Hashable, value: typing.Any):
+        """
+        Stores `value` for `key`, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (typing.Hashable): The key to store.
+            value (typing.Any): The value to store.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if self.ttl is not None:
+                self._expires[key] = time.monotonic() + self.ttl
+            self._evict()
+
+    def stats(self) -> dict[str, typing.Any]:
+        """
+        Reports the cache's size and usage.
+
+        Returns:
+            dict[str, typing.Any]: The cache's name, size, maxsize, time to live, hits, misses, evictions, and hit
+                rate.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+    def _evict(self):
+        while len(self._data) > max(self.maxsize, 0):
+            key, _ = self._data.popitem(last=False)
+            self._expires.pop(key, None)
+            self.evictions += 1
+
+
+def check_release(path: str, load_release: typing.Callable[[], str]) -> str:
+    """
+    Returns the release of the local cache database, clearing all registered caches if the database has changed
+    since the last call. The database's identity is taken from the file it resolves to, so switching instances,
+    repopulating, or replacing the file are all detected without querying it.
+
+    Args:
+        path (str): Path to the local cache database.
+        load_release (typing.Callable[[], str]): Returns the release recorded in the local cache database.
+
+    Returns:
+        str: The release of the local cache database.
+    """
+    stat = os.stat(path)
+    identity = (os.path.realpath(path), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _release_lock:
+        if identity != _release["identity"]:
+            release = load_release()
+            for cache in caches.values():
+                cache.clear()
+            _release["identity"] = identity
+            _release["release"] = release
+        return _release["release"]
+
+
+def current_identity() -> tuple | None:
+    """
+    Returns the identity of the local cache database recorded by the most recent call to check_release.
+
+    Returns:
+        tuple | None: The database's resolved path, inode, size, and modification time in nanoseconds, or None if
+            check_release has not been called.
+    """
+    return _release["identity"]
+
+
+def current_release() -> str | None:
+    """
+    Returns the release recorded by the most recent call to check_release.
+
+    Returns:
+        str | None: The release of the local cache database, or None if check_release has not been called.
+    """
+    return _release["release"]
+
+
+def configure(config: typing.Mapping[str, str]):
+    """
+    Sets the size of registered caches from the `cache` section of the instance's config.ini.
+
+    Args:
+        config (typing.Mapping[str, str]): The `cache` section of the config, mapping cache names to sizes.
+    """
+    for name, cache in caches.items():
+        if name in config:
+            cache.resize(maxsize=int(config[name]))
+
+
+def register(name: str, maxsize: int, ttl: float | None = None) -> LRUCache:
+    """
+    Creates a named cache that is cleared whenever the local cache database changes.
+
+    Args:
+        name (str): The name of the cache.
+        maxsize (int): The default maximum number of entries, which may be overridden in config.ini.
+        ttl (float | None): Seconds after which entries expire, or None to keep entries until they are evicted.
+
+    Returns:
+        LRUCache: The registered cache.
+    """
+    cache = LRUCache(name=name, maxsize=maxsize, ttl=ttl)
+    caches[name] = cache
+    return cache
+
+
+def stats() -> list[dict[str, typing.Any]]:
+    """
+    Reports the size and usage of all registered caches.
+
+    Returns:
+        list[dict[str, typing.Any]]: Statistics for each registered cache, ordered by name.
+    """
+    return [caches[name].stats() for name in sorted(caches)]
@@ -0,0 +1,204 @@
+"""
+compression.py
+
+Compresses responses with brotli, if the optional brotli package is installed, or gzip, whichever the client accepts.
+
+Only responses whose content type is in COMPRESSIBLE_MIMETYPES are compressed, and small responses are sent as is
+since compression would gain little. Streamed pages are compressed chunk by chunk, so compression does not delay
+the first bytes of the page. Compressed bodies of responses with an ETag are cached for the release, so a fragment or
+record requested repeatedly is compressed once. Static files are sent from the `.br` or `.gz` siblings written by
+`python -m app.precompress` when they exist, rather than being compressed per request.
+"""
+
+import flask
+import gzip
+import os
+import werkzeug
+import zlib
+
+from werkzeug.security import safe_join
+
+from . import caching
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = (
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+    "text/css",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+)
+
+# Responses smaller than this many bytes are not compressed
+MINIMUM_SIZE = 1024
+
+# Compression levels for responses compressed per request. Precompressed files use the maximum levels.
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+
+# File extensions of precompressed siblings, by encoding in order of preference
+EXTENSIONS = {"br": "br", "gzip": "gz"}
+
+# Endpoints whose compressed bodies are not cached, since their bodies are specific to each request, e.g. tables echo
+# the draw counter of each DataTables request and are rarely requested twice
+UNCACHED_ENDPOINTS = ("main.tables",)
+
+compressed_responses = caching.register(name="compressed_responses", maxsize=500)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compresses a response body.
+
+    Args:
+        data (bytes): The body to compress.
+        encoding (str): The content coding to use, `br` or `gzip`.
+
+    Returns:
+        bytes: The compressed body.
+    """
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response: werkzeug.Response) -> werkzeug.Response:
+    """
+    Compresses a response, if its content type is compressible and the client accepts a supported encoding.
+
+    Args:
+        response (werkzeug.Response): The response to the current request.
+
+    Returns:
+        werkzeug.Response: The compressed response, or `response` if it should not be compressed.
+    """
+    if flask.request.endpoint == "static":
+        return send_precompressed(response=response)
+    if response.status_code == 304 and response.get_etag()[0]:
+        response.vary.add("Accept-Encoding")
+        return response
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate()
+    if encoding is None:
+        return response
+
+    etag, weak = response.get_etag()
+    if response.is_streamed:
+        response.response = compress_stream(chunks=response.response, encoding=encoding, charset="utf-8")
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < MINIMUM_SIZE:
+            return response
+        key = (etag, encoding)
+        cacheable = etag and not weak and flask.request.endpoint not in UNCACHED_ENDPOINTS
+        compressed = compressed_responses.get(key) if cacheable else None
+        if compressed is None:
+            compressed = compress(data=data, encoding=encoding)
+            if cacheable:
+                compressed_responses.set(key, compressed)
+        response.set_data(compressed)
+
+    response.headers["Content-Encoding"] = encoding
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
+
+
+def compress_stream(chunks, encoding: str, charset: str):
+    """
+    Compresses a streamed response chunk by chunk, flushing after each chunk so that the client receives output as
+    soon as it is rendered.
+
+    Args:
+        chunks (Iterable[str | bytes]): The response's chunks.
+        encoding (str): The content coding to use, `br` or `gzip`.
+        charset (str): The charset used to encode text chunks.
+
+    Returns:
+        Iterator[bytes]: Compressed chunks.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = chunk.encode(charset) if isinstance(chunk, str) else chunk
+            yield compressor.process(data) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = chunk.encode(charset) if isinstance(chunk, str) else chunk
+            yield compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def negotiate() -> str | None:
+    """
+    Selects the content coding for the current request from its Accept-Encoding header.
+
+    Returns:
+        str | None: `br` if brotli is installed and accepted, otherwise `gzip` if accepted, otherwise None.
+    """
+    accepted = flask.request.accept_encodings
+    if brotli is not None and accepted["br"] > 0:
+        return "br"
+    if accepted["gzip"] > 0:
+        return "gzip"
+    return None
+
+
+def send_precompressed(response: werkzeug.Response) -> werkzeug.Response:
+    """
+    Replaces a static file response with its precompressed sibling, if one is accepted and up to date. Encodings are
+    tried in the order of EXTENSIONS, so a `.gz` sibling is sent if the `.br` sibling is missing or stale. Sending a
+    `.br` sibling does not require the brotli package.
+
+    Args:
+        response (werkzeug.Response): The response to a request for a static file.
+
+    Returns:
+        werkzeug.Response: The sibling's response, or `response` if there is no usable sibling.
+    """
+    if response.status_code != 200 or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+    path = safe_join(flask.current_app.static_folder, flask.request.view_args["filename"])
+    if path is None:
+        return response
+
+    accepted = flask.request.accept_encodings
+    for encoding, extension in EXTENSIONS.items():
+        sibling = f"{path}.{extension}"
+        if (
+            accepted[encoding] > 0
+            and os.path.isfile(sibling)
+            and os.stat(sibling).st_mtime >= os.stat(path).st_mtime
+        ):
+            break
+    else:
+        return response
+
+    response.close()
+    precompressed = flask.send_file(
+        sibling,
+        mimetype=response.mimetype,
+        max_age=flask.current_app.get_send_file_max_age(path),
+        conditional=True,
+    )
+    precompressed.headers["Content-Encoding"] = encoding
+    precompressed.vary.add("Accept-Encoding")
+    return precompressed
@@ -0,0 +1,210 @@
+"""
+conditional.py
+
+Conditional GET support for responses that only change when the local cache database, the instance's config, or the
+app itself changes.
+
+Each GET request is given a strong ETag computed from the release and identity of the local cache database, the
+instance's config, a digest of the app's code, templates, and static files, and the request's path and query string
+less the parameters in IGNORED_ARGS. Requests whose If-None-Match header matches, or whose If-Modified-Since header
+matches in its absence, are answered with 304 Not Modified before the route's view function runs, so revalidating a
+page costs no queries against the local cache or the API.
+"""
+
+import datetime
+import flask
+import functools
+import hashlib
+import os
+import werkzeug
+import werkzeug.datastructures
+
+from . import caching
+from . import compression
+
+# Directories whose files affect rendered responses, relative to the app package. Compressed siblings written by
+# app.precompress are excluded, since they are derived from the files beside them.
+APP_INPUTS = ("blueprints", "templates", "static")
+PRECOMPRESSED_EXTENSIONS = (".br", ".gz")
+
+# Cache-Control policies by endpoint. Pages are revalidated after a few minutes so that new releases are picked up
+# promptly, while tables, fragments, and records loaded by pages are cached for longer.
+CACHE_CONTROL_DEFAULT = "public, max-age=300"
+CACHE_CONTROL = {
+    "main.proposition_tables": "public, max-age=3600",
+    "main.statements_raw": "public, max-age=3600",
+    "main.tables": "public, max-age=3600",
+}
+
+# Query parameters that are left out of ETags: jQuery's `_` cache-busting timestamp, and DataTables' `draw` counter,
+# which tables only echo back. A response's ETag is only compared with those of earlier responses to the same URL,
+# so responses that differ only in the echoed counter can share one.
+IGNORED_ARGS = ("_", "draw")
+
+# Endpoints that are not given ETags and are never cached, e.g. because they report the state of the process
+UNCACHED_ENDPOINTS = ("main.export_metrics", "main.status_caches")
+
+
+@functools.cache
+def app_digest() -> tuple[str, float]:
+    """
+    Computes a digest of the app's code, templates, and static files, and the time the newest of them was modified.
+    Computed once per process, since these files only change when the app is redeployed.
+
+    Returns:
+        tuple[str, float]: The hex digest of the app's files, and the latest modification time as a timestamp.
+    """
+    app_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    digest = hashlib.sha256()
+    modified = 0.0
+    for directory in APP_INPUTS:
+        for root, dirs, files in os.walk(os.path.join(app_root, directory)):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for name in sorted(files):
+                if name.endswith(PRECOMPRESSED_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, app_root).encode())
+                with open(path, "rb") as fp:
+                    digest.update(hashlib.sha256(fp.read()).digest())
+                modified = max(modified, os.stat(path).st_mtime)
+    return digest.hexdigest(), modified
+
+
+def compute_etag() -> str:
+    """
+    Computes the strong ETag of the current request's response.
+
+    Returns:
+        str: The ETag, without quotes.
+    """
+    app = flask.current_app
+    config = app.config["INI_CONFIG"]
+    digest = hashlib.sha256()
+    for part in (
+        caching.current_release(),
+        repr(caching.current_identity()),
+        repr([(section, sorted(config[section].items())) for section in config.sections()]),
+        app.config["API_URL"],
+        app_digest()[0],
+        flask.request.path,
+        repr(sorted((key, value) for key, value in flask.request.args.items(multi=True) if key not in IGNORED_ARGS)),
+    ):
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def is_cacheable() -> bool:
+    """
+    Reports whether the current request may be answered conditionally.
+
+    Returns:
+        bool: True for GET and HEAD requests to the blueprint's endpoints, other than those in UNCACHED_ENDPOINTS.
+    """
+    request = flask.request
+    return (
+        request.method in ("GET", "HEAD")
+        and request.blueprint == "main"
+        and request.endpoint not in UNCACHED_ENDPOINTS
+    )
+
+
+def last_modified() -> datetime.datetime:
+    """
+    Returns the time the current request's response last changed: when the local cache database, the instance's
+    config, or the app's files were last modified, whichever is latest.
+
+    Returns:
+        datetime.datetime: The modification time in UTC, truncated to seconds as in HTTP dates.
+    """
+    identity = caching.current_identity()
+    modified = max(
+        identity[-1] / 1e9 if identity else 0.0,
+        flask.current_app.config.get("CONFIG_MODIFIED", 0.0),
+        app_digest()[1],
+    )
+    return datetime.datetime.fromtimestamp(int(modified), tz=datetime.timezone.utc)
+
+
+def match_etag(etags: werkzeug.datastructures.ETags, etag: str) -> str | None:
+    """
+    Finds the tag in an If-None-Match header that matches an ETag. compression.compress_response suffixes the ETags
+    of compressed representations with their content coding, so a suffixed tag only matches if the current request
+    would be sent that coding.
+
+    Args:
+        etags (werkzeug.datastructures.ETags): The tags from the request's If-None-Match header.
+        etag (str): The ETag of the current request's response.
+
+    Returns:
+        str | None: The matching tag, or None if no tag matches.
+    """
+    if etags.star_tag:
+        return etag
+    encoding = compression.negotiate()
+    accepted = (etag, f"{etag}-{encoding}") if encoding else (etag,)
+    for tag in etags:
+        if tag in accepted:
+            return tag
+    return None
+
+
+def not_modified() -> werkzeug.Response | None:
+    """
+    Answers the current request with 304 Not Modified if the client's cached copy is current. Must run after the
+    release of the local cache database has been checked.
+
+    Returns:
+        werkzeug.Response | None: A 304 response, or None if the request should be handled by its view function.
+    """
+    if not is_cacheable():
+        return None
+
+    request = flask.request
+    etag = compute_etag()
+    modified = last_modified()
+    flask.g.etag = etag
+    flask.g.last_modified = modified
+
+    # If-Modified-Since is only evaluated when If-None-Match is absent (RFC 9110, section 13.2.2)
+    if "If-None-Match" in request.headers:
+        matched = match_etag(etags=request.if_none_match, etag=etag)
+        flask.g.matched_etag = matched
+    else:
+        matched = request.if_modified_since is not None and request.if_modified_since >= modified
+    if not matched:
+        return None
+
+    response = flask.current_app.response_class(status=304)
+    set_headers(response=response)
+    return response
+
+
+def set_headers(response: werkzeug.Response) -> werkzeug.Response:
+    """
+    Sets ETag, Last-Modified, and Cache-Control headers on a response to a GET or HEAD request.
+
+    Args:
+        response (werkzeug.Response): The response to the current request.
+
+    Returns:
+        werkzeug.Response: The response.
+    """
+    request = flask.request
+    if request.method not in ("GET", "HEAD") or request.blueprint != "main":
+        return response
+    if request.endpoint in UNCACHED_ENDPOINTS:
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    etag = flask.g.get("etag")
+    if etag is None or response.status_code not in (200, 304):
+        return response
+
+    if response.status_code == 304 and flask.g.get("matched_etag"):
+        etag = flask.g.matched_etag
+    response.set_etag(etag)
+    response.last_modified = flask.g.last_modified
+    response.headers["Cache-Control"] = CACHE_CONTROL.get(request.endpoint, CACHE_CONTROL_DEFAULT)
+    return response
@@ -9,18 +9,99 @@ import sqlalchemy
 import typing
 
 from app import models
+from . import timing
 
 class BaseHandler:
     """
     A base class for handling SQL queries. This class provides common functionality for managing SQL queries and serves
     as a template for specific Handler classes, which inherit from BaseHandler and implement route-specific logic.
+
+    Handlers used for server-side tables declare which columns may be sorted on (`columns`), which columns are matched
+    by the free-text search (`search_columns`), and how each facet restricts the query (`facets`).
     """
+    columns: dict[str, sqlalchemy.ColumnElement] = {}
+    search_columns: list[sqlalchemy.ColumnElement] = []
+    facets: dict[str, typing.Callable[[list[str]], sqlalchemy.ColumnElement]] = {}
+
     def __init__(self):
         """
         Initializes the BaseHandler class.
         """
         pass
 
+    @classmethod
+    def apply_facets(cls, statement: sqlalchemy.Select, facets: dict[str, list[str]]) -> sqlalchemy.Select:
+        """
+        Restricts the statement by each facet declared on the handler. Facets without values, or that the handler
+        does not declare, are ignored.
+
+        Args:
+            statement (sqlalchemy.Select): The select statement to restrict.
+            facets (dict[str, list[str]]): Facet names and the values selected for each.
+
+        Returns:
+            sqlalchemy.Select: The restricted select statement.
+        """
+        for name, values in facets.items():
+            if values and name in cls.facets:
+                statement = statement.where(cls.facets[name](values))
+        return statement
+
+    @classmethod
+    def apply_order(cls, statement: sqlalchemy.Select, order: list[tuple[str, str]]) -> sqlalchemy.Select:
+        """
+        Orders the statement by the requested columns. Column names that the handler does not declare as sortable
+        are ignored.
+
+        Args:
+            statement (sqlalchemy.Select): The select statement to order.
+            order (list[tuple[str, str]]): Pairs of column name and direction, either `asc` or `desc`.
+
+        Returns:
+            sqlalchemy.Select: The ordered select statement.
+        """
+        for name, direction in order:
+            column = cls.columns.get(name)
+            if column is None:
+                continue
+            statement = statement.order_by(column.desc() if direction == "desc" else column.asc())
+        return statement
+
+    @staticmethod
+    def apply_paging(statement: sqlalchemy.Select, start: int, length: int) -> sqlalchemy.Select:
+        """
+        Limits the statement to one page of results. A negative length returns all results after `start`.
+
+        Args:
+            statement (sqlalchemy.Select): The select statement to page.
+            start (int): The index of the first record to return.
+            length (int): The number of records to return.
+
+        Returns:
+            sqlalchemy.Select: The paged select statement.
+        """
+        statement = statement.offset(start)
+        if length >= 0:
+            statement = statement.limit(length)
+        return statement
+
+    @classmethod
+    def apply_search(cls, statement: sqlalchemy.Select, value: str) -> sqlalchemy.Select:
+        """
+        Restricts the statement to records where any of the handler's search columns contain `value`.
+
+        Args:
+            statement (sqlalchemy.Select): The select statement to restrict.
+            value (str): The free-text search value.
+
+        Returns:
+            sqlalchemy.Select: The restricted select statement.
+        """
+        if not value or not cls.search_columns:
+            return statement
+        clauses = [column.contains(value, autoescape=True) for column in cls.search_columns]
+        return statement.where(sqlalchemy.or_(*clauses))
+
     @staticmethod
     def construct_base_query(model: models.Base) -> sqlalchemy.Select:
         """
@@ -51,6 +132,21 @@ class BaseHandler:
             raise ValueError(f"Input value not of type datetime.date: {value}")
 
 
+    @staticmethod
+    def count_query(session: sqlalchemy.orm.Session, statement: sqlalchemy.Select) -> int:
+        """
+        Counts the records that the given select statement would return.
+
+        Args:
+            session (sqlalchemy.orm.Session): A session instance.
+            statement (sqlalchemy.Select): The select statement to count.
+
+        Returns:
+            int: The number of records.
+        """
+        count = sqlalchemy.select(sqlalchemy.func.count()).select_from(statement.order_by(None).subquery())
+        return session.execute(statement=count).scalar_one()
+
     @staticmethod
     def execute_query(session: sqlalchemy.orm.Session, statement: sqlalchemy.sql.Executable) -> list[models.Base]:
         """
@@ -63,13 +159,15 @@ class BaseHandler:
         Returns:
             list[model.Base]: A list of SQLAlchemy model instances returned by the query.
         """
-        return (
+        records = (
             session
             .execute(statement=statement)
             .unique()
             .scalars()
             .all()
         )
+        timing.record_rows(rows=len(records))
+        return records
 
     @classmethod
     def serialize_instances(cls, instances: list[models.Base], **kwargs) -> list[dict[str, typing.Any]]:
@@ -155,6 +253,16 @@ class Biomarkers(BaseHandler):
     """
     Handler class to manage queries against the Biomarker table.
     """
+    columns = {
+        "name": models.Biomarkers.name,
+        "type": models.Biomarkers.type,
+        "propositions_count": models.Biomarkers.propositions_count,
+        "statements_count": models.Biomarkers.statements_count,
+    }
+    search_columns = [models.Biomarkers.name, models.Biomarkers.type]
+    facets = {
+        "biomarker_type": lambda values: models.Biomarkers.type.in_(values),
+    }
 
 
 class Diseases(BaseHandler):
@@ -167,7 +275,21 @@ class Documents(BaseHandler):
     """
     Handler class to manage queries against the About table.
     """
-
+    columns = {
+        "name": models.Documents.name,
+        "indications_count": models.Documents.indications_count,
+        "statements_count": models.Documents.statements_count,
+    }
+    search_columns = [models.Documents.name, models.Documents.agent_name]
+    facets = {
+        "organization": lambda values: models.Documents.agent_id.in_(values),
+    }
+
+
+class Facets(BaseHandler):
+    """
+    Handler class to manage queries against the Facets table.
+    """
 
 class Genes(BaseHandler):
     """
@@ -178,6 +300,120 @@ class Indications(BaseHandler):
     """
     Handler class to manage queries against the Indications table.
     """
+    columns = {
+        "document_name": models.Indications.document_name,
+        "indication": models.Indications.indication,
+        "statements_count": models.Indications.statements_count,
+    }
+    search_columns = [models.Indications.document_name, models.Indications.indication]
+    facets = {
+        "organization": lambda values: models.Indications.agent_id.in_(values),
+    }
+
+
+def match_names(column: sqlalchemy.ColumnElement, values: list[str]) -> sqlalchemy.ColumnElement:
+    """
+    Matches records whose JSON column, a list of objects with a `name` key, names any of `values`.
+
+    Args:
+        column (sqlalchemy.ColumnElement): A JSON column containing a list of objects with `id` and `name` keys.
+        values (list[str]): Names to match.
+
+    Returns:
+        sqlalchemy.ColumnElement: A clause that is true if any object in `column` is named in `values`.
+    """
+    elements = sqlalchemy.func.json_each(column).table_valued("value")
+    return sqlalchemy.exists(
+        sqlalchemy
+        .select(1)
+        .select_from(elements)
+        .where(sqlalchemy.func.json_extract(elements.c.value, "$.name").in_(values))
+    )
+
+
+def match_organizations(values: list[str]) -> sqlalchemy.ColumnElement:
+    """
+    Matches propositions supported by a statement from any of the organizations in `values`, using the
+    organization to proposition mapping computed when the cache was populated.
+
+    Args:
+        values (list[str]): Agent ids to match.
+
+    Returns:
+        sqlalchemy.ColumnElement: A clause that is true for propositions of any organization in `values`.
+    """
+    return models.Propositions.id.in_(
+        sqlalchemy
+        .select(models.OrganizationPropositions.proposition_id)
+        .where(models.OrganizationPropositions.agent_id.in_(values))
+    )
+
+
+class Propositions(BaseHandler):
+    """
+    Handler class to manage queries against the Propositions table.
+    """
+    columns = {
+        "id": models.Propositions.id,
+        "predicate": models.Propositions.predicate,
+        "biomarkers": models.Propositions.biomarker_names,
+        "cancer_type": models.Propositions.cancer_type_name,
+        "therapies": models.Propositions.therapy_names,
+        "statements_count": models.Propositions.statements_count,
+    }
+    search_columns = [
+        models.Propositions.biomarker_names,
+        models.Propositions.cancer_type_name,
+        models.Propositions.therapy_names,
+    ]
+    facets = {
+        "biomarker": lambda values: match_names(column=models.Propositions.biomarkers, values=values),
+        "disease": lambda values: models.Propositions.cancer_type_name.in_(values),
+        "gene": lambda values: match_names(column=models.Propositions.genes, values=values),
+        "organization": lambda values: match_organizations(values=values),
+        "therapy": lambda values: match_names(column=models.Propositions.therapies, values=values),
+    }
+
+
+class Statements(BaseHandler):
+    """
+    Handler class to manage queries against the Statements table. Statements are joined to their proposition so that
+    they can be sorted and searched by its biomarkers, cancer type, and therapies.
+    """
+    columns = {
+        "id": models.Statements.id,
+        "predicate": models.Propositions.predicate,
+        "biomarkers": models.Propositions.biomarker_names,
+        "cancer_type": models.Propositions.cancer_type_name,
+        "therapies": models.Propositions.therapy_names,
+        "organization": models.Statements.agent_id,
+    }
+    search_columns = [
+        models.Statements.description,
+        models.Propositions.biomarker_names,
+        models.Propositions.cancer_type_name,
+        models.Propositions.therapy_names,
+    ]
+    facets = {
+        "organization": lambda values: models.Statements.agent_id.in_(values),
+    }
+
+    @staticmethod
+    def construct_base_query(model: models.Statements) -> sqlalchemy.Select:
+        """
+        Constructs a select statement for the Statements table joined to the Propositions table.
+
+        Args:
+            model (models.Statements): The SQLAlchemy model class representing the table.
+
+        Returns:
+            Select: A SQLAlchemy select statement for the provided `model`.
+        """
+        return (
+            sqlalchemy
+            .select(model)
+            .join(models.Propositions, model.proposition_id == models.Propositions.id)
+        )
 
 class Terms(BaseHandler):
     """
@@ -188,3 +424,13 @@ class Therapies(BaseHandler):
     """
     Handler class to manage queries against the Therapies table.
     """
+    columns = {
+        "name": models.Therapies.name,
+        "therapy_type": models.Therapies.therapy_type,
+        "propositions_count": models.Therapies.propositions_count,
+        "statements_count": models.Therapies.statements_count,
+    }
+    search_columns = [models.Therapies.name, models.Therapies.therapy_type]
+    facets = {
+        "therapy_type": lambda values: models.Therapies.therapy_type.in_(values),
+    }
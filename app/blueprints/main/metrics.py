@@ -0,0 +1,191 @@
+"""
+metrics.py
+
+Prometheus metrics for the browser, served at /metrics: request latency by route, MOAlmanac API request latency and
+errors by API endpoint, local cache database query latency, in-process cache hits, misses, and evictions, and the
+resident memory of each worker.
+
+Gunicorn serves the browser from several worker processes, each with its own metrics. When the
+PROMETHEUS_MULTIPROC_DIR environment variable names a directory, workers write their metrics to files in it and
+/metrics aggregates the files of all workers. The directory must be emptied before gunicorn starts, which the
+RuntimeDirectory of the systemd service does, and gunicorn.conf.py removes the files of workers that exit. Without
+the variable, e.g. when running run.py for development, /metrics reports the serving process only.
+"""
+
+import flask
+import os
+import prometheus_client
+import sqlalchemy
+import threading
+import time
+import werkzeug
+
+from prometheus_client import multiprocess
+
+from . import caching
+from . import timing
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+request_duration = prometheus_client.Histogram(
+    "moalmanac_request_duration_seconds",
+    "Time to render and send responses, by route",
+    ["endpoint", "method"],
+    buckets=REQUEST_BUCKETS,
+)
+requests_total = prometheus_client.Counter(
+    "moalmanac_requests",
+    "Responses sent, by route and status code",
+    ["endpoint", "method", "status"],
+)
+upstream_duration = prometheus_client.Histogram(
+    "moalmanac_upstream_request_duration_seconds",
+    "Time to receive responses from the MOAlmanac API, by API endpoint",
+    ["endpoint"],
+    buckets=REQUEST_BUCKETS,
+)
+upstream_errors = prometheus_client.Counter(
+    "moalmanac_upstream_errors",
+    "MOAlmanac API requests that failed or returned an error status, by API endpoint",
+    ["endpoint"],
+)
+query_duration = prometheus_client.Histogram(
+    "moalmanac_sqlite_query_duration_seconds",
+    "Time to execute queries against the local cache database, by statement type",
+    ["operation"],
+    buckets=QUERY_BUCKETS,
+)
+cache_hits = prometheus_client.Counter("moalmanac_cache_hits", "In-process cache hits", ["cache"])
+cache_misses = prometheus_client.Counter("moalmanac_cache_misses", "In-process cache misses", ["cache"])
+cache_evictions = prometheus_client.Counter("moalmanac_cache_evictions", "In-process cache evictions", ["cache"])
+cache_entries = prometheus_client.Gauge(
+    "moalmanac_cache_entries", "Entries in in-process caches", ["cache"], multiprocess_mode="livesum"
+)
+worker_rss = prometheus_client.Gauge(
+    "moalmanac_worker_resident_memory_bytes", "Resident memory of each worker process", multiprocess_mode="liveall"
+)
+
+# Cache statistics already exported by this process, by cache name, so that counters are incremented by the change
+_exported_cache_stats = {}
+_exported_cache_stats_lock = threading.Lock()
+
+
+def collect() -> bytes:
+    """
+    Collects the metrics of all worker processes in the Prometheus text format.
+
+    Returns:
+        bytes: The metrics.
+    """
+    update_process_metrics()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry)
+
+
+def finish_request(response: werkzeug.Response) -> werkzeug.Response:
+    """
+    Records the current request's latency and status once its response has been sent, and updates the process's
+    cache and memory metrics.
+
+    Args:
+        response (werkzeug.Response): The response to the current request.
+
+    Returns:
+        werkzeug.Response: The response.
+    """
+    timings = timing.current()
+    if timings is None:
+        return response
+
+    request = flask.request
+    endpoint = request.endpoint or "unmatched"
+    method = request.method
+    status = str(response.status_code)
+
+    def observe():
+        request_duration.labels(endpoint=endpoint, method=method).observe(timings.finish())
+        requests_total.labels(endpoint=endpoint, method=method, status=status).inc()
+
+    response.call_on_close(observe)
+    update_process_metrics()
+    return response
+
+
+def get_resident_memory() -> int | None:
+    """
+    Returns the resident memory of the current process.
+
+    Returns:
+        int | None: Resident memory in bytes, or None if it cannot be read from /proc, i.e. on platforms other than
+            Linux.
+    """
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def observe_query(conn, cursor, statement, parameters, context, executemany):
+    """
+    Records the latency of a query against the local cache database, and the query in the current request's timings.
+    Registered as a SQLAlchemy after_cursor_execute listener, timed from the start time stored by start_query.
+    """
+    start_times = conn.info.get("query_start_times")
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+    parts = statement.split(None, 1)
+    operation = parts[0].upper() if parts else "UNKNOWN"
+    query_duration.labels(operation=operation).observe(elapsed)
+    timing.record_query(statement=statement, seconds=elapsed)
+
+
+def observe_upstream(endpoint: str, seconds: float, status_code: int | None):
+    """
+    Records a request to the MOAlmanac API.
+
+    Args:
+        endpoint (str): The API endpoint requested, e.g. statements.
+        seconds (float): The time taken to receive the response.
+        status_code (int | None): The response's status code, or None if the request failed.
+    """
+    upstream_duration.labels(endpoint=endpoint).observe(seconds)
+    if status_code is None or status_code >= 400:
+        upstream_errors.labels(endpoint=endpoint).inc()
+
+
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    """
+    Stores the start time of a query against the local cache database. Registered as a SQLAlchemy
+    before_cursor_execute listener.
+    """
+    conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+
+def update_process_metrics():
+    """
+    Updates the in-process cache counters with the change in each cache's statistics since they were last exported,
+    and the process's resident memory.
+    """
+    with _exported_cache_stats_lock:
+        for name, cache in caching.caches.items():
+            stats = cache.stats()
+            previous = _exported_cache_stats.get(name, {"hits": 0, "misses": 0, "evictions": 0})
+            for counter, field in ((cache_hits, "hits"), (cache_misses, "misses"), (cache_evictions, "evictions")):
+                if stats[field] > previous[field]:
+                    counter.labels(cache=name).inc(stats[field] - previous[field])
+            cache_entries.labels(cache=name).set(stats["size"])
+            _exported_cache_stats[name] = stats
+    resident_memory = get_resident_memory()
+    if resident_memory is not None:
+        worker_rss.set(resident_memory)
+
+
+sqlalchemy.event.listen(sqlalchemy.engine.Engine, "before_cursor_execute", start_query)
+sqlalchemy.event.listen(sqlalchemy.engine.Engine, "after_cursor_execute", observe_query)
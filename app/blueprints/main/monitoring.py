@@ -0,0 +1,65 @@
+"""
+monitoring.py
+
+Restricts endpoints that report the state of the process, `/metrics` and `/status/caches`, to the client addresses
+allowed by the `monitoring` section of the instance's config.ini, or to loopback addresses if it has none. nginx
+applies the same restriction when deployed, so this protects the endpoints when the app is served some other way,
+e.g. with `flask run`.
+
+Gunicorn receives requests from nginx on a unix socket, which gives them no client address of their own. For those
+requests, the address nginx sets in the X-Real-IP header is checked instead. nginx overwrites that header rather than
+forwarding it, so clients cannot choose it.
+"""
+
+import flask
+import ipaddress
+
+# Client addresses, or networks, allowed when config.ini has no monitoring section
+DEFAULT_ALLOW = "127.0.0.1, ::1"
+
+
+def client_address(request: flask.Request) -> ipaddress.IPv4Address | ipaddress.IPv6Address | None:
+    """
+    Returns the address of the client that sent a request.
+
+    Args:
+        request (flask.Request): The request.
+
+    Returns:
+        ipaddress.IPv4Address | ipaddress.IPv6Address | None: The client's address, or None if it is unknown.
+    """
+    for value in (request.remote_addr, request.headers.get("X-Real-IP")):
+        try:
+            return ipaddress.ip_address(value)
+        except ValueError:
+            # Requests received on a unix socket have no address, and are checked by the address nginx passes on
+            continue
+    return None
+
+
+def get_allowed(app: flask.Flask) -> list[ipaddress.IPv4Network | ipaddress.IPv6Network]:
+    """
+    Parses the client addresses allowed to request monitoring endpoints.
+
+    Args:
+        app (flask.Flask): The app.
+
+    Returns:
+        list[ipaddress.IPv4Network | ipaddress.IPv6Network]: The `allow` option of the `monitoring` section of
+            config.ini, a comma separated list of addresses or networks, or loopback addresses by default.
+    """
+    config = app.config["INI_CONFIG"]
+    allow = config["monitoring"].get("allow", DEFAULT_ALLOW) if config.has_section("monitoring") else DEFAULT_ALLOW
+    return [ipaddress.ip_network(value.strip(), strict=False) for value in allow.split(",") if value.strip()]
+
+
+def require_allowed_client():
+    """
+    Responds to the current request with 403 Forbidden unless its client's address is allowed.
+
+    Raises:
+        werkzeug.exceptions.Forbidden: If the client's address is unknown or not allowed.
+    """
+    address = client_address(request=flask.request)
+    if address is None or not any(address in network for network in get_allowed(app=flask.current_app)):
+        flask.abort(403)
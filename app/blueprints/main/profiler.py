@@ -0,0 +1,179 @@
+"""
+profiler.py
+
+Opt-in profiling of single requests, for diagnosing slow pages on development and staging instances without
+attaching external tools to Gunicorn workers.
+
+A request is profiled with cProfile if the `profiling` section of the instance's config.ini enables profiling every
+request, or if its query string has a `profile` parameter signed with the PROFILING_KEY environment variable. Requests
+are never profiled when FLASK_ENV is production. Signatures are an HMAC of the request's path, printed by:
+
+    PROFILING_KEY=... python -m app.blueprints.main.profiler /organizations/fda
+
+Each profiled request writes a .pstats file, readable with the pstats module or e.g. snakeviz, and a .json file with
+the request's phase timings, MOAlmanac API requests, and SQL statements, to the directory named by the `profiling`
+section, data/profiles by default. The files' shared name is returned in the response's X-Profile header. Profiles
+cover streamed pages until their last chunk has been sent.
+"""
+
+import argparse
+import contextvars
+import cProfile
+import datetime
+import flask
+import hashlib
+import hmac
+import json
+import os
+import werkzeug
+
+from . import timing
+
+DEFAULT_DIRECTORY = os.path.join("data", "profiles")
+PARAMETER = "profile"
+
+# The profiler of the current request, if it is being profiled
+_profile = contextvars.ContextVar("profile", default=None)
+
+
+def end_request():
+    """
+    Stops profiling the current request if its response was never finished, e.g. because the view raised.
+    """
+    profile = _profile.get()
+    if profile is not None:
+        profile.disable()
+        _profile.set(None)
+
+
+def finish_request(response: werkzeug.Response) -> werkzeug.Response:
+    """
+    Names the files the current request's profile will be written to in the response's X-Profile header, and writes
+    them once the response has been sent.
+
+    Args:
+        response (werkzeug.Response): The response to the current request.
+
+    Returns:
+        werkzeug.Response: The response.
+    """
+    profile = _profile.get()
+    if profile is None:
+        return response
+    _profile.set(None)
+
+    request = flask.request
+    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    name = f"{timestamp}-{(request.endpoint or 'unmatched').replace('.', '-')}"
+    directory = get_directory(app=flask.current_app)
+    entry = {
+        "method": request.method,
+        "path": request.path,
+        "endpoint": request.endpoint,
+        "view_args": request.view_args,
+        "status": response.status_code,
+    }
+    timings = timing.current()
+
+    def write():
+        profile.disable()
+        if timings is not None:
+            entry["total_ms"] = round(timings.finish() * 1000, 1)
+            entry["phases"] = {
+                phase: {"count": timings.counts[phase], "ms": round(timings.durations[phase] * 1000, 1)}
+                for phase in timing.PHASES
+            }
+            entry["upstream"] = timings.upstream
+            entry["queries"] = timings.queries
+        os.makedirs(directory, exist_ok=True)
+        profile.dump_stats(os.path.join(directory, f"{name}.pstats"))
+        with open(os.path.join(directory, f"{name}.json"), "w") as fp:
+            json.dump(entry, fp, indent=2, default=str)
+
+    response.headers["X-Profile"] = name
+    response.headers["Cache-Control"] = "no-store"
+    response.call_on_close(write)
+    return response
+
+
+def get_directory(app: flask.Flask) -> str:
+    """
+    Returns the directory profiles are written to.
+
+    Args:
+        app (flask.Flask): The current app.
+
+    Returns:
+        str: The `directory` option of the `profiling` section of config.ini, or data/profiles.
+    """
+    config = app.config["INI_CONFIG"]
+    if config.has_section("profiling"):
+        return config["profiling"].get("directory", DEFAULT_DIRECTORY)
+    return DEFAULT_DIRECTORY
+
+
+def is_requested(app: flask.Flask, request: flask.Request) -> bool:
+    """
+    Reports whether a request should be profiled.
+
+    Args:
+        app (flask.Flask): The current app.
+        request (flask.Request): The request.
+
+    Returns:
+        bool: True if the instance is not in production and either profiles every request or the request carries a
+            valid signature.
+    """
+    if os.environ.get("FLASK_ENV") == "production":
+        return False
+    config = app.config["INI_CONFIG"]
+    if config.has_section("profiling") and config["profiling"].getboolean("enabled", fallback=False):
+        return True
+    signature = request.args.get(PARAMETER)
+    key = os.environ.get("PROFILING_KEY")
+    if not signature or not key:
+        return False
+    return hmac.compare_digest(signature, sign(key=key, path=request.path))
+
+
+def sign(key: str, path: str) -> str:
+    """
+    Signs a path, so that requests for it may be profiled.
+
+    Args:
+        key (str): The PROFILING_KEY the app is run with.
+        path (str): The request's path, without its query string, e.g. /organizations/fda.
+
+    Returns:
+        str: The value of the `profile` query parameter.
+    """
+    return hmac.new(key=key.encode(), msg=path.encode(), digestmod=hashlib.sha256).hexdigest()
+
+
+def start_request():
+    """
+    Starts profiling the current request, if it should be profiled.
+    """
+    if not is_requested(app=flask.current_app, request=flask.request):
+        return
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler, e.g. a debugger's, is already active in this thread
+        return
+    _profile.set(profile)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        prog="Sign request profiling",
+        description="Print a path with the query parameter that profiles requests for it, signed with PROFILING_KEY",
+    )
+    arg_parser.add_argument("path", help="Path to profile, e.g. /organizations/fda")
+    args = arg_parser.parse_args()
+
+    profiling_key = os.environ.get("PROFILING_KEY")
+    if not profiling_key:
+        arg_parser.error("PROFILING_KEY is not set")
+    print(f"{args.path}?{PARAMETER}={sign(key=profiling_key, path=args.path)}")
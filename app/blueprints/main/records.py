@@ -0,0 +1,126 @@
+"""
+records.py
+
+Compact, immutable record types for simplified propositions and statements.
+
+Services build these instead of nested dictionaries so that list pages, which process hundreds of propositions or
+statements per request, allocate fewer and smaller objects. Templates read their fields as attributes, e.g.
+`proposition.cancer_type.name`.
+"""
+
+import dataclasses
+import typing
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Concept:
+    """
+    A biomarker, cancer type, gene, or therapy referenced by a proposition.
+    """
+    id: typing.Any
+    name: str
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class AgentCount:
+    """
+    The number of statements from one organization that support a proposition.
+    """
+    id: str
+    count: int
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Aggregates:
+    """
+    Aggregates returned alongside a proposition by the API's /search endpoint.
+    """
+    by_agent: tuple[AgentCount, ...] = ()
+
+    @classmethod
+    def from_dict(cls, record: dict | None) -> "Aggregates":
+        """
+        Creates Aggregates from the `aggregates` field of an API record.
+
+        Args:
+            record (dict | None): The `aggregates` field of a proposition record, if present.
+
+        Returns:
+            Aggregates: The aggregates, empty if `record` is empty or None.
+        """
+        if not record:
+            return EMPTY_AGGREGATES
+        by_agent = tuple(
+            AgentCount(id=agent["id"], count=agent.get("count", 0))
+            for agent in record.get("by_agent", [])
+            if "id" in agent
+        )
+        return cls(by_agent=by_agent)
+
+
+EMPTY_AGGREGATES = Aggregates()
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Proposition:
+    """
+    A simplified proposition, as displayed in proposition tables and pages.
+    """
+    id: typing.Any
+    type: str
+    predicate: str
+    biomarkers: tuple[Concept, ...] = ()
+    cancer_type: Concept | None = None
+    therapies: tuple[Concept, ...] = ()
+    proposition_type: str | None = None
+    aggregates: Aggregates = EMPTY_AGGREGATES
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Document:
+    """
+    A document that a statement is reported in.
+    """
+    id: str
+    documentType: str
+    name: str
+    description: str
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Indication:
+    """
+    The indication that a statement is based on, with the organization that issued its document.
+    """
+    id: str
+    indication: str
+    document_type: str
+    organization: Concept
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Statement:
+    """
+    A simplified statement, as displayed in statement tables and pages. The statement's full record from the API is
+    not kept; it is served on demand by the `statements_raw` route.
+    """
+    id: typing.Any
+    proposition: Proposition
+    description: str
+    direction: str
+    documents: tuple[Document, ...]
+    agent: str | None
+    indication: Indication | None = None
+
+
+def to_concepts(records: list[dict]) -> tuple[Concept, ...]:
+    """
+    Converts dictionaries with `id` and `name` keys into Concepts.
+
+    Args:
+        records (list[dict]): A list of dictionaries containing `id` and `name` keys.
+
+    Returns:
+        tuple[Concept, ...]: The Concepts, in the same order as `records`.
+    """
+    return tuple(Concept(id=record["id"], name=record["name"]) for record in records)
@@ -0,0 +1,204 @@
+"""
+rendering.py
+
+Helpers for rendering templates, including a cache of rendered table rows and streamed rendering of large pages.
+
+A proposition's row in `search_table_therapeutic_response.html` only depends on the proposition, its aggregates, and
+the instance serving it, so the same HTML is produced on every page the proposition appears on. Rows are rendered
+once per release and reused, and pages that list hundreds of propositions are assembled from cached fragments.
+Detail pages load their propositions table separately, and whole tables are cached the same way so that the API's
+/search endpoint is only queried once per table and release.
+
+Fragment caches are bypassed while templates are reloaded on change, i.e. when the app runs in debug mode or with
+TEMPLATES_AUTO_RELOAD set, and can be turned off by setting their size to 0 in the `cache` section of config.ini.
+"""
+
+import flask
+import markupsafe
+import typing
+
+from . import caching
+from . import main_bp
+from . import requests
+from . import services
+from . import timing
+
+PROPOSITION_ROW_TEMPLATE = "search_table_therapeutic_response_row.html"
+PROPOSITION_TABLE_TEMPLATE = "search_table_therapeutic_response.html"
+
+# Minimum number of characters sent per chunk of a streamed template
+STREAM_BUFFER_SIZE = 8192
+
+# Pages that scripts link to from server-side tables, and the argument of each, which is replaced by ROUTE_PLACEHOLDER
+# in the URLs given to scripts by `route_templates`
+LINKED_ROUTES = {
+    "biomarkers": "biomarker_name",
+    "diseases": "disease_name",
+    "documents": "document_id",
+    "indications": "indication_id",
+    "propositions": "proposition_id",
+    "statements": "statement_id",
+    "statements_raw": "statement_id",
+    "therapies": "therapy_name",
+}
+ROUTE_PLACEHOLDER = "__value__"
+
+proposition_rows = caching.register(name="proposition_rows", maxsize=5000)
+proposition_tables = caching.register(name="proposition_tables", maxsize=1000)
+
+
+def buffer(chunks: typing.Iterable[str], size: int = STREAM_BUFFER_SIZE) -> typing.Iterator[str]:
+    """
+    Joins small chunks of output into chunks of at least `size` characters.
+
+    Args:
+        chunks (typing.Iterable[str]): Output to join.
+        size (int): The minimum number of characters per chunk, except for the last.
+
+    Returns:
+        typing.Iterator[str]: Joined chunks.
+    """
+    pending = []
+    pending_size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= size:
+            yield "".join(pending)
+            pending = []
+            pending_size = 0
+    if pending:
+        yield "".join(pending)
+
+
+def fragments_enabled(cache: caching.LRUCache) -> bool:
+    """
+    Reports whether rendered fragments may be stored in `cache` for the current app.
+
+    Args:
+        cache (caching.LRUCache): The cache to store rendered fragments in.
+
+    Returns:
+        bool: False while templates are reloaded on change or if the cache has a size of 0.
+    """
+    return not flask.current_app.jinja_env.auto_reload and cache.maxsize > 0
+
+
+def render_fragment(
+    cache: caching.LRUCache,
+    template_name: str,
+    key: typing.Hashable,
+    load_context: typing.Callable[[], dict],
+) -> markupsafe.Markup:
+    """
+    Renders a template fragment, reusing the HTML previously rendered for the same template, key, release, and
+    instance. The fragment's variables are only loaded if it is not cached.
+
+    Args:
+        cache (caching.LRUCache): The cache to store rendered fragments in.
+        template_name (str): The name of the fragment's template.
+        key (typing.Hashable): Identifies the values that the fragment depends on.
+        load_context (typing.Callable[[], dict]): Returns the variables passed to the template.
+
+    Returns:
+        markupsafe.Markup: The rendered fragment.
+    """
+    app = flask.current_app
+    template = app.jinja_env.get_template(template_name)
+    if not fragments_enabled(cache=cache):
+        context = load_context()
+        with timing.measure("render"):
+            return markupsafe.Markup(template.render(**context))
+
+    cache_key = (
+        template_name,
+        key,
+        caching.current_release(),
+        app.config["INI_CONFIG"]["app"].get("theme", "default-theme-colors.css"),
+        flask.request.script_root,
+    )
+    fragment = cache.get(cache_key)
+    if fragment is None:
+        context = load_context()
+        with timing.measure("render"):
+            fragment = markupsafe.Markup(template.render(**context))
+        cache.set(cache_key, fragment)
+    return fragment
+
+
+def render_proposition_table(entity: str, value: str, config_organization_filter: bool) -> markupsafe.Markup:
+    """
+    Renders the therapeutic response propositions table for the propositions that match an entity, querying the
+    API's /search endpoint only if the table is not cached.
+
+    Args:
+        entity (str): The /search filter to apply, e.g. gene or therapy.
+        value (str): The value of the filter.
+        config_organization_filter (bool): Whether to limit results to the organizations in config.ini.
+
+    Returns:
+        markupsafe.Markup: The table's HTML.
+    """
+    def load_context():
+        records = requests.API.get_search_results(
+            config_organization_filter=config_organization_filter,
+            filters={entity: value},
+        )
+        return {"propositions_by_category": services.process_propositions(records=records)}
+
+    return render_fragment(
+        cache=proposition_tables,
+        template_name=PROPOSITION_TABLE_TEMPLATE,
+        key=(entity, value, config_organization_filter),
+        load_context=load_context,
+    )
+
+
+@main_bp.app_template_global()
+def render_proposition_row(proposition) -> markupsafe.Markup:
+    """
+    Renders a proposition's row of the therapeutic response propositions table.
+
+    Args:
+        proposition (records.Proposition): A simplified proposition record.
+
+    Returns:
+        markupsafe.Markup: The row's HTML.
+    """
+    return render_fragment(
+        cache=proposition_rows,
+        template_name=PROPOSITION_ROW_TEMPLATE,
+        key=(proposition.id, proposition.aggregates),
+        load_context=lambda: {"proposition": proposition},
+    )
+
+
+@main_bp.app_template_global()
+def route_templates() -> dict[str, str]:
+    """
+    Builds the URLs of the pages that scripts link to, with a placeholder in place of each page's argument, so that
+    scripts link to pages under the prefix the app is served at.
+
+    Returns:
+        dict[str, str]: URLs by endpoint, e.g. /biomarkers/__value__ for biomarkers.
+    """
+    return {
+        endpoint: flask.url_for(f"main.{endpoint}", **{argument: ROUTE_PLACEHOLDER})
+        for endpoint, argument in LINKED_ROUTES.items()
+    }
+
+
+def stream_template(template_name: str, **context) -> flask.Response:
+    """
+    Renders a template as a streamed response, so that the page's head and first rows are sent while the rest of
+    the page is still rendering. Output is sent in chunks of at least STREAM_BUFFER_SIZE characters rather than for
+    every template expression.
+
+    Args:
+        template_name (str): The name of the template to render.
+        **context: Variables passed to the template.
+
+    Returns:
+        flask.Response: A streamed text/html response.
+    """
+    return flask.Response(buffer(chunks=flask.stream_template(template_name, **context)), mimetype="text/html")
@@ -14,83 +14,136 @@ Each class provides helper methods for retrieving and processing relevant resour
 
 import flask
 import requests
+import sqlalchemy
+import time
+import typing
+import urllib.parse
 
+from . import caching
 from . import handlers
+from . import metrics
+from . import services
+from . import timing
 from app import models
 
+# Query parameters of an API request. Parameters with an iterable of values are sent once per value, e.g.
+# agent_id=ema&agent_id=fda, and parameters whose value is None are omitted.
+Params = typing.Mapping[str, str | int | typing.Iterable[str | int] | None]
+
+# Serialized statement records from the API, served on demand by the statements_raw route
+statement_records = caching.register(name="statement_records", maxsize=1000)
+
+# Records the API did not find, by request. Entries expire so that records added to the API are found without waiting
+# for the local cache database to change release.
+not_found = caching.register(name="not_found", maxsize=1000, ttl=60)
+
+# Names or ids of the entities in the local cache database, by entity
+entity_names = caching.register(name="entity_names", maxsize=16)
+
+# Names of entities by their normalized name, by entity
+canonical_names = caching.register(name="canonical_names", maxsize=16)
+
+# Whether each table of the local cache database has any records, by table name
+populated_tables = caching.register(name="populated_tables", maxsize=16)
+
+# Raised when a table that populate_database fills is empty, e.g. because the local cache database was populated
+# before the table was added and `create_all` created it without records
+UNPOPULATED_TABLE = (
+    "The {table} table of the local cache database is empty, repopulate it with "
+    "`python -m app.populate_database --drop-tables`"
+)
+
 
 class API:
     """
     Class for making requests against Molecular Oncology Almanac API service.
+
+    Requests are built by `build_request`, so that each logical query has a single URL, which is also the key it is
+    cached and measured under.
     """
 
+    @staticmethod
+    def build_request(endpoint: str, params: Params | None = None) -> str:
+        """
+        Builds the canonical request for a query: parameters are de-duplicated, sorted by name and value, and
+        percent-encoded, so that the same query is always requested, and cached, under the same URL.
+
+        Args:
+            endpoint (str): The API endpoint, e.g. genes.
+            params (Params | None): Query parameters.
+
+        Returns:
+            str: The endpoint and its query string, e.g. biomarkers?agent_id=ema&agent_id=fda&gene=BRAF.
+        """
+        pairs = set(iterate_params(params=params or {}))
+        if not pairs:
+            return endpoint
+        return f"{endpoint}?{urllib.parse.urlencode(sorted(pairs), quote_via=urllib.parse.quote)}"
+
     @staticmethod
     def get_api_url():
         return flask.current_app.config["API_URL"]
 
     @classmethod
-    def get(cls, request):
+    @timing.timed("api")
+    def get(cls, endpoint: str, params: Params | None = None):
         root = cls.get_api_url()
-        request = f"{root}/{request}"
-        response = requests.get(request)
+        request = f"{root}/{cls.build_request(endpoint=endpoint, params=params)}"
+        status_code = None
+        size = None
+        start = time.perf_counter()
+        try:
+            response = requests.get(request)
+            status_code = response.status_code
+            size = len(response.content)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe_upstream(endpoint=endpoint, seconds=elapsed, status_code=status_code)
+            timing.record_upstream(url=request, status_code=status_code, size=size, seconds=elapsed)
         return response
 
     @classmethod
     def get_biomarker(cls, biomarker_name: str = None):
         if biomarker_name:
-            response = cls.get(request=f"biomarkers?biomarker_name={biomarker_name}")
-            if response.status_code == 200:
-                data = response.json()["data"]
-                return data[0]
-            else:
-                return response.json()
+            return cls.get_record(endpoint="biomarkers", params={"biomarker_name": biomarker_name})
         else:
             # return biomarker with "biomarker name not found message"
             return ""
 
     @classmethod
     def get_biomarkers(
-        cls, config_organization_filter: bool = False, filters: str = None
+        cls, config_organization_filter: bool = False, filters: Params | None = None
     ):
-        request = "biomarkers"
-        filters_to_apply = []
-        if config_organization_filter:
-            organization_filters = cls.get_config_organization_filters()
-            filters_to_apply.append(organization_filters)
-        if filters:
-            filters_to_apply.append(filters)
-        if filters_to_apply:
-            request = f"{request}?{'&'.join(filters_to_apply)}"
-        response = cls.get(request=request)
-        if response.status_code == 200:
-            data = response.json()["data"]
-            return data
-        else:
-            return response.json()
+        return cls.get_records(
+            endpoint="biomarkers", config_organization_filter=config_organization_filter, filters=filters
+        )
 
     @classmethod
     def get_config_organization_filters(cls):
+        return urllib.parse.urlencode(
+            sorted(cls.get_config_organization_params().items()), doseq=True, quote_via=urllib.parse.quote
+        )
+
+    @classmethod
+    def get_config_organization_params(cls) -> dict[str, list[str]]:
+        """
+        Returns the query parameters that limit API results to the organizations enabled in config.ini.
+
+        Returns:
+            dict[str, list[str]]: The enabled organizations' ids, sorted, under `agent_id`.
+        """
         config = flask.current_app.config["INI_CONFIG"]
         enabled_agencies = [
             agency
             for agency, enabled in config["agencies"].items()
             if enabled.lower() == "true"
         ]
-        agency_statements = [
-            f"agent_id={agency.lower()}" for agency in enabled_agencies
-        ]
-        string = "&".join(agency_statements)
-        return string.replace(" ", "%20")
+        return {"agent_id": sorted({agency.lower() for agency in enabled_agencies})}
 
     @classmethod
     def get_disease(cls, name: str | None = None):
         if name:
-            response = cls.get(request=f"diseases?disease_name={name}")
-            if response.status_code == 200:
-                data = response.json()["data"]
-                return data[0]
-            else:
-                return response.json()
+            return cls.get_record(endpoint="diseases", params={"disease_name": name})
         else:
             # return disease with "disease name not found message"
             return ""
@@ -98,99 +151,102 @@ class API:
     @classmethod
     def get_document(cls, document_id: str):
         if document_id:
-            response = cls.get(request=f"documents?document_id={document_id}")
-            if response.status_code == 200:
-                data = response.json()["data"]
-                return data[0]
-            else:
-                return response.json()
+            return cls.get_record(endpoint="documents", params={"document_id": document_id})
         else:
             # Return "document id not found" message
             return ""
 
     @classmethod
     def get_documents(
-        cls, config_organization_filter: bool = False, filters: str | None = None
+        cls, config_organization_filter: bool = False, filters: Params | None = None
     ):
-        request = "documents"
-        filters_to_apply = []
-        if config_organization_filter:
-            organization_filters = cls.get_config_organization_filters()
-            filters_to_apply.append(organization_filters)
-        if filters:
-            filters_to_apply.append(filters)
-        if filters_to_apply:
-            request = f"{request}?{'&'.join(filters_to_apply)}"
-        response = cls.get(request=request)
-        if response.status_code == 200:
-            data = response.json()["data"]
-            return data
-        else:
-            return response.json()
+        return cls.get_records(
+            endpoint="documents", config_organization_filter=config_organization_filter, filters=filters
+        )
 
     @classmethod
     def get_gene(cls, name: str | None = None):
         if name:
-            response = cls.get(request=f"genes?gene_name={name}")
-            if response.status_code == 200:
-                data = response.json()["data"]
-                return data[0]
-            else:
-                return response.json()
+            return cls.get_record(endpoint="genes", params={"gene_name": name})
         else:
             # return genes with "gene symbol not found message"
             return ""
 
     @classmethod
     def get_indication(cls, indication_id: str):
-        response = cls.get(request=f"indications?indication_id={indication_id}")
-        if response.status_code == 200:
-            data = response.json()["data"]
-            return data[0]
-        else:
-            return response.json()
+        return cls.get_record(endpoint="indications", params={"indication_id": indication_id})
 
     @classmethod
     def get_indications(
-        cls, config_organization_filter: bool = False, filters: str = None
+        cls, config_organization_filter: bool = False, filters: Params | None = None
     ):
-        request = "indications"
-        filters_to_apply = []
-        if config_organization_filter:
-            organization_filters = cls.get_config_organization_filters()
-            filters_to_apply.append(organization_filters)
-        if filters:
-            filters_to_apply.append(filters)
-        if filters_to_apply:
-            request = f"{request}?{'&'.join(filters_to_apply)}"
-        response = cls.get(request=request)
-        if response.status_code == 200:
-            data = response.json()["data"]
-            return data
-        else:
-            return response.json()
+        return cls.get_records(
+            endpoint="indications", config_organization_filter=config_organization_filter, filters=filters
+        )
 
     @classmethod
     def get_organization(cls, organization_id: str):
-        response = cls.get(request=f"agents?agent_id={organization_id}")
-        if response.status_code == 200:
-            data = response.json()["data"]
-            return data[0]
-        else:
-            return response.json()
+        return cls.get_record(endpoint="agents", params={"agent_id": organization_id})
 
     @classmethod
     def get_proposition(cls, proposition_id):
-        response = cls.get(request=f"propositions?proposition_id={proposition_id}")
+        return cls.get_record(endpoint="propositions", params={"proposition_id": proposition_id})
+
+    @classmethod
+    def get_propositions(cls):
+        return cls.get_records(endpoint="propositions")
+
+    @classmethod
+    def get_record(cls, endpoint: str, params: Params) -> dict:
+        """
+        Retrieves a single record from the API, responding to the current request with 404 Not Found if the API does
+        not have it. Requests the API did not find are remembered for a minute, so that repeated requests for a
+        missing record, e.g. from crawlers or broken links, do not reach the API.
+
+        Args:
+            endpoint (str): The API endpoint, e.g. genes.
+            params (Params): The query parameters that select the record, e.g. {"gene_name": "BRAF"}.
+
+        Returns:
+            dict: The record, or the response's JSON if the API returned an error other than 404 Not Found.
+
+        Raises:
+            werkzeug.exceptions.NotFound: If the API did not find the record.
+        """
+        request = cls.build_request(endpoint=endpoint, params=params)
+        if not_found.get(request):
+            flask.abort(404)
+        response = cls.get(endpoint=endpoint, params=params)
         if response.status_code == 200:
             data = response.json()["data"]
-            return data[0]
-        else:
+            if data:
+                return data[0]
+        elif response.status_code != 404:
             return response.json()
+        not_found.set(request, True)
+        flask.abort(404)
 
     @classmethod
-    def get_propositions(cls):
-        response = cls.get(request="propositions")
+    def get_records(
+        cls, endpoint: str, config_organization_filter: bool = False, filters: Params | None = None
+    ) -> list[dict] | dict:
+        """
+        Retrieves the records of an endpoint that match filters.
+
+        Args:
+            endpoint (str): The API endpoint, e.g. biomarkers.
+            config_organization_filter (bool): Whether to limit records to the organizations enabled in config.ini.
+            filters (Params | None): Query parameters to filter records by, e.g. {"gene": "BRAF"}.
+
+        Returns:
+            list[dict] | dict: The records, or the response's JSON if the API returned an error.
+        """
+        params = {}
+        organization_params = cls.get_config_organization_params() if config_organization_filter else {}
+        for source in (organization_params, filters or {}):
+            for name, value in iterate_params(params=source):
+                params.setdefault(name, []).append(value)
+        response = cls.get(endpoint=endpoint, params=params)
         if response.status_code == 200:
             data = response.json()["data"]
             return data
@@ -199,62 +255,50 @@ class API:
 
     @classmethod
     def get_search_results(
-        cls, config_organization_filter: bool = False, filters: str | None = None
+        cls, config_organization_filter: bool = False, filters: Params | None = None
     ):
-        request = "search"
-        filters_to_apply = []
-        if config_organization_filter:
-            organization_filters = cls.get_config_organization_filters()
-            filters_to_apply.append(organization_filters)
-        if filters:
-            filters_to_apply.append(filters)
-        if filters_to_apply:
-            request = f"{request}?{'&'.join(filters_to_apply)}"
-        response = cls.get(request=request)
-        if response.status_code == 200:
-            data = response.json()["data"]
-            return data
-        else:
-            return response.json()
+        return cls.get_records(
+            endpoint="search", config_organization_filter=config_organization_filter, filters=filters
+        )
 
     @classmethod
     def get_statement(cls, statement_id):
-        response = cls.get(request=f"statements?statement_id={statement_id}")
-        if response.status_code == 200:
-            data = response.json()["data"]
-            return data[0]
-        else:
-            return response.json()
+        return cls.get_record(endpoint="statements", params={"statement_id": statement_id})
+
+    @classmethod
+    def get_statement_json(cls, statement_id: str) -> str | None:
+        """
+        Retrieves a statement's full record from the API as a JSON string, caching it until the local cache database
+        changes release.
+
+        Args:
+            statement_id (str): The statement's id.
+
+        Returns:
+            str | None: The serialized statement record, or None if the API did not return the statement.
+        """
+        serialized = statement_records.get(statement_id)
+        if serialized is None:
+            response = cls.get(endpoint="statements", params={"statement_id": statement_id})
+            data = response.json().get("data") if response.status_code == 200 else None
+            if not data:
+                return None
+            serialized = flask.json.dumps(data[0])
+            statement_records.set(statement_id, serialized)
+        return serialized
 
     @classmethod
     def get_statements(
-        cls, config_organization_filter: bool = False, filters: str | None = None
+        cls, config_organization_filter: bool = False, filters: Params | None = None
     ):
-        request = "statements"
-        filters_to_apply = []
-        if config_organization_filter:
-            organization_filters = cls.get_config_organization_filters()
-            filters_to_apply.append(organization_filters)
-        if filters:
-            filters_to_apply.append(filters)
-        if filters_to_apply:
-            request = f"{request}?{'&'.join(filters_to_apply)}"
-        response = cls.get(request=request)
-        if response.status_code == 200:
-            data = response.json()["data"]
-            return data
-        else:
-            return response.json()
+        return cls.get_records(
+            endpoint="statements", config_organization_filter=config_organization_filter, filters=filters
+        )
 
     @classmethod
     def get_therapy(cls, name: str = None):
         if name:
-            response = cls.get(request=f"therapies?therapy_name={name}")
-            if response.status_code == 200:
-                data = response.json()["data"]
-                return data[0]
-            else:
-                return response.json()
+            return cls.get_record(endpoint="therapies", params={"therapy_name": name})
         else:
             # return therapies with "therapy name not found message"
             return ""
@@ -265,7 +309,31 @@ class Local:
     Class for making requests against the local database.
     """
 
+    # Tables available to server-side rendered DataTables, and the handler and model used to query each
+    TABLES = {
+        "biomarkers": (handlers.Biomarkers, models.Biomarkers),
+        "documents": (handlers.Documents, models.Documents),
+        "indications": (handlers.Indications, models.Indications),
+        "propositions": (handlers.Propositions, models.Propositions),
+        "statements": (handlers.Statements, models.Statements),
+        "therapies": (handlers.Therapies, models.Therapies),
+    }
+
+    # Entities with detail pages, and the column that identifies each in the URLs of their pages
+    ENTITIES = {
+        "biomarkers": models.Biomarkers.name,
+        "diseases": models.Diseases.name,
+        "documents": models.Documents.id,
+        "genes": models.Genes.name,
+        "indications": models.Indications.id,
+        "organizations": models.Agents.id,
+        "propositions": models.Propositions.id,
+        "statements": models.Statements.id,
+        "therapies": models.Therapies.name,
+    }
+
     @classmethod
+    @timing.timed("db")
     def get(cls, handler, statement):
         session_factory = flask.current_app.config["SESSION_FACTORY"]
         with session_factory() as session:
@@ -287,6 +355,26 @@ class Local:
         results = cls.get(handler=handler, statement=statement)
         return cls.sort(data=results, sort_key="name")
 
+    @classmethod
+    def get_canonical_names(cls, entity: str) -> dict[str, str]:
+        """
+        Indexes the names of an entity's records by their normalized name, caching the index until the local cache
+        database changes release. If names normalize to the same name, the first in sorted order is kept.
+
+        Args:
+            entity (str): A key of `Local.ENTITIES`.
+
+        Returns:
+            dict[str, str]: Names in the local cache database by their normalized name.
+        """
+        index = canonical_names.get(entity)
+        if index is None:
+            index = {}
+            for name in sorted(cls.get_entity_names(entity=entity)):
+                index.setdefault(services.normalize_name(value=name), name)
+            canonical_names.set(entity, index)
+        return index
+
     @classmethod
     def get_diseases(cls):
         handler = handlers.Diseases()
@@ -301,6 +389,44 @@ class Local:
         results = cls.get(handler=handler, statement=statement)
         return cls.sort(data=results, sort_key="name")
 
+    @classmethod
+    def get_entity_names(cls, entity: str) -> frozenset[str]:
+        """
+        Retrieves the names, or ids, of an entity's records, caching them until the local cache database changes
+        release.
+
+        Args:
+            entity (str): A key of `Local.ENTITIES`.
+
+        Returns:
+            frozenset[str]: The values that identify the entity's records in the URLs of their pages.
+
+        Raises:
+            RuntimeError: If the entity's table is empty.
+        """
+        names = entity_names.get(entity)
+        if names is None:
+            statement = sqlalchemy.select(cls.ENTITIES[entity])
+            session_factory = flask.current_app.config["SESSION_FACTORY"]
+            with timing.measure("db"), session_factory() as session:
+                values = handlers.BaseHandler.execute_query(session=session, statement=statement)
+            if not values:
+                raise RuntimeError(UNPOPULATED_TABLE.format(table=cls.ENTITIES[entity].table.name))
+            names = frozenset(str(value) for value in values)
+            entity_names.set(entity, names)
+        return names
+
+    @classmethod
+    def get_facets(cls, facet: str):
+        handler = handlers.Facets()
+        statement = (
+            handler
+            .construct_base_query(model=models.Facets)
+            .where(models.Facets.facet == facet)
+        )
+        results = cls.get(handler=handler, statement=statement)
+        return cls.sort(data=results, sort_key="value")
+
     @classmethod
     def get_genes(cls):
         handler = handlers.Genes()
@@ -322,6 +448,79 @@ class Local:
         results = cls.get(handler=handler, statement=statement)
         return cls.sort(data=results, sort_key="name")
 
+    @classmethod
+    def get_propositions(
+        cls, proposition_ids: list[int] | None = None, organization_id: str | None = None
+    ):
+        handler = handlers.Propositions()
+        statement = handler.construct_base_query(model=models.Propositions)
+        if proposition_ids is not None:
+            statement = statement.where(models.Propositions.id.in_(proposition_ids))
+        if organization_id is not None:
+            statement = handler.apply_facets(
+                statement=statement, facets={"organization": [organization_id]}
+            )
+        statement = statement.order_by(models.Propositions.biomarker_names, models.Propositions.id)
+        return cls.get(handler=handler, statement=statement)
+
+    @classmethod
+    @timing.timed("db")
+    def get_table(
+        cls,
+        table: str,
+        start: int = 0,
+        length: int = 10,
+        order: list[tuple[str, str]] | None = None,
+        search: str = "",
+        facets: dict[str, list[str]] | None = None,
+    ):
+        """
+        Retrieves one page of a table for server-side processing, after applying facets, free-text search, and
+        ordering.
+
+        Args:
+            table (str): A key of `Local.TABLES`.
+            start (int): The index of the first record to return.
+            length (int): The number of records to return, or all records if negative.
+            order (list[tuple[str, str]]): Pairs of column name and direction to order by.
+            search (str): Free-text search value.
+            facets (dict[str, list[str]]): Facet names and the values selected for each.
+
+        Returns:
+            dict: The serialized records of the page, `data`, along with the number of records in the table,
+                `records_total`, and after filtering, `records_filtered`.
+
+        Raises:
+            KeyError: If `table` is not a key of `Local.TABLES`.
+            RuntimeError: If the table is empty, rather than serving pages without records.
+        """
+        handler_class, model = cls.TABLES[table]
+        handler = handler_class()
+        base_statement = handler.construct_base_query(model=model)
+        statement = handler.apply_facets(statement=base_statement, facets=facets or {})
+        statement = handler.apply_search(statement=statement, value=search)
+
+        session_factory = flask.current_app.config["SESSION_FACTORY"]
+        with session_factory() as session:
+            records_total = handler.count_query(session=session, statement=base_statement)
+            if records_total == 0:
+                raise RuntimeError(UNPOPULATED_TABLE.format(table=model.__tablename__))
+            if statement is base_statement:
+                records_filtered = records_total
+            else:
+                records_filtered = handler.count_query(session=session, statement=statement)
+
+            statement = handler.apply_order(statement=statement, order=order or [])
+            statement = statement.order_by(model.id)
+            statement = handler.apply_paging(statement=statement, start=start, length=length)
+            result = handler.execute_query(session=session, statement=statement)
+            serialized = handler.serialize_instances(instances=result)
+        return {
+            "data": serialized,
+            "records_filtered": records_filtered,
+            "records_total": records_total,
+        }
+
     @classmethod
     def get_terms(cls):
         handler = handlers.Terms()
@@ -335,6 +534,67 @@ class Local:
         results = cls.get(handler=handler, statement=statement)
         return cls.sort(data=results, sort_key="name")
 
+    @classmethod
+    def is_populated(cls, model: type[models.Base]) -> bool:
+        """
+        Checks whether a table of the local cache database has any records, caching the answer until the local cache
+        database changes release. Tables added after a cache was populated are created without records.
+
+        Args:
+            model (type[models.Base]): The table's model.
+
+        Returns:
+            bool: True if the table has at least one record.
+        """
+        populated = populated_tables.get(model.__tablename__)
+        if populated is None:
+            statement = sqlalchemy.select(model.id).limit(1)
+            session_factory = flask.current_app.config["SESSION_FACTORY"]
+            with timing.measure("db"), session_factory() as session:
+                populated = bool(handlers.BaseHandler.execute_query(session=session, statement=statement))
+            populated_tables.set(model.__tablename__, populated)
+        return populated
+
+    @classmethod
+    def require_entity(cls, entity: str, value: str):
+        """
+        Responds to the current request with 404 Not Found if the local cache database has no record of an entity
+        with the given name or id, before any request is made to the API for it.
+
+        Args:
+            entity (str): A key of `Local.ENTITIES`.
+            value (str): The name or id from the request's URL.
+
+        Raises:
+            werkzeug.exceptions.NotFound: If the local cache database has no such record.
+        """
+        if value not in cls.get_entity_names(entity=entity):
+            flask.abort(404)
+
+    @classmethod
+    def resolve_entity(cls, entity: str, value: str) -> str:
+        """
+        Resolves a name from a request's URL to the name of the entity's record in the local cache database, matching
+        variants in case, spacing, and encoding. Responds to the current request with 404 Not Found if no record
+        matches.
+
+        Args:
+            entity (str): A key of `Local.ENTITIES`.
+            value (str): The name from the request's URL.
+
+        Returns:
+            str: The record's name, which is `value` if it matches exactly.
+
+        Raises:
+            werkzeug.exceptions.NotFound: If the local cache database has no matching record.
+        """
+        if value in cls.get_entity_names(entity=entity):
+            return value
+        canonical = cls.get_canonical_names(entity=entity).get(services.normalize_name(value=value))
+        if canonical is None:
+            flask.abort(404)
+        return canonical
+
     @classmethod
     def sort(cls, data, sort_key="name", reverse=False):
         """
@@ -357,3 +617,21 @@ class Local:
             raise KeyError(
                 f"Missing key '{sort_key}' in one or more dictionaries."
             ) from e
+
+
+def iterate_params(params: Params) -> typing.Iterator[tuple[str, str]]:
+    """
+    Iterates over the name and value of each query parameter to send, once per value.
+
+    Args:
+        params (Params): Query parameters.
+
+    Yields:
+        tuple[str, str]: A parameter's name and one of its values, as a string.
+    """
+    for name, values in params.items():
+        if values is None or isinstance(values, (str, int)):
+            values = [values]
+        for value in values:
+            if value is not None:
+                yield name, str(value)
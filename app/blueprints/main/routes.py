@@ -5,11 +5,85 @@ Routes for the main blueprint.
 """
 
 import flask
-from pandas.core.dtypes.cast import can_hold_element
+import prometheus_client
 
+from . import caching
+from . import compression
+from . import conditional
 from . import main_bp
+from . import metrics
+from . import monitoring
+from . import profiler
+from . import rendering
 from . import requests
 from . import services
+from . import slow_requests
+from . import timing
+from app import models
+
+
+@main_bp.before_app_request
+def start_timing():
+    timing.start_request()
+
+
+@main_bp.before_app_request
+def start_profiling():
+    profiler.start_request()
+
+
+@main_bp.before_app_request
+def scope_caches_to_release():
+    caching.check_release(
+        path=flask.current_app.config["CACHE_PATH"],
+        load_release=lambda: requests.Local.get_about()["release"],
+    )
+
+
+@main_bp.before_app_request
+def redirect_to_canonical_names():
+    request = flask.request
+    view_args = request.view_args or {}
+    for argument, entity in services.ENTITY_NAME_ARGUMENTS.items():
+        value = view_args.get(argument)
+        if not value:
+            continue
+        canonical = requests.Local.resolve_entity(entity=entity, value=value)
+        if canonical != value:
+            arguments = {**request.args.to_dict(flat=False), **view_args, argument: canonical}
+            return flask.redirect(flask.url_for(request.endpoint, **arguments), code=301)
+
+
+@main_bp.before_app_request
+def answer_conditional_requests():
+    return conditional.not_modified()
+
+
+@main_bp.after_app_request
+def finalize_response(response):
+    # Compression runs after caching headers are set, since the ETags of compressed responses are suffixed with
+    # their content coding
+    response = conditional.set_headers(response=response)
+    response = compression.compress_response(response=response)
+    response = metrics.finish_request(response=response)
+    response = timing.finish_request(response=response)
+    response = slow_requests.finish_request(response=response)
+    return profiler.finish_request(response=response)
+
+
+@main_bp.teardown_app_request
+def end_profiling(exception):
+    profiler.end_request()
+
+
+@main_bp.teardown_app_request
+def end_timing(exception):
+    timing.end_request()
+
+
+@main_bp.app_errorhandler(404)
+def not_found(error):
+    return flask.render_template(template_name_or_list="not_found.html"), 404
 
 
 @main_bp.route("/", endpoint="index")
@@ -39,25 +113,18 @@ def biomarkers(biomarker_name: str | None = None):
         # processed_record = services.process_biomarker(record=record)
         processed_record = record
 
-        biomarker_propositions = requests.API.get_search_results(
-            config_organization_filter=True,
-            filters=f"biomarker={biomarker_name.replace(' ', '%20')}",
-        )
-        processed_propositions = services.process_propositions(
-            records=biomarker_propositions
-        )
-
         return flask.render_template(
             template_name_or_list="biomarker.html",
             biomarker=processed_record,
-            propositions_by_category=processed_propositions,
+            propositions_source=flask.url_for(
+                "main.proposition_tables", entity="biomarker", value=biomarker_name
+            ),
         )
     else:
         records = requests.Local.get_biomarkers()
         all_biomarker_types = sorted(set(record["type"] for record in records))
         return flask.render_template(
             template_name_or_list="biomarkers.html",
-            biomarkers=records,
             all_biomarker_types=all_biomarker_types,
         )
 
@@ -70,18 +137,12 @@ def diseases(disease_name: str = None):
         processed_record = record
         # processed_record = services.process_disease(record=record)
 
-        disease_propositions = requests.API.get_search_results(
-            config_organization_filter=True,
-            filters=f"disease={disease_name}",
-        )
-        processed_propositions = services.process_propositions(
-            records=disease_propositions
-        )
-
         return flask.render_template(
             template_name_or_list="disease.html",
             disease=processed_record,
-            propositions_by_category=processed_propositions,
+            propositions_source=flask.url_for(
+                "main.proposition_tables", entity="disease", value=disease_name
+            ),
         )
     else:
         records = requests.Local.get_diseases()
@@ -94,11 +155,12 @@ def diseases(disease_name: str = None):
 @main_bp.route("/documents/<document_id>", endpoint="documents")
 def documents(document_id: str | None = None):
     if document_id:
+        requests.Local.require_entity(entity="documents", value=document_id)
         record = requests.API.get_document(document_id=document_id)
 
         cached_indications = requests.Local.get_indications()
         document_indications = requests.API.get_indications(
-            filters=f"document={document_id}",
+            filters={"document": document_id},
         )
         document_indications = services.append_field_from_matching_records(
             target_list=document_indications,
@@ -108,26 +170,18 @@ def documents(document_id: str | None = None):
             match_key="id",
         )
 
-        document_propositions = requests.API.get_search_results(
-            config_organization_filter=True, 
-            filters=f"document={document_id}",
-        )
-        processed_propositions = services.process_propositions(
-            records=document_propositions,
-        )
-
         return flask.render_template(
             template_name_or_list="document.html",
             document=record,
             indications=document_indications,
-            propositions_by_category=processed_propositions,
+            propositions_source=flask.url_for(
+                "main.proposition_tables", entity="document", value=document_id
+            ),
         )
     else:
-        records = requests.Local.get_documents()
-        all_organizations = sorted(set(record["agent_name"] for record in records))
+        all_organizations = requests.Local.get_organizations()
         return flask.render_template(
             template_name_or_list="documents.html",
-            documents=records,
             all_organizations=all_organizations,
         )
 
@@ -141,7 +195,7 @@ def genes(gene_symbol: str | None = None):
 
         cached_biomarkers = requests.Local.get_biomarkers()
         gene_biomarkers = requests.API.get_biomarkers(
-            config_organization_filter=True, filters=f"gene={gene_symbol}"
+            config_organization_filter=True, filters={"gene": gene_symbol}
         )
         gene_biomarkers = services.append_field_from_matching_records(
             target_list=gene_biomarkers,
@@ -158,18 +212,13 @@ def genes(gene_symbol: str | None = None):
             match_key="id",
         )
 
-        gene_propositions = requests.API.get_search_results(
-            config_organization_filter=True, filters=f"gene={gene_symbol}"
-        )
-        processed_propositions = services.process_propositions(
-            records=gene_propositions
-        )
-
         return flask.render_template(
             template_name_or_list="gene.html",
             gene=processed_record,
             biomarkers=gene_biomarkers,
-            propositions_by_category=processed_propositions,
+            propositions_source=flask.url_for(
+                "main.proposition_tables", entity="gene", value=gene_symbol
+            ),
         )
     else:
         records = requests.Local.get_genes()
@@ -180,57 +229,40 @@ def genes(gene_symbol: str | None = None):
 @main_bp.route("/indications/<indication_id>", endpoint="indications")
 def indications(indication_id: str | None = None):
     if indication_id:
+        requests.Local.require_entity(entity="indications", value=indication_id)
         record = requests.API.get_indication(indication_id=indication_id)
 
-        indication_propositions = requests.API.get_search_results(
-            config_organization_filter=False,
-            filters=f"indication={indication_id}",
-        )
-        processed_propositions = services.process_propositions(
-            records=indication_propositions
-        )
-
         return flask.render_template(
             template_name_or_list="indication.html",
             indication=record,
-            propositions_by_category=processed_propositions,
+            propositions_source=flask.url_for(
+                "main.proposition_tables", entity="indication", value=indication_id
+            ),
         )
     else:
-        records = requests.API.get_indications(config_organization_filter=True)
-        cached_indications = requests.Local.get_indications()
-        processed_indications = services.append_field_from_matching_records(
-            target_list=records,
-            source_list=cached_indications,
-            source_field="statements_count",
-            new_field_name="statements_count",
-            match_key="id",
-        )
-        for indication in processed_indications:
-            if not indication.get("statements_count", None):
-                indication["statements_count"] = 0
-        
-        all_organizations = set()
-        for record in records:
-            extensions = record.get("document").get("extensions")
-            agent = [ext for ext in extensions if ext['name'] == "agent"][0]['value']
-            all_organizations.add(agent.get('name'))
-
+        all_organizations = requests.Local.get_organizations()
         return flask.render_template(
             template_name_or_list="indications.html",
-            indications=processed_indications,
             all_organizations=all_organizations,
         )
 
 
+@main_bp.route("/metrics", methods=["GET"])
+def export_metrics():
+    monitoring.require_allowed_client()
+    return flask.Response(metrics.collect(), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+
 @main_bp.route("/organizations", defaults={"organization_id": None}, methods=["GET"])
 @main_bp.route("/organizations/<organization_id>", endpoint="organizations")
 def organizations(organization_id):
     if organization_id:
+        requests.Local.require_entity(entity="organizations", value=organization_id)
         record = requests.API.get_organization(organization_id=organization_id)
         cached_documents = requests.Local.get_documents()
         organization_documents = requests.API.get_documents(
             config_organization_filter=False,
-            filters=f"agent_id={organization_id}",
+            filters={"agent_id": organization_id},
         )
         organization_documents = services.append_field_from_matching_records(
             target_list=organization_documents,
@@ -249,7 +281,7 @@ def organizations(organization_id):
 
         cached_indications = requests.Local.get_indications()
         organization_indications = requests.API.get_indications(
-            filters=f"agent_id={organization_id}",
+            filters={"agent_id": organization_id},
             config_organization_filter=False,
         )
         organization_indications = services.append_field_from_matching_records(
@@ -260,25 +292,32 @@ def organizations(organization_id):
             match_key="id",
         )
 
-        organization_propositions = requests.API.get_search_results(
-            config_organization_filter=True,
-            filters=f"",
-            # Filter for query will be contained already within organization filters
-            # of the browser's instance
-        )
-        filtered_propositions = services.filter_search_results_required_organization(
-            records=organization_propositions,
-            organization_id=organization_id,
-        )
-        processed_propositions = services.process_propositions(
-            records=filtered_propositions
-        )
+        if requests.Local.is_populated(model=models.OrganizationPropositions):
+            organization_propositions = requests.Local.get_propositions(
+                organization_id=organization_id,
+            )
+            processed_propositions = services.process_cached_propositions(
+                records=organization_propositions
+            )
+        else:
+            # Caches populated before the organization_propositions mapping existed have it empty
+            organization_propositions = requests.API.get_search_results(
+                config_organization_filter=True,
+                filters=None,
+            )
+            filtered_propositions = services.filter_search_results_required_organization(
+                records=services.simplify_proposition_records(records=organization_propositions),
+                organization_id=organization_id,
+            )
+            processed_propositions = services.categorize_propositions(
+                records=filtered_propositions
+            )
         response_organizations = services.extract_organizations(
             propositions=processed_propositions
         )
 
-        return flask.render_template(
-            template_name_or_list="organization.html",
+        return rendering.stream_template(
+            "organization.html",
             organization=record,
             documents=organization_documents,
             indications=organization_indications,
@@ -297,11 +336,12 @@ def organizations(organization_id):
 @main_bp.route("/propositions/<proposition_id>", endpoint="propositions")
 def propositions(proposition_id: str | None = None):
     if proposition_id:
+        requests.Local.require_entity(entity="propositions", value=proposition_id)
         record = requests.API.get_proposition(proposition_id=proposition_id)
         processed = services.process_proposition(record=record)
 
         proposition_statements = requests.API.get_statements(
-            config_organization_filter=True, filters=f"proposition_id={proposition_id}"
+            config_organization_filter=True, filters={"proposition_id": proposition_id}
         )
         processed_statements = services.process_statements(
             records=proposition_statements
@@ -313,29 +353,60 @@ def propositions(proposition_id: str | None = None):
             statements=processed_statements,
             organization_filters=requests.API.get_config_organization_filters(),
         )
-    records = requests.API.get_propositions()
-    processed = services.process_propositions(records=records)
-    return flask.render_template(
-        template_name_or_list="propositions.html", propositions_by_category=processed
+    return rendering.stream_template("propositions.html")
+
+
+@main_bp.route("/fragments/propositions/<entity>/<path:value>", methods=["GET"])
+def proposition_tables(entity: str, value: str):
+    if entity not in services.PROPOSITION_TABLE_ENTITIES:
+        flask.abort(404)
+    table, config_organization_filter = services.PROPOSITION_TABLE_ENTITIES[entity]
+    requests.Local.require_entity(entity=table, value=value)
+    return rendering.render_proposition_table(
+        entity=entity,
+        value=value,
+        config_organization_filter=config_organization_filter,
     )
 
 
 @main_bp.route("/search", methods=["GET"])
 def search():
-    records = requests.API.get_search_results(config_organization_filter=True)
-    processed = services.process_propositions(records=records)
-    response_organizations = services.extract_organizations(propositions=processed)
-    return flask.render_template(
-        template_name_or_list="search.html",
+    query = services.parse_search_request(args=flask.request.args)
+    result = requests.Local.get_table(
+        table="propositions",
+        start=(query["page"] - 1) * query["limit"],
+        length=query["limit"],
+        order=[("biomarkers", "asc")],
+        search=query["q"],
+        facets=query["facets"],
+    )
+    processed = services.process_cached_propositions(records=result["data"])
+    pagination = services.paginate(
+        page=query["page"],
+        limit=query["limit"],
+        total=result["records_filtered"],
+    )
+    organizations = requests.Local.get_facets(facet="organization")
+    return rendering.stream_template(
+        "search.html",
         propositions_by_category=processed,
-        organizations=response_organizations,
+        organizations=organizations,
+        pagination=pagination,
+        query=query,
     )
 
 
+@main_bp.route("/status/caches", methods=["GET"])
+def status_caches():
+    monitoring.require_allowed_client()
+    return flask.jsonify(caching.stats())
+
+
 @main_bp.route("/statements", defaults={"statement_id": None}, methods=["GET"])
 @main_bp.route("/statements/<statement_id>", endpoint="statements")
 def statements(statement_id: str | None = None):
     if statement_id:
+        requests.Local.require_entity(entity="statements", value=statement_id)
         record = requests.API.get_statement(statement_id=statement_id)
         processed = services.process_statement(record=record)
         return flask.render_template(
@@ -343,11 +414,45 @@ def statements(statement_id: str | None = None):
             statement=processed,
         )
     else:
-        records = requests.API.get_statements(config_organization_filter=True)
-        processed = services.process_statements(records=records)
-        return flask.render_template(
-            template_name_or_list="statements.html", statements=processed
-        )
+        return rendering.stream_template("statements.html")
+
+
+@main_bp.route("/statements/<statement_id>/raw", methods=["GET"])
+def statements_raw(statement_id: str):
+    if statement_id not in requests.Local.get_entity_names(entity="statements"):
+        return flask.jsonify({"error": f"Statement {statement_id} not found"}), 404
+    serialized = requests.API.get_statement_json(statement_id=statement_id)
+    if serialized is None:
+        return flask.jsonify({"error": f"Statement {statement_id} not found"}), 404
+    return flask.Response(serialized, mimetype="application/json")
+
+
+@main_bp.route("/tables/<table>", methods=["GET"])
+def tables(table: str):
+    if table not in requests.Local.TABLES:
+        flask.abort(404)
+
+    parameters = services.parse_datatables_request(args=flask.request.args)
+    draw = parameters.pop("draw")
+    result = requests.Local.get_table(table=table, **parameters)
+
+    records = result["data"]
+    if table == "propositions":
+        records = services.process_proposition_rows(records=records)
+    elif table == "statements":
+        propositions = requests.Local.get_propositions(
+            proposition_ids=sorted({record["proposition_id"] for record in records})
+        )
+        records = services.process_statement_rows(records=records, propositions=propositions)
+
+    return flask.jsonify(
+        {
+            "draw": draw,
+            "recordsTotal": result["records_total"],
+            "recordsFiltered": result["records_filtered"],
+            "data": records,
+        }
+    )
 
 
 @main_bp.route("/therapies", defaults={"therapy_name": None}, methods=["GET", "POST"])
@@ -357,23 +462,17 @@ def therapies(therapy_name: str | None = None):
         record = requests.API.get_therapy(name=therapy_name)
         processed_record = services.process_therapy(record=record)
 
-        therapy_propositions = requests.API.get_search_results(
-            config_organization_filter=True, filters=f"therapy={therapy_name}"
-        )
-        processed_propositions = services.process_propositions(
-            records=therapy_propositions
-        )
-
         return flask.render_template(
             template_name_or_list="therapy.html",
             therapy=processed_record,
-            propositions_by_category=processed_propositions,
+            propositions_source=flask.url_for(
+                "main.proposition_tables", entity="therapy", value=therapy_name
+            ),
         )
     else:
         records = requests.Local.get_therapies()
         all_therapy_types = sorted(set(record["therapy_type"] for record in records))
         return flask.render_template(
             template_name_or_list="therapies.html",
-            therapies=records,
             all_therapy_types=all_therapy_types,
         )
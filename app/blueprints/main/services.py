@@ -5,6 +5,52 @@ Service-layer functions for intermediate processing of data retrieved from handl
 """
 
 import collections
+import dataclasses
+import logging
+import math
+import urllib.parse
+
+from . import caching
+from . import records as record_types
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+# Entities whose detail pages load their propositions table separately, the entity of `requests.Local.ENTITIES` each
+# is, and whether the table is limited to the organizations in config.ini
+PROPOSITION_TABLE_ENTITIES = {
+    "biomarker": ("biomarkers", True),
+    "disease": ("diseases", True),
+    "document": ("documents", True),
+    "gene": ("genes", True),
+    "indication": ("indications", False),
+    "therapy": ("therapies", True),
+}
+
+# Route arguments that name entities rather than identify them by id, and the entity of `requests.Local.ENTITIES`
+# each names. Variants of these names, e.g. in another case, are redirected to the name in the local cache.
+ENTITY_NAME_ARGUMENTS = {
+    "biomarker_name": "biomarkers",
+    "disease_name": "diseases",
+    "gene_symbol": "genes",
+    "therapy_name": "therapies",
+}
+
+# Facets accepted by server-side tables, in addition to DataTables' own search and ordering parameters
+DATATABLES_FACETS = ("organization", "biomarker_type", "therapy_type")
+
+# Filters accepted by the search page, and the number of results shown per page
+SEARCH_FACETS = ("gene", "biomarker", "disease", "therapy", "organization")
+SEARCH_DEFAULT_LIMIT = 25
+SEARCH_MAX_LIMIT = 100
+
+# Rows returned per page of a server-side table. DataTables requests all rows with a length of -1, which is served the
+# maximum instead, so that no request serializes a whole table.
+DATATABLES_DEFAULT_LENGTH = 10
+DATATABLES_MAX_LENGTH = SEARCH_MAX_LIMIT
+
+# Simplified propositions by proposition id, cleared when the local cache database changes release
+simplified_propositions = caching.register(name="simplified_propositions", maxsize=5000)
 
 
 def append_field_from_matching_records(
@@ -41,19 +87,19 @@ def append_field_from_matching_records(
     return target_list
 
 
-def categorize_propositions(records: list[dict]):
+def categorize_propositions(records: list[record_types.Proposition]):
     """
     Categorizes propositions by their type.
 
     Args:
-        records (list[dict]): A list of proposition records.
+        records (list[records.Proposition]): A list of simplified proposition records.
 
     Returns:
         dict: A dictionary of proposition types and their corresponding records.
     """
     categorized = collections.defaultdict(list)
     for record in records:
-        key = record.get("type")
+        key = record.type
         categorized[key].append(record)
     return dict(categorized)
 
@@ -96,10 +142,9 @@ def extract_organizations(propositions: dict):
         list(dict): list of dictionaries of agent ids, with uppercase formatting applied.
     """
     agents = set()
-    for proposition in propositions["VariantTherapeuticResponseProposition"]:
-        for agent in proposition.get("aggregates", {}).get("by_agent", []):
-            if "id" in agent:
-                agents.add(agent["id"])
+    for proposition in propositions.get("VariantTherapeuticResponseProposition", []):
+        for agent in proposition.aggregates.by_agent:
+            agents.add(agent.id)
     return [{"id": agent_id} for agent_id in sorted(agents)]
 
 
@@ -127,32 +172,34 @@ def get_extension(list_of_extensions: list, name: str):
     Subsets `list_of_extensions` to retrieve the extension whose name matches `name`.
 
     Args:
-        - list_of_extensions (list): A list of dictionaries representing extensions.
+        - list_of_extensions (list | None): A list of dictionaries representing extensions, or None if the record has
+            none.
         - name (str): The name of the extension to retrieve.
 
     Returns:
         - list: A list of extensions whose name value matches `name`.
     """
     return [
-        extension for extension in list_of_extensions if extension.get("name") == name
+        extension for extension in list_of_extensions or [] if extension.get("name") == name
     ]
 
 
-def filter_search_results_required_organization(records: list[dict], organization_id: str) -> list[dict]:
+def filter_search_results_required_organization(
+    records: list[record_types.Proposition], organization_id: str
+) -> list[record_types.Proposition]:
     """
     Filters processed proposition records from process_propositions function
     to require the specified organization.
 
     Args:
-        records (list[dict]): List of proposition records from process_propositions function.
+        records (list[records.Proposition]): List of proposition records from process_propositions function.
 
     Returns:
-        list[dict]: records, requires organization to be listed within aggregates['by_agent']
+        list[records.Proposition]: records, requires organization to be listed within aggregates.by_agent
     """
     filtered = []
     for record in records:
-        by_agent = record.get("aggregates", {}).get("by_agent", [])
-        if any(agent.get("id") == organization_id for agent in by_agent):
+        if any(agent.id == organization_id for agent in record.aggregates.by_agent):
             filtered.append(record)
     return filtered
 
@@ -175,6 +222,152 @@ def map_predict(string: str):
         return "ERROR"
 
 
+def normalize_name(value: str) -> str:
+    """
+    Normalizes an entity name so that variants of it match: percent-escapes left by links that were encoded twice
+    are decoded, underscores and runs of whitespace become single spaces, and case is folded.
+
+    Args:
+        value (str): An entity name, e.g. from a request's URL.
+
+    Returns:
+        str: The normalized name, e.g. `braf p.v600e` for `braf_p.V600E`.
+    """
+    value = urllib.parse.unquote(value)
+    return " ".join(value.replace("_", " ").split()).casefold()
+
+
+def paginate(page: int, limit: int, total: int) -> dict:
+    """
+    Describes one page of results for rendering pagination controls.
+
+    Args:
+        page (int): The requested page, starting from 1.
+        limit (int): The number of results per page.
+        total (int): The total number of results.
+
+    Returns:
+        dict: The `page`, number of `pages`, `limit`, `total`, and the positions of the `first` and `last` results
+            shown on the page.
+    """
+    start = (page - 1) * limit
+    return {
+        "page": page,
+        "pages": max(math.ceil(total / limit), 1),
+        "limit": limit,
+        "total": total,
+        "first": min(start + 1, total),
+        "last": min(start + limit, total),
+    }
+
+
+def parse_datatables_request(args) -> dict:
+    """
+    Parses the query parameters sent by DataTables for server-side processing, along with our facets. Facet values are
+    comma separated.
+
+    Args:
+        args (werkzeug.datastructures.MultiDict): The request's query parameters.
+
+    Returns:
+        dict: The request's `draw` counter, `start` index, page `length` between 1 and DATATABLES_MAX_LENGTH,
+            `order` as pairs of column name and direction, free-text `search` value, and `facets` by name.
+    """
+    order = []
+    index = 0
+    while f"order[{index}][column]" in args:
+        column_index = args.get(f"order[{index}][column]", type=int)
+        column_name = args.get(f"columns[{column_index}][data]", "")
+        direction = "desc" if args.get(f"order[{index}][dir]") == "desc" else "asc"
+        if column_name and args.get(f"columns[{column_index}][orderable]", "true") == "true":
+            order.append((column_name, direction))
+        index += 1
+
+    length = args.get("length", DATATABLES_DEFAULT_LENGTH, type=int)
+    if length < 0:
+        length = DATATABLES_MAX_LENGTH
+    length = min(max(length, 1), DATATABLES_MAX_LENGTH)
+
+    facets = {}
+    for facet in DATATABLES_FACETS:
+        values = [value.strip() for value in args.get(facet, "").split(",")]
+        facets[facet] = [value for value in values if value]
+
+    return {
+        "draw": args.get("draw", 0, type=int),
+        "start": max(args.get("start", 0, type=int), 0),
+        "length": length,
+        "order": order,
+        "search": args.get("search[value]", "").strip(),
+        "facets": facets,
+    }
+
+
+def parse_search_request(args) -> dict:
+    """
+    Parses the query parameters of the search page. Each filter may be repeated, and records must match any of the
+    values given for a filter and all filters given.
+
+    Args:
+        args (werkzeug.datastructures.MultiDict): The request's query parameters.
+
+    Returns:
+        dict: The `facets` to filter by, free-text search `q`, `page`, and `limit`, along with `args`, the
+            non-empty parameters other than `page` for building links to other pages.
+    """
+    facets = {}
+    for facet in SEARCH_FACETS:
+        values = [value.strip() for value in args.getlist(facet)]
+        facets[facet] = [value for value in values if value]
+
+    q = args.get("q", "").strip()
+    limit = min(max(args.get("limit", SEARCH_DEFAULT_LIMIT, type=int), 1), SEARCH_MAX_LIMIT)
+    page = max(args.get("page", 1, type=int), 1)
+
+    query_args = {facet: values for facet, values in facets.items() if values}
+    if q:
+        query_args["q"] = q
+    if limit != SEARCH_DEFAULT_LIMIT:
+        query_args["limit"] = limit
+
+    return {
+        "facets": facets,
+        "q": q,
+        "page": page,
+        "limit": limit,
+        "args": query_args,
+    }
+
+
+@timing.timed("services")
+def process_cached_propositions(records: list[dict]):
+    """
+    Processes cached proposition records from the local database into the same format as `process_propositions`,
+    for use with the therapeutic response table.
+
+    Args:
+        records (list[dict]): A list of serialized records from the Propositions table.
+
+    Returns:
+        dict: A dictionary of proposition types and their corresponding simplified records.
+    """
+    simplified = []
+    for record in records:
+        new_record = record_types.Proposition(
+            id=record["id"],
+            type=record["type"],
+            predicate=map_predict(string=record["predicate"]),
+            biomarkers=record_types.to_concepts(records=record["biomarkers"]),
+            cancer_type=record_types.Concept(id=record["cancer_type_id"], name=record["cancer_type_name"]),
+            therapies=record_types.to_concepts(records=record["therapies"]),
+            proposition_type="Therapeutic response",
+            aggregates=record_types.Aggregates.from_dict(record={"by_agent": record["by_agent"]}),
+        )
+        simplified.append(new_record)
+    return categorize_propositions(records=simplified)
+
+
+@timing.timed("services")
 def process_gene(record: list[dict]):
     """
     Process a gene record from the API for use within the genes view.
@@ -189,10 +382,11 @@ def process_gene(record: list[dict]):
     location = get_extension(
         list_of_extensions=record.get("extensions"), name="location"
     )
-    record["location"] = location[0]["value"]
+    record["location"] = location[0]["value"] if location else None
     return record
 
 
+@timing.timed("services")
 def process_proposition(record: dict):
     """
     Processes a single proposition record from the API response into a simplified format for the propositions view.
@@ -201,11 +395,12 @@ def process_proposition(record: dict):
         record (dict): A proposition record from the API.
 
     Returns:
-        record (dict): A simplified proposition record.
+        record (records.Proposition): A simplified proposition record.
     """
     return simplify_proposition_record(record=record)
 
 
+@timing.timed("services")
 def process_propositions(records: list[dict]):
     """
     Processes proposition records from the API response into a simplified format for the propositions view.
@@ -220,6 +415,32 @@ def process_propositions(records: list[dict]):
     return categorize_propositions(records=simplified)
 
 
+@timing.timed("services")
+def process_proposition_rows(records: list[dict]):
+    """
+    Processes cached proposition records from the local database into rows for server-side proposition tables.
+
+    Args:
+        records (list[dict]): A list of serialized records from the Propositions table.
+
+    Returns:
+        list[dict]: A list of rows, with the predicate mapped for display.
+    """
+    return [
+        {
+            "id": record["id"],
+            "predicate": map_predict(string=record["predicate"]),
+            "biomarkers": record["biomarkers"],
+            "cancer_type": {"id": record["cancer_type_id"], "name": record["cancer_type_name"]},
+            "therapies": record["therapies"],
+            "organizations": record["by_agent"],
+            "statements_count": record["statements_count"],
+        }
+        for record in records
+    ]
+
+
+@timing.timed("services")
 def process_statement(record: dict):
     """
     Processes a single statement record from the API response into a simplified format for the statements view.
@@ -228,7 +449,7 @@ def process_statement(record: dict):
         record (dict): A list of statement records from the API.
 
     Returns:
-        dict: A dictionary of statements and their corresponding simplified records.
+        records.Statement: A simplified statement record.
     """
     document_extensions = (
         record
@@ -237,29 +458,40 @@ def process_statement(record: dict):
         .get("extensions")
     )
     agent = [ext for ext in document_extensions if ext['name'] == "agent"][0]['value']
-    return {
-        "id": record["id"],
-        "proposition": simplify_proposition_record(record=record["proposition"]),
-        "description": record["description"],
-        "direction": "Supports" if record["direction"] == "supports" else "Disputes",
-        "documents": [
-            {
-                "id": doc["id"],
-                "documentType": doc["documentType"],
-                "name": doc["name"],
-                "description": doc["description"],
-            }
+    indication = record.get("indication", None)
+    return record_types.Statement(
+        id=record["id"],
+        proposition=simplify_proposition_record(record=record["proposition"]),
+        description=record["description"],
+        direction="Supports" if record["direction"] == "supports" else "Disputes",
+        documents=tuple(
+            record_types.Document(
+                id=doc["id"],
+                documentType=doc["documentType"],
+                name=doc["name"],
+                description=doc["description"],
+            )
             for doc in record["reportedIn"]
-        ],
-        "agent": (
+        ),
+        agent=(
             agent["id"].upper()
-            if record.get("indication", None)
+            if indication
             else None
         ),
-        "raw": record,
-    }
+        indication=(
+            record_types.Indication(
+                id=indication["id"],
+                indication=indication["indication"],
+                document_type=indication["document"]["documentType"],
+                organization=record_types.Concept(id=agent["id"], name=agent["name"]),
+            )
+            if indication
+            else None
+        ),
+    )
 
 
+@timing.timed("services")
 def process_statements(records: list[dict]):
     """
     Processes statement records from the API response into a simplified format for the statements view.
@@ -268,7 +500,7 @@ def process_statements(records: list[dict]):
         records (list[dict]): A list of statement records from the API.
 
     Returns:
-        dict: A dictionary of statements and their corresponding simplified records.
+        list[records.Statement]: A list of simplified statement records.
     """
     new_records = []
     for record in records:
@@ -277,6 +509,40 @@ def process_statements(records: list[dict]):
     return new_records
 
 
+@timing.timed("services")
+def process_statement_rows(records: list[dict], propositions: list[dict]):
+    """
+    Processes cached statement records from the local database into rows for server-side statement tables.
+
+    Args:
+        records (list[dict]): A list of serialized records from the Statements table.
+        propositions (list[dict]): Serialized records from the Propositions table for the statements in `records`.
+
+    Returns:
+        list[dict]: A list of rows, each containing the statement's proposition.
+    """
+    rows_by_proposition = {
+        row["id"]: row for row in process_proposition_rows(records=propositions)
+    }
+    rows = []
+    for record in records:
+        proposition = rows_by_proposition[record["proposition_id"]]
+        rows.append(
+            {
+                "id": record["id"],
+                "predicate": proposition["predicate"],
+                "direction": "Supports" if record["direction"] == "supports" else "Disputes",
+                "description": record["description"],
+                "biomarkers": proposition["biomarkers"],
+                "cancer_type": proposition["cancer_type"],
+                "therapies": proposition["therapies"],
+                "organization": record["agent_id"].upper(),
+            }
+        )
+    return rows
+
+
+@timing.timed("services")
 def process_therapy(record: dict):
     """
     Process a therapy record from the API for use within the therapies view. Currently, this simply extracts the
@@ -291,11 +557,11 @@ def process_therapy(record: dict):
     therapy_strategy = get_extension(
         list_of_extensions=record.get("extensions"), name="therapy_strategy"
     )
-    record["therapy_strategy"] = ", ".join(therapy_strategy[0]["value"])
+    record["therapy_strategy"] = ", ".join(therapy_strategy[0]["value"]) if therapy_strategy else None
     therapy_type = get_extension(
         list_of_extensions=record.get("extensions"), name="therapy_type"
     )
-    record["therapy_type"] = therapy_type[0]["value"]
+    record["therapy_type"] = therapy_type[0]["value"] if therapy_type else None
     return record
 
 
@@ -304,31 +570,58 @@ def simplify_proposition_record(record: dict):
     Processes a proposition record from the API response into a simplified format, keeping only the necessary fields
     for the propositions view and reformatting some values.
 
+    Propositions do not change within a release, so the simplified fields are memoized by proposition id. Aggregates
+    depend on the request that returned the proposition and are always taken from `record`.
+
+    Args:
+        record (dict): A proposition record from the API.
+
+    Returns:
+        new_record (records.Proposition): A simplified proposition record.
+    """
+    simplified = simplified_propositions.get(record["id"])
+    if simplified is None:
+        simplified = simplify_proposition_fields(record=record)
+        simplified_propositions.set(record["id"], simplified)
+    if not record.get("aggregates"):
+        return simplified
+    return dataclasses.replace(
+        simplified,
+        aggregates=record_types.Aggregates.from_dict(record=record["aggregates"]),
+    )
+
+
+def simplify_proposition_fields(record: dict):
+    """
+    Extracts and sorts the fields of a proposition record that do not depend on the request that returned it.
+
     Args:
         record (dict): A proposition record from the API.
 
     Returns:
-        new_record (dict): A simplified proposition record.
+        new_record (records.Proposition): A simplified proposition record, without aggregates.
     """
-    new_record = {
-        "id": record["id"],
-        "type": record["type"],
-        "predicate": map_predict(string=record["predicate"]),
-        "aggregates": record.get("aggregates", {}),
-    }
     if record["type"] == "VariantTherapeuticResponseProposition":
         biomarkers = extract_biomarkers(biomarkers=record["biomarkers"])
-        new_record["biomarkers"] = sort_dicts_by_key(data=biomarkers, key="name")
-        new_record["cancer_type"] = extract_diseases(
-            disease=record["conditionQualifier"]
-        )
         therapies = extract_therapies(object_therapeutic=record["objectTherapeutic"])
-        new_record["therapies"] = sort_dicts_by_key(data=therapies, key="name")
-        new_record["proposition_type"] = "Therapeutic response"
+        cancer_type = extract_diseases(disease=record["conditionQualifier"])
+        return record_types.Proposition(
+            id=record["id"],
+            type=record["type"],
+            predicate=map_predict(string=record["predicate"]),
+            biomarkers=record_types.to_concepts(records=sort_dicts_by_key(data=biomarkers, key="name")),
+            cancer_type=record_types.Concept(id=cancer_type["id"], name=cancer_type["name"]),
+            therapies=record_types.to_concepts(records=sort_dicts_by_key(data=therapies, key="name")),
+            proposition_type="Therapeutic response",
+        )
     else:
         # We'll add if else statements as we support additional proposition types
-        print("This should not happen!")
-    return new_record
+        logger.warning("Unsupported proposition type %s for proposition %s", record["type"], record["id"])
+        return record_types.Proposition(
+            id=record["id"],
+            type=record["type"],
+            predicate=map_predict(string=record["predicate"]),
+        )
 
 
 def simplify_proposition_records(records: list[dict]):
@@ -340,7 +633,7 @@ def simplify_proposition_records(records: list[dict]):
         records (list[dict]): A list of proposition records from the API.
 
     Returns:
-        new_records (list[dict]): A list of simplified proposition records.
+        new_records (list[records.Proposition]): A list of simplified proposition records.
     """
     new_records = []
     for record in records:
@@ -0,0 +1,163 @@
+"""
+slow_requests.py
+
+Logs requests that take longer than a threshold, with enough detail to tell why: the route and its arguments, each
+MOAlmanac API request's URL, status, size, and duration, each SQL statement's rows and duration, and the time spent
+in each phase, including rendering templates.
+
+Records are handed to a queue once the response has been sent, and a background thread in each worker serializes
+them as JSON lines and writes them, so that writing never holds up a request. If the queue is full, e.g. because the
+disk is slow, records are dropped rather than waited for, and each record counts the records its worker dropped.
+
+The threshold and destination are set in the `slow_requests` section of the instance's config.ini. Records are
+written to the file named by `path`, reopened if it is rotated, or to standard error if no path is given.
+"""
+
+import atexit
+import datetime
+import flask
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import typing
+import werkzeug
+
+from . import timing
+
+QUEUE_SIZE = 1000
+
+_settings = {"threshold_ms": None, "path": None}
+_listener = {"pid": None, "listener": None, "handler": None}
+_listener_lock = threading.Lock()
+
+# Records this worker dropped because the queue was full
+dropped = 0
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records whose message is a dictionary as a JSON line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, default=str)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a bounded queue without formatting them, so that serialization happens on the listener's thread,
+    and drops records when the queue is full.
+    """
+
+    def enqueue(self, record: logging.LogRecord):
+        global dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure(config: typing.Mapping[str, str]):
+    """
+    Sets the threshold and destination of the slow-request log from the `slow_requests` section of the instance's
+    config.ini.
+
+    Args:
+        config (typing.Mapping[str, str]): The `slow_requests` section of the config, with `threshold_ms`, and
+            optionally `path`. A threshold of 0 or less disables the log.
+    """
+    threshold_ms = float(config.get("threshold_ms", 0) or 0)
+    _settings["threshold_ms"] = threshold_ms if threshold_ms > 0 else None
+    _settings["path"] = config.get("path") or None
+
+
+def finish_request(response: werkzeug.Response) -> werkzeug.Response:
+    """
+    Logs the current request once its response has been sent, if it took longer than the threshold.
+
+    Args:
+        response (werkzeug.Response): The response to the current request.
+
+    Returns:
+        werkzeug.Response: The response.
+    """
+    threshold_ms = _settings["threshold_ms"]
+    timings = timing.current()
+    if threshold_ms is None or timings is None:
+        return response
+
+    request = flask.request
+    app = flask.current_app._get_current_object()
+    entry = {
+        "method": request.method,
+        "path": request.path,
+        "endpoint": request.endpoint,
+        "view_args": request.view_args,
+        "args": request.args.to_dict(flat=False),
+        "status": response.status_code,
+    }
+
+    def log():
+        total_ms = timings.finish() * 1000
+        if total_ms < threshold_ms:
+            return
+        entry["time"] = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds")
+        entry["total_ms"] = round(total_ms, 1)
+        entry["threshold_ms"] = threshold_ms
+        entry["phases"] = {
+            phase: {"count": timings.counts[phase], "ms": round(timings.durations[phase] * 1000, 1)}
+            for phase in timing.PHASES
+        }
+        entry["upstream"] = timings.upstream
+        entry["queries"] = timings.queries
+        entry["dropped"] = dropped
+        get_logger(app=app).warning(entry)
+
+    response.call_on_close(log)
+    return response
+
+
+def get_logger(app: flask.Flask) -> logging.Logger:
+    """
+    Returns the slow-request logger, a child of the app's logger, starting this process's listener thread if it has
+    not been started. Listeners are started per process so that Gunicorn workers forked after the app was loaded each
+    run their own.
+
+    Args:
+        app (flask.Flask): The current app.
+
+    Returns:
+        logging.Logger: The slow-request logger.
+    """
+    logger = app.logger.getChild("slow_requests")
+    if _listener["pid"] == os.getpid():
+        return logger
+
+    with _listener_lock:
+        if _listener["pid"] != os.getpid():
+            if _listener["handler"] is not None:
+                logger.removeHandler(_listener["handler"])
+            path = _settings["path"]
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                target = logging.handlers.WatchedFileHandler(path)
+            else:
+                target = logging.StreamHandler()
+            target.setFormatter(JSONFormatter())
+            records = queue.Queue(maxsize=QUEUE_SIZE)
+            listener = logging.handlers.QueueListener(records, target)
+            listener.start()
+            atexit.register(listener.stop)
+
+            handler = QueueHandler(records)
+            logger.addHandler(handler)
+            logger.propagate = False
+            logger.setLevel(logging.WARNING)
+            _listener.update(pid=os.getpid(), listener=listener, handler=handler)
+    return logger
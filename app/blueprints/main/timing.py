@@ -0,0 +1,304 @@
+"""
+timing.py
+
+Per-request timing of the phases that pages spend their time in: requests to the MOAlmanac API, queries against the
+local cache database, processing in services.py, and rendering templates.
+
+Time is attributed to the innermost phase that is running, so a /search request made while a template renders counts
+towards `api` rather than `render`, and phase durations add up to the request's total along with `app`, the time
+spent outside of any phase. Each response is given a Server-Timing header with the duration and count of each phase,
+and a JSON line with the same breakdown and the API requests made is logged when the response has been sent. The SQL
+statements executed are also recorded, for the request profiler.
+Streamed pages finish rendering after their headers are sent, so their Server-Timing header only covers the time
+until the first bytes of the page.
+
+Measuring a phase costs two calls to time.perf_counter, so timing is always on.
+"""
+
+import contextlib
+import contextvars
+import flask
+import functools
+import json
+import logging
+import time
+import werkzeug
+
+PHASES = ("api", "db", "services", "render")
+
+# The current request's timings. A context variable is cheaper to read than flask.g, which matters for functions
+# called once per record.
+_timings = contextvars.ContextVar("timings", default=None)
+
+
+class Timings:
+    """
+    Durations and counts of each phase of a request, and the API requests and SQL statements it made.
+    """
+
+    def __init__(self):
+        """
+        Initializes the Timings class, starting the request's clock.
+        """
+        self.start = time.perf_counter()
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(PHASES, 0)
+        self.upstream = []
+        self.queries = []
+        self._stack = []
+        self._last = self.start
+
+    def enter(self, phase: str):
+        """
+        Starts a phase, pausing the phase it is called from.
+
+        Args:
+            phase (str): The phase to start, one of PHASES.
+        """
+        now = time.perf_counter()
+        if self._stack:
+            self.durations[self._stack[-1]] += now - self._last
+        self.counts[phase] += 1
+        self._stack.append(phase)
+        self._last = now
+
+    def exit(self):
+        """
+        Ends the innermost phase, resuming the phase it was called from.
+        """
+        if not self._stack:
+            return
+        now = time.perf_counter()
+        self.durations[self._stack.pop()] += now - self._last
+        self._last = now
+
+    def is_running(self, phase: str) -> bool:
+        """
+        Reports whether a phase is the innermost phase running.
+
+        Args:
+            phase (str): The phase, one of PHASES.
+
+        Returns:
+            bool: True if `phase` is running and has not called into another phase.
+        """
+        return bool(self._stack) and self._stack[-1] == phase
+
+    def finish(self) -> float:
+        """
+        Ends any phases still running, e.g. a template that raised an exception.
+
+        Returns:
+            float: The request's total duration in seconds.
+        """
+        while self._stack:
+            self.exit()
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """
+        Formats the phases measured so far as a Server-Timing header.
+
+        Returns:
+            str: The header's value, with durations in milliseconds.
+        """
+        total = time.perf_counter() - self.start
+        metrics = [
+            f'{phase};dur={self.durations[phase] * 1000:.1f};desc="calls={self.counts[phase]}"'
+            for phase in PHASES
+            if self.counts[phase]
+        ]
+        metrics.append(f"app;dur={(total - sum(self.durations.values())) * 1000:.1f}")
+        metrics.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+def current() -> Timings | None:
+    """
+    Returns the timings of the current request.
+
+    Returns:
+        Timings | None: The current request's timings, or None outside of a request, e.g. when populating the cache.
+    """
+    return _timings.get()
+
+
+def end_request():
+    """
+    Stops attributing time to the current request, once it has been torn down.
+    """
+    _timings.set(None)
+
+
+def finish_request(response: werkzeug.Response) -> werkzeug.Response:
+    """
+    Sets the Server-Timing header of a response, and logs the request's timings once the response has been sent.
+
+    Args:
+        response (werkzeug.Response): The response to the current request.
+
+    Returns:
+        werkzeug.Response: The response.
+    """
+    timings = current()
+    if timings is None:
+        return response
+
+    response.headers["Server-Timing"] = timings.server_timing()
+    request = flask.request
+    entry = {
+        "method": request.method,
+        "path": request.full_path if request.query_string else request.path,
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+    }
+    logger = get_logger(app=flask.current_app)
+    # Closing a response runs after a streamed response's last chunk has been rendered and sent
+    response.call_on_close(lambda: log(logger=logger, timings=timings, entry=entry))
+    return response
+
+
+def get_logger(app: flask.Flask) -> logging.Logger:
+    """
+    Returns the logger that request timings are logged to, a child of the app's logger. Its level defaults to INFO
+    so that timings are logged in production, unless a level has been configured.
+
+    Args:
+        app (flask.Flask): The current app.
+
+    Returns:
+        logging.Logger: The timing logger.
+    """
+    logger = app.logger.getChild("timing")
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    return logger
+
+
+def log(logger: logging.Logger, timings: Timings, entry: dict):
+    """
+    Logs a request's timings as a JSON line.
+
+    Args:
+        logger (logging.Logger): The logger to log to.
+        timings (Timings): The request's timings.
+        entry (dict): The request's method, path, endpoint, and response status.
+    """
+    total = timings.finish()
+    entry["total_ms"] = round(total * 1000, 1)
+    entry["phases"] = {
+        phase: {"count": timings.counts[phase], "ms": round(timings.durations[phase] * 1000, 1)}
+        for phase in PHASES
+    }
+    entry["upstream"] = timings.upstream
+    logger.info(json.dumps(entry))
+
+
+@contextlib.contextmanager
+def measure(phase: str):
+    """
+    Attributes the time spent within a `with` block to a phase of the current request.
+
+    Args:
+        phase (str): The phase, one of PHASES.
+    """
+    timings = current()
+    if timings is None or timings.is_running(phase):
+        yield
+        return
+    timings.enter(phase)
+    try:
+        yield
+    finally:
+        timings.exit()
+
+
+def record_query(statement: str, seconds: float):
+    """
+    Records a SQL statement executed against the local cache database by the current request.
+
+    Args:
+        statement (str): The statement, with placeholders for its parameters.
+        seconds (float): The time taken to execute it.
+    """
+    timings = current()
+    if timings is not None:
+        timings.queries.append({"statement": statement, "rows": None, "ms": round(seconds * 1000, 3)})
+
+
+def record_rows(rows: int):
+    """
+    Records the number of records returned by the last SQL statement the current request executed.
+
+    Args:
+        rows (int): The number of records.
+    """
+    timings = current()
+    if timings is not None and timings.queries:
+        timings.queries[-1]["rows"] = rows
+
+
+def record_upstream(url: str, status_code: int | None, size: int | None, seconds: float):
+    """
+    Records a request made to the MOAlmanac API by the current request.
+
+    Args:
+        url (str): The requested URL.
+        status_code (int | None): The response's status code, or None if the request failed.
+        size (int | None): The length of the response's body in bytes, or None if the request failed.
+        seconds (float): The time taken to receive the response.
+    """
+    timings = current()
+    if timings is not None:
+        timings.upstream.append(
+            {"url": url, "status": status_code, "bytes": size, "ms": round(seconds * 1000, 1)}
+        )
+
+
+def start_request():
+    """
+    Starts timing the current request.
+    """
+    _timings.set(Timings())
+
+
+def timed(phase: str):
+    """
+    Decorates a function so that the time spent in it is attributed to a phase of the current request.
+
+    Args:
+        phase (str): The phase, one of PHASES.
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            timings = current()
+            # Calls made from within the same phase, e.g. per record, are attributed to the outer call
+            if timings is None or timings.is_running(phase):
+                return function(*args, **kwargs)
+            timings.enter(phase)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings.exit()
+        return wrapper
+    return decorator
+
+
+def _enter_render(sender, template, context, **extra):
+    timings = current()
+    if timings is not None:
+        timings.enter("render")
+
+
+def _exit_render(sender, template, context, **extra):
+    timings = current()
+    if timings is not None:
+        timings.exit()
+
+
+flask.before_render_template.connect(_enter_render)
+flask.template_rendered.connect(_exit_render)
@@ -0,0 +1,313 @@
+"""
+export_static.py
+
+Renders every list and detail page of an instance to static HTML, so that nginx can serve pages directly and only
+fall back to Flask for requests that cannot be pre-rendered, such as searches with query strings.
+
+Pages only change when the local cache is repopulated, so an export is made once per release. Each page is written
+to `<path>/index.html` under the instance's static directory, along with compressed copies for nginx's gzip_static. A
+manifest records the release, the inputs the export was made from, and a digest of each page, so that repeating an
+export is a no-op and exporting a new release only rewrites pages whose content changed.
+"""
+
+import argparse
+import concurrent.futures
+import flask
+import hashlib
+import json
+import os
+import time
+import urllib.parse
+
+from . import create_app
+from . import database
+from . import precompress
+from .blueprints.main import conditional
+from .blueprints.main import requests
+from .blueprints.main import services
+
+MANIFEST = "manifest.json"
+PAGE = "index.html"
+
+# Set in each worker process by init_worker
+_client = None
+
+
+def digest_file(path: str) -> str:
+    """
+    Computes the sha256 digest of a file.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        str: The hex digest of the file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def digest_inputs(config_path: str, cache_path: str, api_url: str) -> str:
+    """
+    Computes a digest of everything an export is rendered from: the local cache, the instance's config, the API
+    used for detail pages, and the app's code, templates, and static files.
+
+    Args:
+        config_path (str): Path to the instance's config.ini.
+        cache_path (str): Path to the instance's local cache database.
+        api_url (str): URL for the MOAlmanac API.
+
+    Returns:
+        str: The hex digest of the export's inputs.
+    """
+    digest = hashlib.sha256()
+    digest.update(api_url.encode())
+    digest.update(digest_file(path=config_path).encode())
+    digest.update(digest_file(path=cache_path).encode())
+    digest.update(conditional.app_digest()[0].encode())
+    return digest.hexdigest()
+
+
+def get_page_path(output_dir: str, url: str) -> str:
+    """
+    Returns the file a page is written to. Paths are percent-decoded, matching nginx's $uri.
+
+    Args:
+        output_dir (str): The instance's static directory.
+        url (str): The page's URL path.
+
+    Returns:
+        str: Path to the page's index.html.
+
+    Raises:
+        ValueError: If the page's path resolves outside of `output_dir`.
+    """
+    path = urllib.parse.unquote(urllib.parse.urlsplit(url).path).lstrip("/")
+    root = os.path.abspath(output_dir)
+    page_path = os.path.abspath(os.path.join(root, path, PAGE))
+    if os.path.commonpath([root, page_path]) != root:
+        raise ValueError(f"Page {url} resolves outside of {output_dir}")
+    return page_path
+
+
+def get_urls() -> list[str]:
+    """
+    Lists the URL of every page to export, for entities in the local cache. Must be called within an application
+    and request context.
+
+    Returns:
+        list[str]: URL paths of list pages, detail pages, and the propositions tables that detail pages load.
+    """
+    urls = [
+        flask.url_for("index"),
+        flask.url_for("main.about"),
+        flask.url_for("main.search"),
+    ]
+    entities = [
+        ("biomarkers", "biomarker_name", "biomarker", "name", requests.Local.get_biomarkers()),
+        ("diseases", "disease_name", "disease", "name", requests.Local.get_diseases()),
+        ("documents", "document_id", "document", "id", requests.Local.get_documents()),
+        ("genes", "gene_symbol", "gene", "name", requests.Local.get_genes()),
+        ("indications", "indication_id", "indication", "id", requests.Local.get_indications()),
+        ("organizations", "organization_id", None, "id", requests.Local.get_organizations()),
+        ("propositions", "proposition_id", None, "id", requests.Local.get_propositions()),
+        ("statements", "statement_id", None, "id", requests.Local.get_table(table="statements", length=-1)["data"]),
+        ("therapies", "therapy_name", "therapy", "name", requests.Local.get_therapies()),
+    ]
+    for endpoint, argument, entity, field, records in entities:
+        urls.append(flask.url_for(f"main.{endpoint}"))
+        for record in records:
+            urls.append(flask.url_for(f"main.{endpoint}", **{argument: record[field]}))
+            if entity in services.PROPOSITION_TABLE_ENTITIES:
+                urls.append(flask.url_for("main.proposition_tables", entity=entity, value=record[field]))
+    return list(dict.fromkeys(urls))
+
+
+def init_worker(config_path: str, api_url: str):
+    """
+    Creates the app and a test client in each worker process.
+
+    Args:
+        config_path (str): Path to the instance's config.ini.
+        api_url (str): URL for the MOAlmanac API.
+    """
+    global _client
+    # Render from the instance's own cache, rather than the active instance that data/cache.sqlite3 links to
+    app = create_app(config_path=config_path, api=api_url, populating=True)
+    _client = app.test_client()
+
+
+def read_manifest(output_dir: str) -> dict:
+    """
+    Reads the manifest of the previous export to `output_dir`.
+
+    Args:
+        output_dir (str): The instance's static directory.
+
+    Returns:
+        dict: The manifest, or an empty manifest if there was no previous export.
+    """
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"release": None, "inputs": None, "pages": {}}
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def remove_page(output_dir: str, url: str):
+    """
+    Removes a page, and its compressed copy, that is no longer part of the export.
+
+    Args:
+        output_dir (str): The instance's static directory.
+        url (str): The page's URL path.
+    """
+    page_path = get_page_path(output_dir=output_dir, url=url)
+    for path in (page_path, f"{page_path}.gz", f"{page_path}.br"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def render_page(url: str, output_dir: str, previous_digest: str | None) -> tuple[str, int, str | None, bool]:
+    """
+    Renders a page in a worker process, writing it and its compressed copies if its content changed since the
+    previous export.
+
+    Args:
+        url (str): The page's URL path.
+        output_dir (str): The instance's static directory.
+        previous_digest (str | None): The page's digest in the previous export's manifest, if any.
+
+    Returns:
+        tuple[str, int, str | None, bool]: The page's URL, response status code, digest if the page was rendered,
+            and whether it was written.
+    """
+    response = _client.get(url)
+    if response.status_code != 200:
+        return url, response.status_code, None, False
+
+    content = response.get_data()
+    digest = hashlib.sha256(content).hexdigest()
+    page_path = get_page_path(output_dir=output_dir, url=url)
+    if digest == previous_digest and os.path.exists(page_path):
+        return url, response.status_code, digest, False
+
+    os.makedirs(os.path.dirname(page_path), exist_ok=True)
+    write_atomic(path=page_path, content=content)
+    precompress.write_siblings(path=page_path, content=content)
+    return url, response.status_code, digest, True
+
+
+def write_atomic(path: str, content: bytes):
+    """
+    Writes a file by renaming a temporary file over it, so nginx never serves a partially written page.
+
+    Args:
+        path (str): Path to write.
+        content (bytes): The file's content.
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as fp:
+        fp.write(content)
+    os.replace(temporary_path, path)
+
+
+def main(config_path: str, api_url: str = "https://api.moalmanac.org", processes: int | None = None,
+         force: bool = False) -> dict:
+    """
+    Exports every page of an instance to its static directory.
+
+    Args:
+        config_path (str): Path to the instance's config.ini.
+        api_url (str): URL for the MOAlmanac API.
+        processes (int | None): Number of worker processes, defaulting to the number of CPUs.
+        force (bool): Render all pages even if the export's inputs have not changed.
+
+    Returns:
+        dict: Counts of pages rendered, written, unchanged, removed, and failed.
+    """
+    config = database.read_config_ini(path=config_path)
+    output_dir = os.path.join("data", config["app"].get("static", "static"))
+    cache_path = os.path.abspath(os.path.join("data", config["app"]["cache"]))
+
+    app = create_app(config_path=config_path, api=api_url, populating=True)
+    with app.test_request_context():
+        release = requests.Local.get_about()["release"]
+        urls = get_urls()
+
+    manifest = read_manifest(output_dir=output_dir)
+    inputs = digest_inputs(config_path=config_path, cache_path=cache_path, api_url=api_url)
+    summary = {"rendered": 0, "written": 0, "unchanged": 0, "removed": 0, "failed": 0}
+    if not force and manifest["inputs"] == inputs and set(manifest["pages"]) == set(urls):
+        print(f"Static export in {output_dir} is up to date for release {release}")
+        summary["unchanged"] = len(urls)
+        return summary
+
+    os.makedirs(output_dir, exist_ok=True)
+    pages = {}
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes, initializer=init_worker, initargs=(config_path, api_url)
+    ) as executor:
+        futures = [
+            executor.submit(render_page, url, output_dir, manifest["pages"].get(url))
+            for url in urls
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            url, status_code, digest, written = future.result()
+            if digest is None:
+                print(f"Skipping {url}, which returned {status_code}")
+                summary["failed"] += 1
+                continue
+            pages[url] = digest
+            summary["rendered"] += 1
+            summary["written" if written else "unchanged"] += 1
+
+    for url in set(manifest["pages"]) - set(pages):
+        remove_page(output_dir=output_dir, url=url)
+        summary["removed"] += 1
+
+    manifest = {"release": release, "inputs": inputs, "pages": dict(sorted(pages.items()))}
+    write_atomic(
+        path=os.path.join(output_dir, MANIFEST),
+        content=json.dumps(manifest, indent=2).encode(),
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        prog="Export web browser pages to static html",
+        description="Render every list and detail page of each config's instance for nginx to serve directly",
+    )
+    arg_parser.add_argument(
+        "-a",
+        "--api",
+        choices=["http://localhost:8000", "https://api.moalmanac.org"],
+        default="https://api.moalmanac.org",
+        help="URL for the MOAlmanac API",
+    )
+    arg_parser.add_argument(
+        "-c", "--config", action="append", help="Path to config file", required=True
+    )
+    arg_parser.add_argument(
+        "-p", "--processes", type=int, default=None, help="Number of worker processes, defaults to the number of CPUs"
+    )
+    arg_parser.add_argument(
+        "-f", "--force", help="Render all pages even if the cache and app are unchanged", action="store_true"
+    )
+    args = arg_parser.parse_args()
+
+    for config_file in args.config:
+        print(f"Exporting static pages for {config_file}...")
+        start = time.perf_counter()
+        counts = main(
+            config_path=config_file,
+            api_url=args.api,
+            processes=args.processes,
+            force=args.force,
+        )
+        elapsed = time.perf_counter() - start
+        print(", ".join(f"{count} {name}" for name, count in counts.items()) + f" in {elapsed:.1f}s")
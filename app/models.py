@@ -57,6 +57,15 @@ class Documents(Base):
     indications_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
     statements_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
 
+class Facets(Base):
+    __tablename__ = "facets"
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    facet = sqlalchemy.Column(sqlalchemy.String, nullable=False, index=True)
+    value = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    label = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    propositions_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+
 class Genes(Base):
     __tablename__ = "genes"
 
@@ -77,6 +86,42 @@ class Indications(Base):
     agent_name = sqlalchemy.Column(sqlalchemy.String, nullable=False)
     statements_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
 
+class OrganizationPropositions(Base):
+    __tablename__ = "organization_propositions"
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    agent_id = sqlalchemy.Column(sqlalchemy.String, nullable=False, index=True)
+    proposition_id = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, index=True)
+    statements_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+
+class Propositions(Base):
+    __tablename__ = "propositions"
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    type = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    predicate = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    biomarkers = sqlalchemy.Column(sqlalchemy.JSON, nullable=False)
+    biomarker_names = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    cancer_type_id = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+    cancer_type_name = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    therapies = sqlalchemy.Column(sqlalchemy.JSON, nullable=False)
+    therapy_names = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    genes = sqlalchemy.Column(sqlalchemy.JSON, nullable=False)
+    by_agent = sqlalchemy.Column(sqlalchemy.JSON, nullable=False)
+    statements_count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+
+class Statements(Base):
+    __tablename__ = "statements"
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    proposition_id = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, index=True)
+    description = sqlalchemy.Column(sqlalchemy.String, nullable=True)
+    direction = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    agent_id = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    document_id = sqlalchemy.Column(sqlalchemy.String, nullable=False)
+    document_name = sqlalchemy.Column(sqlalchemy.String, nullable=True)
+    indication_id = sqlalchemy.Column(sqlalchemy.String, nullable=True)
+
 class Therapies(Base):
     __tablename__ = "therapies"
 
@@ -1,6 +1,7 @@
 import argparse
 import configparser
 import flask
+import json
 import os
 import pandas
 import requests
@@ -14,10 +15,13 @@ from sqlalchemy.orm import sessionmaker
 from . import create_app
 from . import database
 from . import models
+from . import profiling
+from .blueprints.main import services
 
 
 class Process:
     @classmethod
+    @profiling.stage
     def agents(cls, document_records, indication_records):
         counts_by_documents = document_records.groupby(["agent_name"])[
             "statements_count"
@@ -72,6 +76,7 @@ class Process:
         return counts_by_agent
 
     @classmethod
+    @profiling.stage
     def biomarkers(cls, biomarker_records):
         biomarker_to_proposition_count = cls.get_counts(
             ids=biomarker_records.get("id").unique(),
@@ -96,6 +101,7 @@ class Process:
         ).drop_duplicates()
 
     @classmethod
+    @profiling.stage
     def diseases(cls, disease_records):
         disease_to_proposition_count = cls.get_counts(
             ids=disease_records.get("id").unique(),
@@ -120,6 +126,7 @@ class Process:
         ).drop_duplicates()
 
     @classmethod
+    @profiling.stage
     def documents(cls, document_records, indication_records):
         document_to_statement_count = cls.get_counts(
             ids=document_records.get("id").unique(),
@@ -150,6 +157,29 @@ class Process:
         return document_records.drop("statement_id", axis="columns").drop_duplicates()
 
     @classmethod
+    @profiling.stage
+    def facets(cls, proposition_records, agent_records):
+        """
+        Precomputes the number of propositions for each value of the search page's facets.
+        """
+        organization_counts = {}
+        for proposition in proposition_records:
+            for agent in proposition["by_agent"]:
+                organization_counts[agent["id"]] = organization_counts.get(agent["id"], 0) + 1
+
+        agent_names = {agent["id"]: agent["name"] for agent in agent_records}
+        return [
+            {
+                "facet": "organization",
+                "value": agent_id,
+                "label": agent_names.get(agent_id, agent_id),
+                "propositions_count": organization_counts[agent_id],
+            }
+            for agent_id in sorted(organization_counts)
+        ]
+
+    @classmethod
+    @profiling.stage
     def genes(cls, gene_records):
         gene_to_biomarker_count = cls.get_counts(
             ids=gene_records.get("id").unique(),
@@ -231,6 +261,53 @@ class Process:
             "statement_id": statement_id,
         }
 
+    @classmethod
+    def get_proposition(cls, record):
+        biomarkers = services.sort_dicts_by_key(
+            data=services.extract_biomarkers(biomarkers=record.get("biomarkers")),
+            key="name",
+        )
+        therapies = services.sort_dicts_by_key(
+            data=services.extract_therapies(
+                object_therapeutic=record.get("objectTherapeutic")
+            ),
+            key="name",
+        )
+        cancer_type = services.extract_diseases(disease=record.get("conditionQualifier"))
+        genes = {}
+        for biomarker in record.get("biomarkers"):
+            for gene in biomarker.get("genes", []):
+                genes[gene.get("id")] = {"id": gene.get("id"), "name": gene.get("name")}
+        return {
+            "id": record.get("id"),
+            "type": record.get("type"),
+            "predicate": record.get("predicate"),
+            "biomarkers": biomarkers,
+            "biomarker_names": ", ".join(biomarker["name"] for biomarker in biomarkers),
+            "cancer_type_id": cancer_type.get("id"),
+            "cancer_type_name": cancer_type.get("name"),
+            "therapies": therapies,
+            "therapy_names": ", ".join(therapy["name"] for therapy in therapies),
+            "genes": services.sort_dicts_by_key(data=list(genes.values()), key="name"),
+        }
+
+    @classmethod
+    def get_statement(cls, record):
+        indication = record.get("indication")
+        doc_extensions = indication.get("document").get("extensions")
+        agent = [ext for ext in doc_extensions if ext['name'] == "agent"][0]['value']
+        document = record.get("reportedIn")[0]
+        return {
+            "id": record.get("id"),
+            "proposition_id": record.get("proposition").get("id"),
+            "description": record.get("description"),
+            "direction": record.get("direction"),
+            "agent_id": agent.get("id"),
+            "document_id": document.get("id"),
+            "document_name": document.get("name"),
+            "indication_id": indication.get("id"),
+        }
+
     @staticmethod
     def get_value_by_name(data, name):
         """
@@ -318,6 +395,7 @@ class Process:
             ]
 
     @classmethod
+    @profiling.stage
     def indications(cls, indication_records):
         indication_to_statement_count = cls.get_counts(
             ids=indication_records.get("id").unique(),
@@ -336,10 +414,55 @@ class Process:
         return indication_records.drop("statement_id", axis="columns").drop_duplicates()
 
     @classmethod
+    @profiling.stage
+    def organization_propositions(cls, proposition_records):
+        """
+        Maps each organization to the propositions supported by its statements, so that an organization's
+        propositions can be read without retrieving all propositions.
+        """
+        return [
+            {
+                "agent_id": agent["id"],
+                "proposition_id": proposition["id"],
+                "statements_count": agent["count"],
+            }
+            for proposition in proposition_records
+            for agent in proposition["by_agent"]
+        ]
+
+    @classmethod
+    @profiling.stage
     def propositions(cls, statements):
         return {statement.get("proposition").get("id") for statement in statements}
 
     @classmethod
+    @profiling.stage
+    def proposition_records(cls, records, statement_records):
+        """
+        Simplifies each distinct proposition and aggregates its statements by organization, mirroring the
+        `aggregates.by_agent` field returned by the API's /search endpoint.
+        """
+        agents_by_proposition = {}
+        for statement in statement_records:
+            counts = agents_by_proposition.setdefault(statement["proposition_id"], {})
+            counts[statement["agent_id"]] = counts.get(statement["agent_id"], 0) + 1
+
+        proposition_records = {}
+        for record in records:
+            proposition = record.get("proposition")
+            if proposition.get("id") in proposition_records:
+                continue
+            proposition_record = cls.get_proposition(record=proposition)
+            counts = agents_by_proposition.get(proposition.get("id"), {})
+            proposition_record["by_agent"] = [
+                {"id": agent_id, "count": counts[agent_id]} for agent_id in sorted(counts)
+            ]
+            proposition_record["statements_count"] = sum(counts.values())
+            proposition_records[proposition.get("id")] = proposition_record
+        return list(proposition_records.values())
+
+    @classmethod
+    @profiling.stage
     def statements(cls, records):
         agent_records = []
         biomarker_records = []
@@ -347,9 +470,11 @@ class Process:
         document_records = []
         gene_records = []
         indication_records = []
+        statement_records = []
         therapy_records = []
         for record in records:
             statement_id = record.get("id")
+            statement_records.append(cls.get_statement(record=record))
             for document in record.get("reportedIn"):
                 record_document = cls.get_document(
                     record=document,
@@ -417,14 +542,30 @@ class Process:
         therapy_records = cls.therapies(therapy_records=therapy_records)
 
         propositions = cls.propositions(statements=records)
+        proposition_records = cls.proposition_records(
+            records=records,
+            statement_records=statement_records,
+        )
+
+        organization_proposition_records = cls.organization_propositions(
+            proposition_records=proposition_records,
+        )
+        facet_records = cls.facets(
+            proposition_records=proposition_records,
+            agent_records=agent_records.to_dict(orient="records"),
+        )
 
         return {
             "agents": agent_records.to_dict(orient="records"),
             "biomarkers": biomarker_records.to_dict(orient="records"),
             "diseases": disease_records.to_dict(orient="records"),
             "documents": document_records.to_dict(orient="records"),
+            "facets": facet_records,
             "genes": gene_records.to_dict(orient="records"),
             "indications": indication_records.to_dict(orient="records"),
+            "organization_propositions": organization_proposition_records,
+            "propositions": proposition_records,
+            "statements": statement_records,
             "therapies": therapy_records.to_dict(orient="records"),
             "documents_count": document_records.to_dict(orient="records").__len__(),
             "indications_count": indication_records.to_dict(orient="records").__len__(),
@@ -434,6 +575,7 @@ class Process:
         }
 
     @classmethod
+    @profiling.stage
     def therapies(cls, therapy_records):
         therapy_to_proposition_count = cls.get_counts(
             ids=therapy_records.get("id").unique(),
@@ -507,6 +649,7 @@ class Requests:
 
 class SQL:
     @classmethod
+    @profiling.stage
     def add_about(cls, record, session):
         about = models.About(
             last_updated=record.get("last_updated"),
@@ -519,6 +662,7 @@ class SQL:
         session.add(about)
 
     @classmethod
+    @profiling.stage
     def add_agents(cls, records, session):
         for record in records:
             agent = models.Agents(
@@ -533,6 +677,7 @@ class SQL:
             session.add(agent)
 
     @classmethod
+    @profiling.stage
     def add_biomarkers(cls, records, session):
         for record in records:
             biomarker = models.Biomarkers(
@@ -546,6 +691,7 @@ class SQL:
             session.commit()
 
     @classmethod
+    @profiling.stage
     def add_diseases(cls, records, session):
         for record in records:
             disease = models.Diseases(
@@ -557,6 +703,7 @@ class SQL:
             session.add(disease)
 
     @classmethod
+    @profiling.stage
     def add_documents(cls, records, session):
         for record in records:
             document = models.Documents(
@@ -572,6 +719,20 @@ class SQL:
             session.add(document)
 
     @classmethod
+    @profiling.stage
+    def add_facets(cls, records, session):
+        for index, record in enumerate(records):
+            facet = models.Facets(
+                id=index,
+                facet=record.get("facet"),
+                value=record.get("value"),
+                label=record.get("label"),
+                propositions_count=record.get("propositions_count"),
+            )
+            session.add(facet)
+
+    @classmethod
+    @profiling.stage
     def add_genes(cls, records, session):
         for record in records:
             gene = models.Genes(
@@ -584,6 +745,7 @@ class SQL:
             session.add(gene)
 
     @classmethod
+    @profiling.stage
     def add_indications(cls, records, session):
         for record in records:
             indication = models.Indications(
@@ -598,6 +760,55 @@ class SQL:
             session.add(indication)
 
     @classmethod
+    @profiling.stage
+    def add_organization_propositions(cls, records, session):
+        for index, record in enumerate(records):
+            organization_proposition = models.OrganizationPropositions(
+                id=index,
+                agent_id=record.get("agent_id"),
+                proposition_id=record.get("proposition_id"),
+                statements_count=record.get("statements_count"),
+            )
+            session.add(organization_proposition)
+
+    @classmethod
+    @profiling.stage
+    def add_propositions(cls, records, session):
+        for record in records:
+            proposition = models.Propositions(
+                id=record.get("id"),
+                type=record.get("type"),
+                predicate=record.get("predicate"),
+                biomarkers=record.get("biomarkers"),
+                biomarker_names=record.get("biomarker_names"),
+                cancer_type_id=record.get("cancer_type_id"),
+                cancer_type_name=record.get("cancer_type_name"),
+                therapies=record.get("therapies"),
+                therapy_names=record.get("therapy_names"),
+                genes=record.get("genes"),
+                by_agent=record.get("by_agent"),
+                statements_count=record.get("statements_count"),
+            )
+            session.add(proposition)
+
+    @classmethod
+    @profiling.stage
+    def add_statements(cls, records, session):
+        for record in records:
+            statement = models.Statements(
+                id=record.get("id"),
+                proposition_id=record.get("proposition_id"),
+                description=record.get("description"),
+                direction=record.get("direction"),
+                agent_id=record.get("agent_id"),
+                document_id=record.get("document_id"),
+                document_name=record.get("document_name"),
+                indication_id=record.get("indication_id"),
+            )
+            session.add(statement)
+
+    @classmethod
+    @profiling.stage
     def add_terms(cls, results, session):
         tables = ["biomarkers", "diseases", "documents", "genes", "therapies"]
         count = 0
@@ -613,6 +824,7 @@ class SQL:
                 count += 1
 
     @classmethod
+    @profiling.stage
     def add_therapies(cls, records, session):
         for record in records:
             therapy = models.Therapies(
@@ -624,9 +836,15 @@ class SQL:
             )
             session.add(therapy)
 
+    @staticmethod
+    @profiling.stage
+    def commit(session):
+        session.commit()
+
 
 class Service:
     @classmethod
+    @profiling.stage
     def get(cls, api):
         response = Requests.get_service(root_url=api)
         if response.status_code == 200:
@@ -645,6 +863,7 @@ class Statements:
         ]
 
     @classmethod
+    @profiling.stage
     def get(cls, agency_preferences, api):
         filters = cls.make_organization_filter(settings=agency_preferences)
         response = Requests.get_statements(root_url=api, filters=filters)
@@ -670,7 +889,8 @@ def delete_sqlite_db(path):
 
 
 def main(config_path, api_url="https://api.moalmanac.org"):
-    app = create_app(config_path=config_path, populating=True)
+    with profiling.measure("create_app"):
+        app = create_app(config_path=config_path, populating=True)
     with app.app_context():
         config = database.read_config_ini(path=config_path)
         about = Service.get(api=api_url)
@@ -689,30 +909,44 @@ def main(config_path, api_url="https://api.moalmanac.org"):
         session = flask.current_app.config["SESSION_FACTORY"]()
         try:
             SQL.add_about(record=about, session=session)
-            session.commit()
+            SQL.commit(session=session)
 
             SQL.add_agents(records=results.get("agents"), session=session)
 
             SQL.add_biomarkers(records=results.get("biomarkers"), session=session)
-            session.commit()
+            SQL.commit(session=session)
 
             SQL.add_diseases(records=results.get("diseases"), session=session)
-            session.commit()
+            SQL.commit(session=session)
 
             SQL.add_documents(records=results.get("documents"), session=session)
-            session.commit()
+            SQL.commit(session=session)
+
+            SQL.add_facets(records=results.get("facets"), session=session)
+            SQL.commit(session=session)
 
             SQL.add_genes(records=results.get("genes"), session=session)
-            session.commit()
+            SQL.commit(session=session)
 
             SQL.add_indications(records=results.get("indications"), session=session)
-            session.commit()
+            SQL.commit(session=session)
+
+            SQL.add_organization_propositions(
+                records=results.get("organization_propositions"), session=session
+            )
+            SQL.commit(session=session)
+
+            SQL.add_propositions(records=results.get("propositions"), session=session)
+            SQL.commit(session=session)
+
+            SQL.add_statements(records=results.get("statements"), session=session)
+            SQL.commit(session=session)
 
             SQL.add_therapies(records=results.get("therapies"), session=session)
-            session.commit()
+            SQL.commit(session=session)
 
             SQL.add_terms(results=results, session=session)
-            session.commit()
+            SQL.commit(session=session)
         except Exception as e:
             print(f"Error occurred: {e}")
             session.rollback()
@@ -739,15 +973,50 @@ if __name__ == "__main__":
     arg_parser.add_argument(
         "-d", "--drop-tables", help="Drop tables before populating", action="store_true"
     )
+    arg_parser.add_argument(
+        "--profile",
+        help="Time each stage and measure its memory, writing a JSON report to this path",
+    )
+    arg_parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        help="Lines that allocated the most memory to report per stage when profiling, 0 for none",
+    )
+    arg_parser.add_argument(
+        "--pstats",
+        help="Write cProfile statistics to this path when profiling, suffixed with the instance for multiple configs",
+    )
     args = arg_parser.parse_args()
 
+    reports = {}
     for config_file in args.config:
         if args.drop_tables:
             cache_file = database.read_config_ini(path=config_file)["app"]["cache"]
             cache_path = os.path.join("data", cache_file)
             delete_sqlite_db(path=cache_path)
         print(f"Populating database for {config_file}...")
-        main(
-            config_path=config_file,
-            api_url=args.api,
-        )
+        if args.profile is None:
+            main(
+                config_path=config_file,
+                api_url=args.api,
+            )
+            continue
+
+        pstats_path = args.pstats
+        if pstats_path and len(args.config) > 1:
+            instance = os.path.basename(os.path.dirname(os.path.abspath(config_file)))
+            root, extension = os.path.splitext(pstats_path)
+            pstats_path = f"{root}-{instance}{extension}"
+        with profiling.Profiler(top=args.profile_top, pstats_path=pstats_path) as profiler:
+            main(
+                config_path=config_file,
+                api_url=args.api,
+            )
+        reports[config_file] = profiler.report()
+        profiling.print_report(report=reports[config_file])
+
+    if args.profile is not None:
+        with open(args.profile, "w") as fp:
+            json.dump({"api": args.api, "configs": reports}, fp, indent=2)
+        print(f"Wrote profile to {args.profile}")
@@ -0,0 +1,117 @@
+"""
+precompress.py
+
+Writes `.gz` and, if the optional brotli package is installed, `.br` siblings of compressible files, so that static
+files and exported pages are compressed once at build time rather than per request. The app sends static files from
+these siblings when the client accepts them, and nginx's gzip_static serves the `.gz` siblings of exported pages.
+
+Usage:
+    python -m app.precompress [directory ...]
+
+Directories default to app/static.
+"""
+
+import argparse
+import gzip
+import os
+
+from .blueprints.main import compression
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (".css", ".html", ".js", ".json", ".map", ".svg", ".txt")
+
+
+def compress_file(path: str) -> int:
+    """
+    Writes the compressed siblings of a file that are missing or older than the file.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        int: The number of siblings written.
+    """
+    modified = os.stat(path).st_mtime
+    stale = [
+        encoding
+        for encoding, extension in compression.EXTENSIONS.items()
+        if (encoding != "br" or brotli is not None)
+        and (not os.path.exists(f"{path}.{extension}") or os.stat(f"{path}.{extension}").st_mtime < modified)
+    ]
+    if not stale:
+        return 0
+    with open(path, "rb") as fp:
+        content = fp.read()
+    return write_siblings(path=path, content=content, encodings=stale)
+
+
+def compress_directory(directory: str) -> int:
+    """
+    Writes compressed siblings for every compressible file within a directory.
+
+    Args:
+        directory (str): The directory to walk.
+
+    Returns:
+        int: The number of siblings written.
+    """
+    written = 0
+    for root, dirs, files in os.walk(directory):
+        for name in sorted(files):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                written += compress_file(path=os.path.join(root, name))
+    return written
+
+
+def write_siblings(path: str, content: bytes, encodings: list[str] | None = None) -> int:
+    """
+    Writes compressed siblings of a file with the maximum compression levels. Files smaller than
+    compression.MINIMUM_SIZE are left uncompressed, matching responses compressed per request.
+
+    Args:
+        path (str): Path to the file.
+        content (bytes): The file's content.
+        encodings (list[str] | None): Encodings to write, defaulting to all available encodings.
+
+    Returns:
+        int: The number of siblings written.
+    """
+    if len(content) < compression.MINIMUM_SIZE:
+        return 0
+    if encodings is None:
+        encodings = ["gzip"] + (["br"] if brotli is not None else [])
+
+    written = 0
+    for encoding in encodings:
+        if encoding == "br":
+            compressed = brotli.compress(content, quality=11)
+        else:
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        sibling = f"{path}.{compression.EXTENSIONS[encoding]}"
+        with open(f"{sibling}.tmp", "wb") as fp:
+            fp.write(compressed)
+        os.replace(f"{sibling}.tmp", sibling)
+        written += 1
+    return written
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        prog="Precompress web browser static files",
+        description="Write .gz and .br siblings of compressible files",
+    )
+    arg_parser.add_argument(
+        "directories",
+        nargs="*",
+        default=[os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")],
+        help="Directories to precompress, defaults to app/static",
+    )
+    args = arg_parser.parse_args()
+
+    for directory in args.directories:
+        count = compress_directory(directory=directory)
+        print(f"Wrote {count} compressed files in {directory}")
@@ -0,0 +1,219 @@
+"""
+profiling.py
+
+Profiles the stages of long-running commands, such as populating a local cache: the wall and CPU time of each stage,
+the process's peak resident memory, and the memory allocated by each stage along with the lines that allocated it.
+
+Stages are functions decorated with `stage`, or blocks within `measure`, and are only profiled while a Profiler is
+active, so that decorated functions cost a single check otherwise. Stages may be nested; each stage's measurements
+include those of the stages within it, less the time spent measuring them.
+
+Allocations are traced with tracemalloc while a Profiler is active, and cProfile optionally records every call, both
+of which slow Python code down, so stage times are best compared with each other rather than with unprofiled runs.
+"""
+
+import contextlib
+import cProfile
+import functools
+import resource
+import sys
+import time
+import tracemalloc
+
+# The active profiler, if any
+_profiler = None
+
+
+class Profiler:
+    """
+    Measurements of each stage run while the profiler is active, used as a context manager.
+    """
+
+    def __init__(self, top: int = 10, pstats_path: str | None = None):
+        """
+        Initializes the Profiler class.
+
+        Args:
+            top (int): The number of lines that allocated the most memory to report for each stage, or 0 to skip
+                comparing tracemalloc snapshots, which is slow when many objects are allocated.
+            pstats_path (str | None): Path to write cProfile statistics for everything run while the profiler is
+                active to, readable with the pstats module or e.g. snakeviz, or None to not run cProfile. Statistics
+                include the profiler's own calls, under Profiler.stage.
+        """
+        self.top = top
+        self.pstats_path = pstats_path
+        self.stages = []
+        self._stack = []
+        self._cprofile = None
+        self._start = None
+        self._overhead = 0.0
+
+    def __enter__(self):
+        global _profiler
+        if _profiler is not None:
+            raise RuntimeError("A profiler is already active")
+        _profiler = self
+        tracemalloc.start()
+        if self.pstats_path is not None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _profiler
+        self.elapsed = time.perf_counter() - self._start
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.pstats_path)
+        tracemalloc.stop()
+        _profiler = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Measures a stage run within a `with` block.
+
+        Args:
+            name (str): The stage's name, e.g. the qualified name of the function it runs.
+        """
+        overhead_start = (time.perf_counter(), time.process_time())
+        entry = {"name": name, "depth": len(self._stack)}
+        self.stages.append(entry)
+        self._update_peaks()
+        snapshot = tracemalloc.take_snapshot() if self.top else None
+        tracemalloc.reset_peak()
+        traced_start = tracemalloc.get_traced_memory()[0]
+        max_rss_start = get_max_rss()
+        frame = {"peak": traced_start, "overhead": [0.0, 0.0]}
+        start = (time.perf_counter(), time.process_time())
+        self._add_overhead(start=overhead_start, end=start)
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            end = (time.perf_counter(), time.process_time())
+            # Time spent measuring stages within this one is not part of this stage
+            entry["wall_ms"] = round((end[0] - start[0] - frame["overhead"][0]) * 1000, 3)
+            entry["cpu_ms"] = round((end[1] - start[1] - frame["overhead"][1]) * 1000, 3)
+            self._update_peaks()
+            self._stack.pop()
+            traced_end = tracemalloc.get_traced_memory()[0]
+            entry["allocated_peak_kib"] = round((frame["peak"] - traced_start) / 1024, 1)
+            entry["allocated_retained_kib"] = round((traced_end - traced_start) / 1024, 1)
+            entry["max_rss_kib"] = get_max_rss()
+            entry["max_rss_growth_kib"] = entry["max_rss_kib"] - max_rss_start
+            if snapshot is not None:
+                differences = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+                entry["top_allocations"] = [
+                    {
+                        "location": f"{difference.traceback[0].filename}:{difference.traceback[0].lineno}",
+                        "size_kib": round(difference.size_diff / 1024, 1),
+                        "count": difference.count_diff,
+                    }
+                    for difference in differences[:self.top]
+                    if difference.size_diff > 0
+                ]
+                del snapshot, differences
+            # Memory allocated to compare snapshots is not part of the stages this one runs within
+            tracemalloc.reset_peak()
+            self._add_overhead(start=end, end=(time.perf_counter(), time.process_time()))
+
+    def report(self) -> dict:
+        """
+        Returns the profiler's measurements.
+
+        Returns:
+            dict: Total wall time, the part of it spent measuring stages, the process's peak resident memory, and
+                the measurements of each stage in the order stages started, with their depth within other stages.
+        """
+        return {
+            "wall_ms": round(self.elapsed * 1000, 3),
+            "overhead_ms": round(self._overhead * 1000, 3),
+            "max_rss_kib": get_max_rss(),
+            "pstats": self.pstats_path,
+            "stages": self.stages,
+        }
+
+    def _add_overhead(self, start: tuple[float, float], end: tuple[float, float]):
+        # Records wall and CPU time spent measuring a stage, to be subtracted from the stages it runs within
+        self._overhead += end[0] - start[0]
+        for frame in self._stack:
+            frame["overhead"][0] += end[0] - start[0]
+            frame["overhead"][1] += end[1] - start[1]
+
+    def _update_peaks(self):
+        # tracemalloc keeps a single peak, which is reset whenever a stage starts or ends, so each stage running
+        # takes the highest peak seen between boundaries
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self._stack:
+            frame["peak"] = max(frame["peak"], peak)
+        tracemalloc.reset_peak()
+
+
+def get_max_rss() -> int:
+    """
+    Returns the peak resident memory of the current process.
+
+    Returns:
+        int: Peak resident memory in KiB.
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+
+@contextlib.contextmanager
+def measure(name: str):
+    """
+    Measures a stage run within a `with` block, if a profiler is active.
+
+    Args:
+        name (str): The stage's name.
+    """
+    if _profiler is None:
+        yield
+        return
+    with _profiler.stage(name=name):
+        yield
+
+
+def print_report(report: dict):
+    """
+    Prints a profiler's report as a table, with stages indented within the stages they ran in.
+
+    Args:
+        report (dict): The report returned by Profiler.report.
+    """
+    print(f"{'stage':<48}{'wall ms':>12}{'cpu ms':>12}{'peak KiB':>12}{'retained KiB':>14}{'RSS growth KiB':>16}")
+    for entry in report["stages"]:
+        name = "  " * entry["depth"] + entry["name"]
+        print(
+            f"{name:<48}{entry['wall_ms']:>12.1f}{entry['cpu_ms']:>12.1f}{entry['allocated_peak_kib']:>12.1f}"
+            f"{entry['allocated_retained_kib']:>14.1f}{entry['max_rss_growth_kib']:>16}"
+        )
+    print(
+        f"{'total':<48}{report['wall_ms']:>12.1f}  ({report['overhead_ms']:.1f} ms measuring stages, "
+        f"peak RSS {report['max_rss_kib']} KiB)"
+    )
+
+
+def stage(function):
+    """
+    Decorates a function so that each call is measured as a stage named after it, if a profiler is active.
+
+    Args:
+        function (Callable): The function, e.g. a step of populating a local cache.
+
+    Returns:
+        Callable: The decorated function.
+    """
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _profiler is None:
+            return function(*args, **kwargs)
+        with _profiler.stage(name=name):
+            return function(*args, **kwargs)
+    return wrapper
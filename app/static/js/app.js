@@ -58,10 +58,180 @@ function addToggleFilter({ toggleSelector, attributeName, tableSelector = null,
 }
 
 
+function escapeHtml(value) {
+  return String(value ?? '')
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/"/g, '&quot;')
+    .replace(/'/g, '&#39;');
+}
+
+
+// URLs of linked pages by endpoint, built by the server with url_for so that links include the app's prefix
+let routeTemplates = null;
+
+function routeUrl(endpoint, value) {
+  if (routeTemplates === null) {
+    routeTemplates = JSON.parse(document.body.dataset.routes || '{}');
+  }
+  return escapeHtml(routeTemplates[endpoint].replace('__value__', encodeURIComponent(value)));
+}
+
+
+function renderLink(endpoint, value, text) {
+  return `<a href="${routeUrl(endpoint, value)}">${escapeHtml(text)}</a>`;
+}
+
+
+function renderLinks(endpoint, separator) {
+  return function (records) {
+    return (records || []).map(record => renderLink(endpoint, record.name, record.name)).join(separator);
+  };
+}
+
+
+function renderInfoLink(endpoint) {
+  return function (id) {
+    return `<a href="${routeUrl(endpoint, id)}" class="btn btn-sm" title="More information" data-bs-toggle="tooltip">` +
+      '<i class="bi bi-info-circle" aria-hidden="true"></i></a>';
+  };
+}
+
+
+function renderRawToggle(endpoint) {
+  return function (id) {
+    return `<button type="button" class="btn btn-sm raw-toggle" data-raw-source="${routeUrl(endpoint, id)}" ` +
+      'title="View record" aria-expanded="false"><i class="bi bi-code-slash" aria-hidden="true"></i></button>';
+  };
+}
+
+
+// Full records fetched by raw toggles, keyed by URL, so that collapsing and expanding a row does not refetch it
+const rawRecords = new Map();
+
+function fetchRaw(url) {
+  if (!rawRecords.has(url)) {
+    const request = fetch(url, { headers: { Accept: 'application/json' } })
+      .then(response => {
+        if (!response.ok) throw new Error(`${response.status} ${response.statusText}`);
+        return response.json();
+      })
+      .catch(error => {
+        rawRecords.delete(url);
+        throw error;
+      });
+    rawRecords.set(url, request);
+  }
+  return rawRecords.get(url);
+}
+
+
+function toggleRaw(button) {
+  // Rows of DataTables show the record in a child row, other toggles in the element named by data-raw-target
+  const tr = button.closest('tr');
+  const tableEl = tr ? tr.closest('table.dataTable') : null;
+  const row = tableEl ? $(tableEl).DataTable().row(tr) : null;
+  const target = row ? null : document.querySelector(button.dataset.rawTarget);
+  const expanded = button.getAttribute('aria-expanded') === 'true';
+
+  const show = html => {
+    if (row) {
+      row.child(html).show();
+    } else if (target) {
+      target.innerHTML = html;
+    }
+  };
+
+  if (expanded) {
+    if (row) {
+      row.child.hide();
+    } else if (target) {
+      target.innerHTML = '';
+    }
+    button.setAttribute('aria-expanded', 'false');
+    return;
+  }
+
+  button.setAttribute('aria-expanded', 'true');
+  show('<div class="text-muted small">Loading…</div>');
+  fetchRaw(button.dataset.rawSource)
+    .then(record => show(`<pre class="small mb-0">${escapeHtml(JSON.stringify(record, null, 2))}</pre>`))
+    .catch(error => show(`<div class="text-danger small">Unable to load record: ${escapeHtml(error.message)}</div>`));
+}
+
+
+// Columns of tables rendered with server-side processing, keyed by the table's data-table attribute.
+// Each column's `data` is also the name that the server sorts by.
+const serverTableColumns = {
+  biomarkers: [
+    { data: 'name', render: name => renderLink('biomarkers', name, name) },
+    { data: 'type', render: escapeHtml },
+    { data: 'propositions_count' },
+    { data: 'statements_count' }
+  ],
+  documents: [
+    { data: 'name', render: (name, type, row) => renderLink('documents', row.id, name) },
+    { data: 'indications_count' },
+    { data: 'statements_count' }
+  ],
+  indications: [
+    { data: 'document_name', render: (name, type, row) => renderLink('documents', row.document_id, name) },
+    { data: 'indication', render: (indication, type, row) => renderLink('indications', row.id, indication) },
+    { data: 'statements_count' }
+  ],
+  propositions: [
+    { data: 'id' },
+    { data: 'predicate' },
+    { data: 'biomarkers', render: renderLinks('biomarkers', ', ') },
+    { data: 'cancer_type', render: cancerType => renderLink('diseases', cancerType.name, cancerType.name) },
+    { data: 'therapies', render: renderLinks('therapies', ',') },
+    { data: 'id', orderable: false, render: renderInfoLink('propositions') }
+  ],
+  statements: [
+    { data: 'predicate', render: (predicate, type, row) => escapeHtml(`${predicate} (${row.direction})`) },
+    { data: 'biomarkers', render: renderLinks('biomarkers', ', ') },
+    { data: 'cancer_type', render: cancerType => renderLink('diseases', cancerType.name, cancerType.name) },
+    { data: 'therapies', render: renderLinks('therapies', ', ') },
+    { data: 'organization', render: escapeHtml },
+    {
+      data: 'id',
+      orderable: false,
+      render: id => renderInfoLink('statements')(id) + renderRawToggle('statements_raw')(id)
+    }
+  ],
+  therapies: [
+    { data: 'name', render: name => renderLink('therapies', name, name) },
+    { data: 'therapy_type', render: escapeHtml },
+    { data: 'propositions_count' },
+    { data: 'statements_count' }
+  ]
+};
+
+
+function collectFacets(data) {
+  // Facet values are sent comma separated, matching services.parse_datatables_request
+  const organizationFilter = document.getElementById('organizationFilter');
+  const organizations = Array.from(document.querySelectorAll('.org-toggle'))
+    .filter(el => el.checked)
+    .map(el => el.value);
+  if (organizationFilter && organizationFilter.value) {
+    organizations.push(organizationFilter.value);
+  }
+  data.organization = organizations.join(',');
+
+  const biomarkerTypeFilter = document.getElementById('biomarkerTypeFilter');
+  data.biomarker_type = biomarkerTypeFilter ? biomarkerTypeFilter.value : '';
+
+  const therapyTypeFilter = document.getElementById('therapyTypeFilter');
+  data.therapy_type = therapyTypeFilter ? therapyTypeFilter.value : '';
+}
+
+
 function initTable(selector) {
   const el = document.querySelector(selector);
   if (el) {
-    $(el).DataTable({
+    const options = {
       autoWidth: false,
       classes: { table: 'table table-striped' },
       layout: {
@@ -72,11 +242,50 @@ function initTable(selector) {
       },
       pageLength: 10,
       responsive: true
-    });
+    };
+
+    const columns = serverTableColumns[el.dataset.table];
+    if (el.dataset.source && columns) {
+      Object.assign(options, {
+        ajax: { url: el.dataset.source, data: collectFacets, cache: true },
+        columns: columns,
+        processing: true,
+        searchDelay: 350,
+        serverSide: true
+      });
+    }
+
+    $(el).DataTable(options);
   }
 }
 
+function loadDeferredFragments() {
+  // Replace placeholders with fragments rendered by the server, and initialize any tables they contain
+  document.querySelectorAll('.deferred-fragment[data-fragment-source]').forEach(el => {
+    fetch(el.dataset.fragmentSource, { headers: { Accept: 'text/html' } })
+      .then(response => {
+        if (!response.ok) throw new Error(`${response.status} ${response.statusText}`);
+        return response.text();
+      })
+      .then(html => {
+        el.innerHTML = html;
+        el.querySelectorAll('table.dataTable[id]').forEach(table => initTable('#' + table.id));
+      })
+      .catch(error => {
+        el.innerHTML = `<p class="text-danger small">Unable to load propositions: ${escapeHtml(error.message)}</p>`;
+      });
+  });
+}
+
+
 document.addEventListener('DOMContentLoaded', function () {
+  document.addEventListener('click', event => {
+    const button = event.target.closest('.raw-toggle');
+    if (button) {
+      toggleRaw(button);
+    }
+  });
+
   // Shared filters
   const organizationFilter = document.getElementById('organizationFilter');
   if (organizationFilter) {
@@ -130,10 +339,11 @@ document.addEventListener('DOMContentLoaded', function () {
     '#genes-table-result',
     '#indications-table-result',
     '#propositions-therapeutic-response-table-result',
-    '#search-table-result',
     '#statements-table-result',
     '#therapies-table-result'
   ];
 
   tableSelectors.forEach(initTable);
+
+  loadDeferredFragments();
 });
@@ -0,0 +1,5 @@
+"""
+Benchmarks and profiling tools for the Molecular Oncology Almanac Browser.
+
+Each module is run from the repository's root directory with `python -m benchmarks.<module>`.
+"""
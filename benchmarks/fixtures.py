@@ -0,0 +1,301 @@
+"""
+fixtures.py
+
+Builds statement payloads shaped like the Molecular Oncology Almanac API's /statements response, for benchmarks that
+should not depend on a running API.
+
+Usage:
+    python -m benchmarks.fixtures --output fixture-10x.json [--scale 10] [--seed 0]
+
+Fixtures are generated at a scale factor relative to the default instance's cache, e.g. 1, 10, or 100, so that the
+populate pipeline, services, and templates can be profiled at sizes the knowledgebase has not reached yet. A fixture
+written here is served by `python -m benchmarks.stub_api serve --fixture fixture-10x.json`, which
+`python -m app.populate_database --api http://localhost:8000` can populate caches from.
+"""
+
+import argparse
+import collections
+import json
+import random
+
+AGENTS = [
+    {
+        "id": "fda",
+        "name": "Food and Drug Administration",
+        "description": "Regulatory agency that approves drugs for use in the United States.",
+        "last_updated": None,
+    },
+    {
+        "id": "ema",
+        "name": "European Medicines Agency",
+        "description": "Regulatory agency that approves medicines for use in the European Union.",
+        "last_updated": None,
+    },
+    {
+        "id": "hc",
+        "name": "Health Canada",
+        "description": "Regulatory agency that approves drugs for use in Canada.",
+        "last_updated": None,
+    },
+    {
+        "id": "hpra",
+        "name": "Health Products Regulatory Authority",
+        "description": "Regulatory agency that approves medicines for use in Ireland.",
+        "last_updated": None,
+    },
+    {
+        "id": "hse",
+        "name": "Health Service Executive",
+        "description": "Provides public reimbursement of medicines in Ireland.",
+        "last_updated": None,
+    },
+]
+BIOMARKER_TYPES = ["Somatic Variant", "Rearrangement", "Copy Number", "Germline Variant", "Protein Expression"]
+PREDICATES = ["predictSensitivityTo", "predictResistanceTo"]
+THERAPY_TYPES = ["Targeted therapy", "Chemotherapy", "Immunotherapy", "Hormone therapy"]
+
+# Statements in the default instance's cache, which a scale factor of 1 reproduces
+BASE_COUNT = 1188
+SCALES = (1, 10, 100)
+
+
+def make_fixture(scale: float = 1, seed: int = 0) -> dict:
+    """
+    Creates the statements and service record of a knowledgebase `scale` times the size of the default instance's
+    cache. Genes, biomarkers, diseases, therapies, documents, and indications grow with the number of statements.
+
+    Args:
+        scale (float): The number of statements, relative to the default instance's cache.
+        seed (int): Seed for the random number generator, so that payloads are reproducible.
+
+    Returns:
+        dict: The fixture, with the service record under "about" and statement records under "statements", as read
+            by benchmarks.stub_api.
+    """
+    count = max(round(BASE_COUNT * scale), 1)
+    about = {
+        "name": "Molecular Oncology Almanac API stub",
+        "release": f"stub-{scale:g}x-{seed}",
+        "last_updated": "2025-01-01",
+    }
+    return {"about": about, "statements": make_statements(count=count, seed=seed)}
+
+
+def make_statements(count: int = BASE_COUNT, seed: int = 0) -> list[dict]:
+    """
+    Creates statement records with propositions, biomarkers, genes, indications, and documents.
+
+    The ratios of propositions, documents, and indications to statements follow the default instance's cache.
+
+    Args:
+        count (int): The number of statements to create.
+        seed (int): Seed for the random number generator, so that payloads are reproducible.
+
+    Returns:
+        list[dict]: Statement records.
+    """
+    rnd = random.Random(seed)
+    genes = [make_gene(index=index) for index in range(max(count // 20, 1))]
+    biomarkers = [
+        make_biomarker(index=index, gene=genes[index % len(genes)]) for index in range(max(count // 7, 1))
+    ]
+    diseases = [make_disease(index=index) for index in range(max(count // 20, 1))]
+    therapies = [make_therapy(index=index) for index in range(max(count // 8, 1))]
+
+    documents = []
+    indications = []
+    for index in range(max(count // 6, 1)):
+        document = make_document(index=index, agent=AGENTS[index % len(AGENTS)])
+        documents.append(document)
+        for indication_index in range(rnd.choice([1, 2, 3, 4])):
+            indications.append(make_indication(document=document, index=indication_index))
+
+    propositions = []
+    for index in range(max(int(count * 0.63), 1)):
+        if rnd.random() < 0.2:
+            object_therapeutic = {
+                "id": 100000 + index,
+                "membershipOperator": "AND",
+                "therapies": rnd.sample(therapies, min(2, len(therapies))),
+            }
+        else:
+            object_therapeutic = rnd.choice(therapies)
+        propositions.append(
+            {
+                "id": index,
+                "type": "VariantTherapeuticResponseProposition",
+                "predicate": rnd.choice(PREDICATES),
+                "biomarkers": rnd.sample(biomarkers, min(rnd.choice([1, 1, 1, 2, 3]), len(biomarkers))),
+                "conditionQualifier": rnd.choice(diseases),
+                "objectTherapeutic": object_therapeutic,
+                "subjectVariant": None,
+            }
+        )
+
+    statements = []
+    for index in range(count):
+        indication = rnd.choice(indications)
+        statements.append(
+            {
+                "id": index,
+                "type": "Statement",
+                "description": f"Statement {index}. {indication['indication']}",
+                "contributions": [{"id": 0, "type": "Contribution", "date": "2024-10-30"}],
+                "direction": "supports",
+                "strength": {"id": 0, "conceptType": "Evidence", "name": "Approval"},
+                "proposition": propositions[index % len(propositions)],
+                "indication": indication,
+                "reportedIn": [indication["document"]],
+            }
+        )
+    return statements
+
+
+def make_search_results(statements: list[dict]) -> list[dict]:
+    """
+    Creates the /search response for `statements`: each distinct proposition with its statements counted by agent.
+
+    Args:
+        statements (list[dict]): Statement records.
+
+    Returns:
+        list[dict]: Proposition records with aggregates.
+    """
+    propositions = {}
+    counts = collections.defaultdict(collections.Counter)
+    for statement in statements:
+        proposition = statement["proposition"]
+        agent = get_agent(document=statement["indication"]["document"])
+        propositions[proposition["id"]] = proposition
+        counts[proposition["id"]][agent["id"]] += 1
+
+    results = []
+    for proposition_id, proposition in propositions.items():
+        by_agent = [
+            {"id": agent_id, "count": count} for agent_id, count in sorted(counts[proposition_id].items())
+        ]
+        results.append(dict(proposition, aggregates={"by_agent": by_agent}))
+    return results
+
+
+def get_agent(document: dict) -> dict:
+    return [ext for ext in document["extensions"] if ext["name"] == "agent"][0]["value"]
+
+
+def make_biomarker(index: int, gene: dict) -> dict:
+    return {
+        "id": index,
+        "type": "CategoricalVariant",
+        "name": f"{gene['name']} p.V{index}E",
+        "extensions": [
+            {"name": "biomarker_type", "value": BIOMARKER_TYPES[index % len(BIOMARKER_TYPES)]},
+            {"name": "present", "value": True},
+            {"name": "_display_name", "value": f"{gene['name']} p.V{index}E"},
+        ],
+        "genes": [gene],
+    }
+
+
+def make_disease(index: int) -> dict:
+    return {
+        "id": index,
+        "conceptType": "Disease",
+        "name": f"Cancer type {index}",
+        "primaryCoding": {
+            "id": f"oncotree:CT{index}",
+            "code": f"CT{index}",
+            "name": f"Cancer type {index}",
+            "system": "https://oncotree.mskcc.org",
+            "iris": [f"https://oncotree.mskcc.org/?version=oncotree_latest_stable&field=CODE&search=CT{index}"],
+        },
+        "mappings": [],
+        "extensions": [{"name": "solid_tumor", "value": True}],
+    }
+
+
+def make_document(index: int, agent: dict) -> dict:
+    return {
+        "id": f"doc:{agent['id']}.drug{index}",
+        "type": "Document",
+        "documentType": "Regulatory approval",
+        "name": f"Drug{index} (therapy{index}) [package insert]. {agent['id'].upper()}.",
+        "description": (
+            f"Manufacturer {index}. Drug{index} (therapy{index}) [package insert]. "
+            f"{agent['name']} website. Revised January 2025. Accessed February 1, 2025."
+        ),
+        "urls": [f"https://example.org/{agent['id']}/drug{index}.pdf"],
+        "extensions": [
+            {"name": "agent", "value": agent},
+            {"name": "publication_date", "value": "2025-01-01"},
+        ],
+    }
+
+
+def make_gene(index: int) -> dict:
+    name = f"GENE{index}"
+    return {
+        "id": index,
+        "conceptType": "Gene",
+        "name": name,
+        "primaryCoding": {"id": f"hgnc:{index}", "code": f"HGNC:{index}", "system": "https://genenames.org",
+                          "iris": [f"https://www.genenames.org/data/gene-symbol-report/#!/hgnc_id/HGNC:{index}"]},
+        "mappings": [
+            {"coding": {"id": f"ensembl:ENSG{index:011d}", "code": f"ENSG{index:011d}", "system": "ensembl",
+                        "iris": [f"https://www.ensembl.org/id/ENSG{index:011d}"]}, "relation": "exactMatch"},
+            {"coding": {"id": f"ncbi:{index}", "code": str(index), "system": "ncbi",
+                        "iris": [f"https://www.ncbi.nlm.nih.gov/gene/{index}"]}, "relation": "exactMatch"},
+            {"coding": {"id": f"refseq:NM_{index:06d}", "code": f"NM_{index:06d}", "system": "refseq",
+                        "iris": [f"https://www.ncbi.nlm.nih.gov/nuccore/NM_{index:06d}"]}, "relation": "exactMatch"},
+        ],
+        "extensions": [{"name": "location", "value": f"{index % 22 + 1}q{index % 40}"}],
+    }
+
+
+def make_indication(document: dict, index: int) -> dict:
+    return {
+        "id": f"ind:{document['id'][4:]}:{index}",
+        "indication": (
+            f"{document['name'].split(' ')[0]} is indicated for the treatment of adult patients with "
+            f"advanced disease harboring the listed biomarker, indication {index}."
+        ),
+        "initial_approval_date": "2020-01-01",
+        "initial_approval_url": document["urls"][0],
+        "description": f"The agency approved {document['name']} for indication {index}.",
+        "raw_biomarkers": "biomarker",
+        "raw_cancer_type": "cancer type",
+        "raw_therapeutics": "therapy",
+        "document": document,
+    }
+
+
+def make_therapy(index: int) -> dict:
+    return {
+        "id": index,
+        "conceptType": "Drug",
+        "name": f"Therapymab {index}",
+        "primaryCoding": {"id": f"ncit:C{index}", "code": f"C{index}", "name": f"Therapymab {index}",
+                          "system": "https://ncit.nci.nih.gov", "iris": [f"https://ncit.nci.nih.gov/C{index}"]},
+        "mappings": [],
+        "extensions": [
+            {"name": "therapy_strategy", "value": ["Kinase inhibition"]},
+            {"name": "therapy_type", "value": THERAPY_TYPES[index % len(THERAPY_TYPES)]},
+        ],
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        prog="Synthetic MOAlmanac fixtures",
+        description="Generate statements shaped like the MOAlmanac API's /statements response",
+    )
+    arg_parser.add_argument("--output", required=True, help="Path to write the fixture to")
+    arg_parser.add_argument(
+        "--scale", type=float, default=1, help=f"Size relative to the default instance's cache, e.g. {SCALES}"
+    )
+    arg_parser.add_argument("--seed", type=int, default=0, help="Seed for the random number generator")
+    args = arg_parser.parse_args()
+
+    fixture = make_fixture(scale=args.scale, seed=args.seed)
+    with open(args.output, "w") as fp:
+        json.dump(fixture, fp)
+    print(f"Wrote {len(fixture['statements'])} statements to {args.output}")
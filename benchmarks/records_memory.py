@@ -0,0 +1,114 @@
+"""
+records_memory.py
+
+Compares the memory used by simplified propositions and statements when built as dictionaries, as services did
+previously, and as the slotted records in app/blueprints/main/records.py.
+
+Usage:
+    python -m benchmarks.records_memory [--statements statements.json] [--count 1188]
+
+Statements are read from a JSON file saved from the API's /statements endpoint, or generated with
+benchmarks.fixtures if no file is given.
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+
+from app.blueprints.main import services
+from benchmarks import fixtures
+
+
+def dict_proposition(record: dict) -> dict:
+    """
+    Simplifies a proposition record into a dictionary, as services did before records.Proposition.
+    """
+    biomarkers = services.extract_biomarkers(biomarkers=record["biomarkers"])
+    therapies = services.extract_therapies(object_therapeutic=record["objectTherapeutic"])
+    return {
+        "id": record["id"],
+        "type": record["type"],
+        "predicate": services.map_predict(string=record["predicate"]),
+        "biomarkers": services.sort_dicts_by_key(data=biomarkers, key="name"),
+        "cancer_type": services.extract_diseases(disease=record["conditionQualifier"]),
+        "therapies": services.sort_dicts_by_key(data=therapies, key="name"),
+        "proposition_type": "Therapeutic response",
+        "aggregates": record.get("aggregates", {}),
+    }
+
+
+def dict_statement(record: dict) -> dict:
+    """
+    Simplifies a statement record into a dictionary, as services did before records.Statement.
+    """
+    document_extensions = record.get("indication", {}).get("document", {}).get("extensions")
+    agent = [ext for ext in document_extensions if ext["name"] == "agent"][0]["value"]
+    return {
+        "id": record["id"],
+        "proposition": dict_proposition(record=record["proposition"]),
+        "description": record["description"],
+        "direction": "Supports" if record["direction"] == "supports" else "Disputes",
+        "documents": [
+            {
+                "id": doc["id"],
+                "documentType": doc["documentType"],
+                "name": doc["name"],
+                "description": doc["description"],
+            }
+            for doc in record["reportedIn"]
+        ],
+        "agent": agent["id"].upper() if record.get("indication", None) else None,
+    }
+
+
+def measure(function, records: list[dict]) -> tuple[int, int]:
+    """
+    Measures the memory retained by, and the peak memory allocated while, applying `function` to `records`.
+
+    Returns:
+        tuple[int, int]: Retained bytes and peak bytes.
+    """
+    services.simplified_propositions.clear()
+    gc.collect()
+    tracemalloc.start()
+    result = function(records)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory used by dictionaries and slotted records")
+    parser.add_argument("--statements", help="JSON file of statements from the API's /statements endpoint")
+    parser.add_argument("--count", type=int, default=1188, help="Number of statements to generate")
+    args = parser.parse_args()
+
+    if args.statements:
+        with open(args.statements) as fp:
+            statements = json.load(fp)
+        statements = statements.get("data", statements) if isinstance(statements, dict) else statements
+    else:
+        statements = fixtures.make_statements(count=args.count)
+    search_results = fixtures.make_search_results(statements=statements)
+
+    cases = [
+        ("statements", statements, lambda records: [dict_statement(record=r) for r in records],
+         services.process_statements),
+        ("propositions", search_results, lambda records: [dict_proposition(record=r) for r in records],
+         services.process_propositions),
+    ]
+    print(f"{'records':<14}{'count':>7}{'dict retained':>16}{'slots retained':>16}{'dict peak':>12}{'slots peak':>12}")
+    for name, records, dict_function, slots_function in cases:
+        dict_retained, dict_peak = measure(function=dict_function, records=records)
+        slots_retained, slots_peak = measure(function=slots_function, records=records)
+        print(
+            f"{name:<14}{len(records):>7}"
+            f"{dict_retained / 1024:>13.0f} KB{slots_retained / 1024:>13.0f} KB"
+            f"{dict_peak / 1024:>9.0f} KB{slots_peak / 1024:>9.0f} KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
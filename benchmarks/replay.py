@@ -0,0 +1,397 @@
+"""
+replay.py
+
+Replays the mix of paths in nginx access logs, such as those viewed with service/nginx-view-access-log.sh, against
+the browser, and reports latency by route.
+
+Usage:
+    python -m benchmarks.replay /var/log/nginx/access.log [/var/log/nginx/access.log.2.gz ...] [--instance default]
+        [--speed 1] [--concurrency 16] [--limit 10000] [--remap] [--url http://localhost:5000]
+        [--fixture fixture.json] [--scale 1] [--output results.json]
+
+Logs are read in nginx's default combined format, gzipped or not. GET and HEAD requests are replayed in the order
+they were logged, each sent at its original offset from the first request divided by `speed`, so `--speed 10` replays
+an hour of traffic in six minutes, and `--speed 0` sends requests as fast as `concurrency` clients allow. Requests are
+sent on schedule whether or not earlier requests have finished, as real visitors send them, so the time each request
+waited for a free client is reported as lag; a growing lag means the browser, or the replay, could not keep up.
+
+Unless `--url` names a running browser, e.g. Gunicorn serving an instance populated from
+`python -m benchmarks.stub_api serve`, the instance's local cache is populated from the stub API in a temporary
+directory and the browser is served from a thread of this process. Logged paths name real genes, therapies, and
+statements that generated statements do not, so `--remap` replaces each path with arguments by a URL of the same
+route from the populated cache, chosen by a hash of the logged path so that repeated paths stay repeated.
+
+Results are grouped by route family, e.g. /genes/<gene_symbol>, with status counts and latency percentiles, and are
+written as JSON, by default to benchmarks/results/replay-<commit>.json. The replay runs against the browser only;
+pages that nginx serves from an export of static pages are replayed against the browser too.
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import gzip
+import json
+import logging
+import os
+import platform
+import re
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+
+import flask
+import requests
+import werkzeug.exceptions
+import werkzeug.routing
+import werkzeug.serving
+
+from app import create_app
+from benchmarks import routes
+from benchmarks import stub_api
+
+# nginx's default combined format: remote address, identity, user, [time], "request", status, bytes, ...
+LOG_LINE = re.compile(
+    r'^\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<target>\S+)(?: [^"]*)?" (?P<status>\d{3}) '
+)
+METHODS = ("GET", "HEAD")
+UNMATCHED = "<unmatched>"
+
+
+def classify(adapter: werkzeug.routing.MapAdapter, target: str) -> str | None:
+    """
+    Names the route family of a request target.
+
+    Args:
+        adapter (werkzeug.routing.MapAdapter): The browser's URL map, bound to a server name.
+        target (str): The request target, a path with an optional query string.
+
+    Returns:
+        str | None: The route's rule, e.g. /genes/<gene_symbol>, `<unmatched>` if no route matches, or None for
+            static files.
+    """
+    path = urllib.parse.unquote(urllib.parse.urlsplit(target).path)
+    try:
+        rule, arguments = adapter.match(path, method="GET", return_rule=True)
+    except werkzeug.routing.RequestRedirect as redirect:
+        return classify(adapter=adapter, target=urllib.parse.urlsplit(redirect.new_url).path)
+    except werkzeug.exceptions.HTTPException:
+        return UNMATCHED
+    if rule.endpoint == "static":
+        return None
+    return rule.rule
+
+
+def main(paths: list[str], instance: str = "default", speed: float = 1, concurrency: int = 16,
+         limit: int | None = None, remap: bool = False, url: str | None = None, fixture: str | None = None,
+         scale: float = 1) -> dict:
+    """
+    Replays access logs against the browser.
+
+    Args:
+        paths (list[str]): nginx access logs, in the combined format, optionally gzipped.
+        instance (str): The instance under deploy/ to serve, if `url` is not given.
+        speed (float): The factor by which to speed up the logged traffic, or 0 to send requests as fast as possible.
+        concurrency (int): The number of requests that may be in flight at once.
+        limit (int | None): The maximum number of requests to replay, from the start of the logs.
+        remap (bool): Whether to replace paths with arguments by URLs of the same route from the populated cache.
+        url (str | None): URL of a running browser to replay against, or None to serve the instance from this process.
+        fixture (str | None): A fixture for the stub API, or None to generate statements.
+        scale (float): The size of the knowledgebase to generate relative to the default instance's cache, if no
+            fixture is given.
+
+    Returns:
+        dict: The run's settings, overall throughput and lag, and results by route family.
+    """
+    entries, skipped = parse_logs(paths=paths)
+    if limit is not None:
+        entries = entries[:limit]
+    if not entries:
+        raise ValueError("No GET or HEAD requests were found in the access logs")
+
+    results = {
+        "commit": routes.get_commit(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "logs": [os.path.basename(path) for path in paths],
+        "instance": None if url else instance,
+        "url": url,
+        "fixture": os.path.basename(fixture) if fixture else None,
+        "scale": None if url or fixture else scale,
+        "speed": speed,
+        "concurrency": concurrency,
+        "remap": remap,
+        "skipped": skipped,
+    }
+
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            if url is not None:
+                # An app with an empty local cache, to group requests by its routes
+                app = create_app(config_path=os.path.join(routes.ROOT, "deploy", instance, "config.ini"), api=url)
+                results.update(replay(entries=entries, app=app, base_url=url, speed=speed, concurrency=concurrency))
+            else:
+                results.update(
+                    serve_and_replay(
+                        entries=entries,
+                        instance=instance,
+                        speed=speed,
+                        concurrency=concurrency,
+                        remap=remap,
+                        fixture=os.path.abspath(fixture) if fixture else None,
+                        scale=scale,
+                    )
+                )
+        finally:
+            os.chdir(working_directory)
+    return results
+
+
+def parse_logs(paths: list[str]) -> tuple[list[dict], dict]:
+    """
+    Reads GET and HEAD requests from nginx access logs in the combined format.
+
+    Args:
+        paths (list[str]): Access logs, optionally gzipped as logrotate leaves them, in any order.
+
+    Returns:
+        tuple[list[dict], dict]: Requests in the order they were logged, each with its Unix time, method, and
+            target, and the number of lines skipped by reason.
+    """
+    entries = []
+    skipped = {"unparsed": 0, "method": 0}
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as fp:
+            for line in fp:
+                match = LOG_LINE.match(line)
+                if match is None:
+                    skipped["unparsed"] += 1
+                    continue
+                if match["method"] not in METHODS:
+                    skipped["method"] += 1
+                    continue
+                try:
+                    logged = datetime.datetime.strptime(match["time"], "%d/%b/%Y:%H:%M:%S %z")
+                except ValueError:
+                    skipped["unparsed"] += 1
+                    continue
+                entries.append({"time": logged.timestamp(), "method": match["method"], "target": match["target"]})
+    entries.sort(key=lambda entry: entry["time"])
+    return entries, skipped
+
+
+def remap_entries(entries: list[dict], app: flask.Flask) -> list[dict]:
+    """
+    Replaces the targets of routes with arguments, or with query strings, by URLs of the same route that the
+    populated cache serves, so that replayed requests find what they ask for.
+
+    Args:
+        entries (list[dict]): Requests read by parse_logs.
+        app (flask.Flask): The browser, with its local cache populated.
+
+    Returns:
+        list[dict]: The requests, with targets replaced where a URL of the same route is known.
+    """
+    urls = routes.get_urls(app)
+    adapter = app.url_map.bind("localhost")
+    remapped = []
+    for entry in entries:
+        family = classify(adapter=adapter, target=entry["target"])
+        candidates = urls.get(family)
+        target = entry["target"]
+        if candidates and target not in candidates and ("<" in family or "?" in target):
+            target = candidates[zlib.crc32(target.encode()) % len(candidates)]
+        remapped.append({**entry, "target": target})
+    return remapped
+
+
+def replay(entries: list[dict], app: flask.Flask, base_url: str, speed: float, concurrency: int) -> dict:
+    """
+    Sends each request at its scheduled time and summarizes the responses by route family.
+
+    Args:
+        entries (list[dict]): Requests read by parse_logs, in the order they were logged.
+        app (flask.Flask): The browser, to group requests by its routes.
+        base_url (str): URL of the browser.
+        speed (float): The factor by which to speed up the logged traffic, or 0 to send requests as fast as possible.
+        concurrency (int): The number of requests that may be in flight at once.
+
+    Returns:
+        dict: Requests sent, the logged and replayed durations, requests per second offered and achieved, lag
+            percentiles, and results by route family.
+    """
+    adapter = app.url_map.bind("localhost")
+    families = [classify(adapter=adapter, target=entry["target"]) for entry in entries]
+
+    sessions = threading.local()
+    measurements = []
+
+    def send(entry: dict, family: str, scheduled: float):
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            response = sessions.session.request(
+                entry["method"], base_url + entry["target"], allow_redirects=False, timeout=60
+            )
+            status = str(response.status_code)
+        except requests.RequestException as error:
+            status = type(error).__name__
+        measurements.append((family, status, time.perf_counter() - started, started - scheduled))
+
+    first = entries[0]["time"]
+    logged_s = entries[-1]["time"] - first
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for entry, family in zip(entries, families):
+            if family is None:
+                continue
+            scheduled = start + ((entry["time"] - first) / speed if speed else 0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, entry, family, scheduled)
+    replayed_s = time.perf_counter() - start
+
+    by_family = {}
+    for family, status, latency, lag in measurements:
+        by_family.setdefault(family, []).append((status, latency))
+    lags = [lag for _, _, _, lag in measurements]
+    return {
+        "requests": len(measurements),
+        "static_skipped": families.count(None),
+        "logged_s": round(logged_s, 3),
+        "replayed_s": round(replayed_s, 3),
+        "offered_rps": round(len(measurements) / (logged_s / speed), 1) if speed and logged_s else None,
+        "achieved_rps": round(len(measurements) / replayed_s, 1),
+        "lag_p50_ms": round(routes.percentile(lags, 50) * 1000, 3),
+        "lag_p99_ms": round(routes.percentile(lags, 99) * 1000, 3),
+        "lag_max_ms": round(max(lags) * 1000, 3),
+        "routes": {
+            family: summarize(responses=by_family[family], replayed_s=replayed_s) for family in sorted(by_family)
+        },
+    }
+
+
+def serve_and_replay(entries: list[dict], instance: str, speed: float, concurrency: int, remap: bool,
+                     fixture: str | None, scale: float) -> dict:
+    """
+    Populates an instance's local cache from the stub API, serves the browser from a thread, and replays requests
+    against it. Must be called from a temporary working directory, where the local cache is written to data/.
+
+    Args:
+        entries (list[dict]): Requests read by parse_logs.
+        instance (str): The instance under deploy/ to serve.
+        speed (float): The factor by which to speed up the logged traffic, or 0 to send requests as fast as possible.
+        concurrency (int): The number of requests that may be in flight at once.
+        remap (bool): Whether to replace paths with arguments by URLs of the same route from the populated cache.
+        fixture (str | None): A fixture for the stub API, or None to generate statements.
+        scale (float): The size of the knowledgebase to generate relative to the default instance's cache, if no
+            fixture is given.
+
+    Returns:
+        dict: The results of replay.
+    """
+    statements, about = stub_api.load_fixture(path=fixture, scale=scale)
+    api_server = stub_api.serve(api=stub_api.StubAPI(statements=statements, about=about))
+    try:
+        app = routes.create_instance(instance=instance, api_url=f"http://127.0.0.1:{api_server.server_port}")
+        if remap:
+            entries = remap_entries(entries=entries, app=app)
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        server = werkzeug.serving.make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            return replay(
+                entries=entries,
+                app=app,
+                base_url=f"http://127.0.0.1:{server.server_port}",
+                speed=speed,
+                concurrency=concurrency,
+            )
+        finally:
+            server.shutdown()
+    finally:
+        api_server.shutdown()
+
+
+def summarize(responses: list[tuple[str, float]], replayed_s: float) -> dict:
+    """
+    Summarizes the responses of a route family.
+
+    Args:
+        responses (list[tuple[str, float]]): Each response's status, or the error that prevented one, and latency in
+            seconds.
+        replayed_s (float): The duration of the replay, in seconds.
+
+    Returns:
+        dict: Request count, its share of the requests per second of the replay, counts by status, and latency
+            percentiles, maximum, and mean in milliseconds.
+    """
+    latencies = [latency for _, latency in responses]
+    statuses = {}
+    for status, _ in responses:
+        statuses[status] = statuses.get(status, 0) + 1
+    return {
+        "requests": len(responses),
+        "rps": round(len(responses) / replayed_s, 2),
+        "statuses": dict(sorted(statuses.items())),
+        "p50_ms": round(routes.percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(routes.percentile(latencies, 90) * 1000, 3),
+        "p95_ms": round(routes.percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(routes.percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        prog="Replay access logs",
+        description="Replay the paths in nginx access logs against the browser and report latency by route",
+    )
+    arg_parser.add_argument("logs", nargs="+", help="nginx access logs in the combined format, optionally gzipped")
+    arg_parser.add_argument("--instance", choices=routes.INSTANCES, default="default", help="Instance to serve")
+    arg_parser.add_argument("--speed", type=float, default=1, help="Speed-up of logged traffic, 0 for no pauses")
+    arg_parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    arg_parser.add_argument("--limit", type=int, default=None, help="Maximum requests to replay")
+    arg_parser.add_argument("--remap", action="store_true", help="Replace logged arguments with cached ones")
+    arg_parser.add_argument("--url", default=None, help="Running browser to replay against, e.g. http://localhost:5000")
+    arg_parser.add_argument("--fixture", default=None, help="Fixture for the stub API")
+    arg_parser.add_argument("--scale", type=float, default=1, help="Knowledgebase size to generate without a fixture")
+    arg_parser.add_argument("--output", default=None, help="Path to write results to")
+    args = arg_parser.parse_args()
+
+    if args.remap and args.url:
+        arg_parser.error("--remap requires serving the instance from this process, without --url")
+
+    run = main(
+        paths=args.logs,
+        instance=args.instance,
+        speed=args.speed,
+        concurrency=args.concurrency,
+        limit=args.limit,
+        remap=args.remap,
+        url=args.url,
+        fixture=args.fixture,
+        scale=args.scale,
+    )
+    print(
+        f"{run['requests']} requests in {run['replayed_s']:.1f} s ({run['achieved_rps']} rps), "
+        f"lag p50 {run['lag_p50_ms']:.1f} ms, p99 {run['lag_p99_ms']:.1f} ms"
+    )
+    for family, summary in run["routes"].items():
+        print(
+            f"{family:<48} {summary['requests']:>7}  p50 {summary['p50_ms']:>9.1f} ms  p95 {summary['p95_ms']:>9.1f}"
+            f" ms  p99 {summary['p99_ms']:>9.1f} ms  {summary['statuses']}"
+        )
+
+    output = args.output or os.path.join(routes.RESULTS, f"replay-{run['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fp:
+        json.dump(run, fp, indent=2)
+    print(f"Wrote {output}")
@@ -0,0 +1,372 @@
+"""
+routes.py
+
+Benchmarks every route of the browser for each instance under deploy/, against the stub API in
+benchmarks/stub_api.py.
+
+Usage:
+    python -m benchmarks.routes [--instance default] [--iterations 20] [--samples 5] [--fixture fixture.json]
+        [--scale 1] [--output results.json] [--compare baseline.json]
+
+For each instance, a local cache is populated from the stub API in a temporary directory, and up to `samples` URLs of
+each route are requested through the Flask test client: once to warm caches, `iterations` times to measure
+latency, and once more with tracemalloc to measure the memory allocated per request. Results are written as JSON,
+by default to benchmarks/results/routes-<commit>.json, and `--compare` reports the change in latency from a
+previous run.
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import urllib.parse
+
+import flask
+
+from app import create_app
+from app import export_static
+from app import populate_database
+from app.blueprints.main import requests
+from benchmarks import stub_api
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INSTANCES = ("default", "ie", "ca")
+RESULTS = os.path.join(ROOT, "benchmarks", "results")
+
+
+def benchmark_instance(instance: str, api_url: str, iterations: int, samples: int) -> dict:
+    """
+    Populates an instance's local cache from the stub API and benchmarks its routes. Must be called from a
+    temporary working directory, where the local cache is written to data/.
+
+    Args:
+        instance (str): The instance's directory under deploy/.
+        api_url (str): URL of the stub API.
+        iterations (int): Times each sampled URL is requested to measure latency.
+        samples (int): Maximum URLs requested per route.
+
+    Returns:
+        dict: Results by route, and for all routes combined.
+    """
+    app = create_instance(instance=instance, api_url=api_url)
+    client = app.test_client()
+    urls = {route: sample(urls=values, count=samples) for route, values in get_urls(app=app).items()}
+
+    cold = {route: [request(client=client, url=url) for url in values] for route, values in urls.items()}
+
+    durations = {route: [] for route in urls}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for route, values in urls.items():
+            for url in values:
+                durations[route].append(request(client=client, url=url))
+    wall = time.perf_counter() - start
+
+    allocations = {route: [] for route in urls}
+    tracemalloc.start()
+    for route, values in urls.items():
+        for url in values:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            request(client=client, url=url)
+            allocations[route].append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    results = {
+        route: summarize(durations=durations[route], cold=cold[route], allocations=allocations[route])
+        for route in sorted(urls)
+    }
+    combined = summarize(
+        durations=[value for values in durations.values() for value in values],
+        cold=[value for values in cold.values() for value in values],
+        allocations=[value for values in allocations.values() for value in values],
+    )
+    combined["throughput_rps"] = round(combined["requests"] / wall, 1)
+    return {"routes": results, "all": combined}
+
+
+def compare(results: dict, baseline: dict):
+    """
+    Prints the change in median and 95th percentile latency of each route from a previous run.
+
+    Args:
+        results (dict): Results of this run.
+        baseline (dict): Results of a previous run.
+    """
+    print(f"\nCompared to {baseline.get('commit')} ({baseline.get('created')}):")
+    for instance, instance_results in results["instances"].items():
+        previous = baseline.get("instances", {}).get(instance)
+        if previous is None:
+            continue
+        print(f"  {instance}")
+        rows = list(instance_results["routes"].items()) + [("all", instance_results["all"])]
+        for route, current in rows:
+            before = previous["all"] if route == "all" else previous["routes"].get(route)
+            if before is None:
+                continue
+            changes = [
+                f"{metric} {before[metric]:.2f} -> {current[metric]:.2f} ms "
+                f"({current[metric] / before[metric] - 1:+.0%})"
+                for metric in ("p50_ms", "p95_ms")
+                if before[metric]
+            ]
+            print(f"    {route:<48} " + ", ".join(changes))
+
+
+def create_instance(instance: str, api_url: str) -> flask.Flask:
+    """
+    Populates an instance's local cache from the stub API and creates its app, with per-request timing logs
+    silenced. Must be called from a temporary working directory, where the local cache is written to data/.
+
+    Args:
+        instance (str): The instance's directory under deploy/.
+        api_url (str): URL of the stub API.
+
+    Returns:
+        flask.Flask: The instance's app.
+    """
+    config_path = os.path.abspath("config.ini")
+    shutil.copyfile(os.path.join(ROOT, "deploy", instance, "config.ini"), config_path)
+    os.makedirs("data", exist_ok=True)
+    with contextlib.redirect_stdout(None):
+        populate_database.main(config_path=config_path, api_url=api_url)
+
+    app = create_app(config_path=config_path, api=api_url, populating=True)
+    app.logger.getChild("timing").setLevel(logging.WARNING)
+    return app
+
+
+def get_commit() -> str | None:
+    """
+    Returns the commit the working tree is checked out at.
+
+    Returns:
+        str | None: The abbreviated commit hash, suffixed with `-dirty` if there are uncommitted changes, or None if
+            git is unavailable.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def get_urls(app: flask.Flask) -> dict[str, list[str]]:
+    """
+    Lists URLs for every route of the browser: the pages exported by app.export_static, along with searches,
+    server-side tables, raw statement records, and status endpoints.
+
+    Args:
+        app (flask.Flask): The app to benchmark.
+
+    Returns:
+        dict[str, list[str]]: URLs by route, e.g. /genes/<gene_symbol>.
+    """
+    with app.test_request_context():
+        urls = export_static.get_urls()
+        genes = requests.Local.get_genes()
+        therapies = requests.Local.get_therapies()
+        statements = requests.Local.get_table(table="statements", length=5)["data"]
+        urls += [flask.url_for("main.search", gene=gene["name"]) for gene in genes[:5]]
+        urls += [flask.url_for("main.search", therapy=therapy["name"]) for therapy in therapies[:5]]
+        urls += [flask.url_for("main.search", q="GENE"), flask.url_for("main.search", page=2)]
+        for table in requests.Local.TABLES:
+            urls.append(flask.url_for("main.tables", table=table, draw=1, start=0, length=25))
+            urls.append(flask.url_for("main.tables", table=table, draw=1, start=0, length=25, **{"search[value]": "a"}))
+        urls += [flask.url_for("main.statements_raw", statement_id=record["id"]) for record in statements]
+        urls += [flask.url_for("main.status_caches"), flask.url_for("main.export_metrics")]
+
+    adapter = app.url_map.bind("localhost")
+    by_route = {}
+    for url in dict.fromkeys(urls):
+        rule, arguments = adapter.match(urllib.parse.unquote(urllib.parse.urlsplit(url).path), return_rule=True)
+        by_route.setdefault(rule.rule, []).append(url)
+    return by_route
+
+
+def main(instances: list[str], iterations: int = 20, samples: int = 5, fixture: str | None = None,
+         scale: float = 1) -> dict:
+    """
+    Benchmarks the routes of each instance against the stub API.
+
+    Args:
+        instances (list[str]): Instances under deploy/ to benchmark.
+        iterations (int): Times each sampled URL is requested to measure latency.
+        samples (int): Maximum URLs requested per route.
+        fixture (str | None): A fixture recorded with `python -m benchmarks.stub_api record` or written by
+            `python -m benchmarks.fixtures`, or None to generate statements.
+        scale (float): The size of the knowledgebase to generate relative to the default instance's cache, if no
+            fixture is given.
+
+    Returns:
+        dict: The run's settings and results by instance.
+    """
+    statements, about = stub_api.load_fixture(path=fixture, scale=scale)
+    server = stub_api.serve(api=stub_api.StubAPI(statements=statements, about=about))
+    api_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = {
+        "commit": get_commit(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "fixture": os.path.basename(fixture) if fixture else None,
+        "scale": None if fixture else scale,
+        "statements": len(statements),
+        "iterations": iterations,
+        "samples": samples,
+        "instances": {},
+    }
+    working_directory = os.getcwd()
+    try:
+        for instance in instances:
+            with tempfile.TemporaryDirectory() as directory:
+                os.chdir(directory)
+                try:
+                    results["instances"][instance] = benchmark_instance(
+                        instance=instance, api_url=api_url, iterations=iterations, samples=samples
+                    )
+                finally:
+                    os.chdir(working_directory)
+    finally:
+        server.shutdown()
+    return results
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Computes a percentile with the nearest-rank method.
+
+    Args:
+        values (list[float]): The values, in any order.
+        q (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile.
+    """
+    ordered = sorted(values)
+    rank = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def request(client, url: str) -> float:
+    """
+    Requests a URL and reads its whole response, including streamed responses.
+
+    Args:
+        client (flask.testing.FlaskClient): The test client.
+        url (str): The URL to request.
+
+    Returns:
+        float: The time taken in seconds.
+
+    Raises:
+        RuntimeError: If the response's status code is not 200.
+    """
+    start = time.perf_counter()
+    response = client.get(url)
+    response.get_data()
+    response.close()
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"{url} returned {response.status_code}")
+    return elapsed
+
+
+def sample(urls: list[str], count: int) -> list[str]:
+    """
+    Selects up to `count` URLs, evenly spaced so that samples do not all come from the start of a list.
+
+    Args:
+        urls (list[str]): The URLs of a route.
+        count (int): The number of URLs to select.
+
+    Returns:
+        list[str]: The selected URLs.
+    """
+    if len(urls) <= count:
+        return urls
+    step = len(urls) / count
+    return [urls[int(index * step)] for index in range(count)]
+
+
+def summarize(durations: list[float], cold: list[float], allocations: list[int]) -> dict:
+    """
+    Summarizes the measurements of a route.
+
+    Args:
+        durations (list[float]): Latencies of warm requests, in seconds.
+        cold (list[float]): Latencies of the first request to each URL, in seconds.
+        allocations (list[int]): Peak memory allocated by each request, in bytes.
+
+    Returns:
+        dict: Request count, latency percentiles and mean in milliseconds, throughput of a single client in requests
+            per second, and mean peak allocation in KiB.
+    """
+    return {
+        "requests": len(durations),
+        "p50_ms": round(percentile(durations, 50) * 1000, 3),
+        "p95_ms": round(percentile(durations, 95) * 1000, 3),
+        "p99_ms": round(percentile(durations, 99) * 1000, 3),
+        "mean_ms": round(sum(durations) / len(durations) * 1000, 3),
+        "cold_ms": round(sum(cold) / len(cold) * 1000, 3),
+        "throughput_rps": round(len(durations) / sum(durations), 1),
+        "allocated_kib": round(sum(allocations) / len(allocations) / 1024, 1),
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        prog="Benchmark browser routes",
+        description="Measure the latency, throughput, and allocations of every route against a stub API",
+    )
+    arg_parser.add_argument(
+        "-i", "--instance", action="append", choices=INSTANCES, help="Instance to benchmark, defaults to all"
+    )
+    arg_parser.add_argument("--iterations", type=int, default=20, help="Times each sampled URL is requested")
+    arg_parser.add_argument("--samples", type=int, default=5, help="Maximum URLs requested per route")
+    arg_parser.add_argument("--fixture", default=None, help="Fixture from benchmarks.stub_api or benchmarks.fixtures")
+    arg_parser.add_argument(
+        "--scale", type=float, default=1, help="Size of the knowledgebase to generate without a fixture"
+    )
+    arg_parser.add_argument("--output", default=None, help="Path to write results to")
+    arg_parser.add_argument("--compare", default=None, help="Results of a previous run to compare against")
+    args = arg_parser.parse_args()
+
+    run = main(
+        instances=args.instance or list(INSTANCES),
+        iterations=args.iterations,
+        samples=args.samples,
+        fixture=args.fixture,
+        scale=args.scale,
+    )
+    for name, instance_results in run["instances"].items():
+        print(f"{name}")
+        for route, summary in list(instance_results["routes"].items()) + [("all", instance_results["all"])]:
+            print(
+                f"  {route:<48} p50 {summary['p50_ms']:8.2f} ms  p95 {summary['p95_ms']:8.2f} ms  "
+                f"p99 {summary['p99_ms']:8.2f} ms  {summary['throughput_rps']:8.1f} req/s  "
+                f"{summary['allocated_kib']:8.1f} KiB"
+            )
+
+    output = args.output or os.path.join(RESULTS, f"routes-{run['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fp:
+        json.dump(run, fp, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as fp:
+            compare(results=run, baseline=json.load(fp))
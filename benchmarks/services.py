@@ -0,0 +1,237 @@
+"""
+services.py
+
+Micro-benchmarks for the transformation functions in app/blueprints/main/services.py that run on every request to
+the list, detail, and search pages.
+
+Usage:
+    python -m benchmarks.services [--scale 0.1 --scale 1 --scale 10] [--min-time 0.5] [--output results.json]
+        [--compare baseline.json] [--save-baseline] [--tolerance 0.2]
+
+Each function is called with fixed inputs built from benchmarks.fixtures at each scale, relative to the default
+instance's cache, until it has run for at least `min-time` seconds. Results record calls per second, the median and
+fastest call, and the peak memory allocated by a call, and are written as JSON, by default to
+benchmarks/results/services-<commit>.json.
+
+Results are compared with benchmarks/results/services-baseline.json, if it exists, or with the run given by
+`--compare`. `--save-baseline` stores the run as the baseline. The command exits with status 1 if any function is
+slower than its baseline by more than `tolerance`, so a change's effect on these functions can be checked by saving a
+baseline before the change and running again after it, on the same machine.
+
+Functions that simplify propositions memoize them by id for the rest of a release. These are measured both with the
+memo cleared before each call, as for the first request of a release, and with it filled, as for later requests.
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from app.blueprints.main import services
+from benchmarks import fixtures
+from benchmarks import routes
+
+BASELINE = os.path.join(routes.RESULTS, "services-baseline.json")
+SCALES = (0.1, 1, 10)
+
+
+def benchmark(function, setup, min_time: float) -> dict:
+    """
+    Times calls of a function until they add up to at least `min_time` seconds, and measures the memory allocated
+    by one call.
+
+    Args:
+        function (callable): Called without arguments.
+        setup (callable | None): Called without arguments before each call of `function`, outside of the timing.
+        min_time (float): The minimum total time of timed calls, in seconds.
+
+    Returns:
+        dict: Calls timed, calls per second, median and fastest call in microseconds, and peak allocation in KiB.
+    """
+    durations = []
+    while sum(durations) < min_time or len(durations) < 5:
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+
+    median = statistics.median(durations)
+    return {
+        "calls": len(durations),
+        "ops_per_sec": round(1 / median, 1),
+        "median_us": round(median * 1e6, 2),
+        "min_us": round(min(durations) * 1e6, 2),
+        "allocated_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Prints the change in calls per second of each case from a previous run.
+
+    Args:
+        results (dict): Results of this run.
+        baseline (dict): Results of a previous run.
+        tolerance (float): The fraction by which a case may slow down before it is reported as a regression.
+
+    Returns:
+        list[str]: Cases that are slower than in the previous run by more than `tolerance`.
+    """
+    print(f"\nCompared to {baseline.get('commit')} ({baseline.get('created')}):")
+    regressions = []
+    for case, current in results["cases"].items():
+        before = baseline.get("cases", {}).get(case)
+        if before is None:
+            continue
+        change = current["ops_per_sec"] / before["ops_per_sec"] - 1
+        regressed = change < -tolerance
+        if regressed:
+            regressions.append(case)
+        print(
+            f"  {case:<64} {before['ops_per_sec']:>12.1f} -> {current['ops_per_sec']:>12.1f} ops/s ({change:+.0%})"
+            f"{'  slower' if regressed else ''}"
+        )
+    return regressions
+
+
+def get_cases(scale: float) -> dict:
+    """
+    Builds the calls to benchmark at a scale, with inputs shaped as routes pass them.
+
+    Args:
+        scale (float): The size of the inputs relative to the default instance's cache.
+
+    Returns:
+        dict: The function to time and the setup to run before each call, by case name.
+    """
+    statements = fixtures.make_statements(count=max(round(fixtures.BASE_COUNT * scale), 1))
+    search_results = fixtures.make_search_results(statements=statements)
+    services.simplified_propositions.clear()
+    categorized = services.process_propositions(records=search_results)
+    propositions = [record for records in categorized.values() for record in records]
+
+    indications = list({statement["indication"]["id"]: statement["indication"] for statement in statements}.values())
+    indication_records = [dict(indication) for indication in indications]
+    cached_indications = [
+        {"id": indication["id"], "statements_count": index % 7 + 1} for index, indication in enumerate(indications)
+    ]
+
+    def clear():
+        services.simplified_propositions.clear()
+
+    def fill():
+        if not len(services.simplified_propositions):
+            services.simplify_proposition_records(records=search_results)
+
+    suffix = f"[{scale:g}x]"
+    return {
+        f"append_field_from_matching_records{suffix}": (
+            lambda: services.append_field_from_matching_records(
+                target_list=indication_records,
+                source_list=cached_indications,
+                source_field="statements_count",
+                new_field_name="statements_count",
+            ),
+            None,
+        ),
+        f"extract_organizations{suffix}": (
+            lambda: services.extract_organizations(propositions=categorized),
+            None,
+        ),
+        f"filter_search_results_required_organization{suffix}": (
+            lambda: services.filter_search_results_required_organization(records=propositions, organization_id="fda"),
+            None,
+        ),
+        f"process_propositions{suffix}": (lambda: services.process_propositions(records=search_results), clear),
+        f"process_propositions, memoized{suffix}": (
+            lambda: services.process_propositions(records=search_results), fill
+        ),
+        f"process_statements{suffix}": (lambda: services.process_statements(records=statements), clear),
+        f"process_statements, memoized{suffix}": (lambda: services.process_statements(records=statements), fill),
+    }
+
+
+def main(scales: list[float], min_time: float = 0.5) -> dict:
+    """
+    Benchmarks each case at each scale.
+
+    Args:
+        scales (list[float]): Sizes of the inputs relative to the default instance's cache.
+        min_time (float): The minimum total time of timed calls per case, in seconds.
+
+    Returns:
+        dict: The run's settings and results by case.
+    """
+    results = {
+        "commit": routes.get_commit(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "min_time": min_time,
+        "cases": {},
+    }
+    for scale in scales:
+        for case, (function, setup) in get_cases(scale=scale).items():
+            services.simplified_propositions.clear()
+            results["cases"][case] = benchmark(function=function, setup=setup, min_time=min_time)
+            summary = results["cases"][case]
+            print(
+                f"{case:<64} {summary['ops_per_sec']:>12.1f} ops/s  median {summary['median_us']:>12.2f} us  "
+                f"{summary['allocated_kib']:>10.1f} KiB"
+            )
+    services.simplified_propositions.clear()
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        prog="Benchmark services",
+        description="Measure the calls per second and allocations of service functions against a baseline",
+    )
+    arg_parser.add_argument(
+        "--scale", type=float, action="append", help=f"Size of inputs relative to the default cache, default {SCALES}"
+    )
+    arg_parser.add_argument("--min-time", type=float, default=0.5, help="Minimum seconds of timed calls per case")
+    arg_parser.add_argument("--output", default=None, help="Path to write results to")
+    arg_parser.add_argument("--compare", default=None, help=f"Results to compare against, defaults to {BASELINE}")
+    arg_parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    arg_parser.add_argument("--tolerance", type=float, default=0.2, help="Slowdown reported as a regression")
+    args = arg_parser.parse_args()
+
+    run = main(scales=args.scale or list(SCALES), min_time=args.min_time)
+
+    output = args.output or os.path.join(routes.RESULTS, f"services-{run['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fp:
+        json.dump(run, fp, indent=2)
+    print(f"Wrote {output}")
+
+    compare_path = args.compare or (BASELINE if os.path.exists(BASELINE) and not args.save_baseline else None)
+    regressions = []
+    if compare_path:
+        with open(compare_path) as fp:
+            regressions = compare(results=run, baseline=json.load(fp), tolerance=args.tolerance)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, "w") as fp:
+            json.dump(run, fp, indent=2)
+        print(f"Saved baseline to {BASELINE}")
+
+    if regressions:
+        sys.exit(1)
@@ -0,0 +1,257 @@
+"""
+stub_api.py
+
+A local stand-in for the Molecular Oncology Almanac API, serving the endpoints the browser uses from a fixed set of
+statements, so that benchmarks measure the browser rather than the network or the API.
+
+Usage:
+    python -m benchmarks.stub_api serve [--port 8000] [--fixture fixture.json] [--scale 1]
+    python -m benchmarks.stub_api record --output fixture.json [--api https://api.moalmanac.org]
+
+`serve` answers /about, /agents, /search, and the entity endpoints by filtering the statements with the same query
+parameters the API accepts. Statements are read from a fixture recorded with `record` or written by
+benchmarks.fixtures, or generated at `--scale` times the size of the default instance's cache if no fixture is
+given. With port 8000, the browser can be run against the stub with `python run.py --api http://localhost:8000`.
+"""
+
+import argparse
+import http.server
+import json
+import threading
+import urllib.parse
+
+import requests
+
+from benchmarks import fixtures
+
+# Query parameters accepted by the API, and the values of a statement that each one matches
+FILTERS = {
+    "agent_id": lambda statement: {fixtures.get_agent(document=statement["indication"]["document"])["id"]},
+    "biomarker": lambda statement: {biomarker["name"] for biomarker in statement["proposition"]["biomarkers"]},
+    "disease": lambda statement: {statement["proposition"]["conditionQualifier"]["name"]},
+    "document": lambda statement: {document["id"] for document in statement["reportedIn"]},
+    "gene": lambda statement: {gene["name"] for gene in get_genes(statement=statement)},
+    "indication": lambda statement: {statement["indication"]["id"]},
+    "proposition_id": lambda statement: {str(statement["proposition"]["id"])},
+    "statement_id": lambda statement: {str(statement["id"])},
+    "therapy": lambda statement: {therapy["name"] for therapy in get_therapies(statement=statement)},
+}
+FILTER_ALIASES = {
+    "biomarker_name": "biomarker",
+    "disease_name": "disease",
+    "document_id": "document",
+    "gene_name": "gene",
+    "indication_id": "indication",
+    "therapy_name": "therapy",
+}
+
+# Entity endpoints: the records of each statement they list, the field records are identified by, and the filter
+# that selects a single record
+ENDPOINTS = {
+    "agents": (
+        lambda statement: [fixtures.get_agent(document=statement["indication"]["document"])], "id", "agent_id"
+    ),
+    "biomarkers": (lambda statement: statement["proposition"]["biomarkers"], "name", "biomarker"),
+    "diseases": (lambda statement: [statement["proposition"]["conditionQualifier"]], "name", "disease"),
+    "documents": (lambda statement: statement["reportedIn"], "id", "document"),
+    "genes": (lambda statement: get_genes(statement=statement), "name", "gene"),
+    "indications": (lambda statement: [statement["indication"]], "id", "indication"),
+    "propositions": (lambda statement: [statement["proposition"]], "id", "proposition_id"),
+    "statements": (lambda statement: [statement], "id", "statement_id"),
+    "therapies": (lambda statement: get_therapies(statement=statement), "name", "therapy"),
+}
+
+
+class StubAPI:
+    """
+    Answers requests for MOAlmanac API endpoints from a list of statements.
+    """
+
+    def __init__(self, statements: list[dict], about: dict):
+        """
+        Initializes the StubAPI class.
+
+        Args:
+            statements (list[dict]): Statement records, as returned by the API's /statements endpoint.
+            about (dict): The service record returned by the API's /about endpoint.
+        """
+        self.statements = statements
+        self.about = about
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def get(self, target: str) -> tuple[int, bytes]:
+        """
+        Answers a request, reusing the serialized response to previous requests for the same target.
+
+        Args:
+            target (str): The request's path and query string, e.g. /genes?gene_name=BRAF.
+
+        Returns:
+            tuple[int, bytes]: The response's status code and JSON body.
+        """
+        with self._lock:
+            cached = self._responses.get(target)
+        if cached is None:
+            status_code, payload = self.handle(target=target)
+            cached = (status_code, json.dumps(payload).encode())
+            with self._lock:
+                self._responses[target] = cached
+        return cached
+
+    def handle(self, target: str) -> tuple[int, dict]:
+        """
+        Answers a request.
+
+        Args:
+            target (str): The request's path and query string.
+
+        Returns:
+            tuple[int, dict]: The response's status code and payload.
+        """
+        parsed = urllib.parse.urlsplit(target)
+        endpoint = parsed.path.strip("/")
+        filters = {}
+        for key, value in urllib.parse.parse_qsl(parsed.query):
+            key = FILTER_ALIASES.get(key, key)
+            if key in FILTERS:
+                filters.setdefault(key, set()).add(value)
+
+        if endpoint == "about":
+            return 200, {"service": self.about}
+
+        statements = [
+            statement
+            for statement in self.statements
+            if all(FILTERS[key](statement) & values for key, values in filters.items())
+        ]
+        if endpoint == "search":
+            return 200, {"data": fixtures.make_search_results(statements=statements)}
+        if endpoint not in ENDPOINTS:
+            return 404, {"detail": "Not Found"}
+
+        get_records, field, own_filter = ENDPOINTS[endpoint]
+        records = {}
+        for statement in statements:
+            for record in get_records(statement):
+                records.setdefault(record[field], record)
+        data = list(records.values())
+        if own_filter in filters:
+            data = [record for record in data if str(record[field]) in filters[own_filter]]
+            if not data:
+                return 404, {"detail": f"No {endpoint} found for {own_filter}"}
+        return 200, {"data": data}
+
+
+def get_genes(statement: dict) -> list[dict]:
+    return [gene for biomarker in statement["proposition"]["biomarkers"] for gene in biomarker.get("genes", [])]
+
+
+def get_therapies(statement: dict) -> list[dict]:
+    therapeutic = statement["proposition"]["objectTherapeutic"]
+    return therapeutic.get("therapies", [therapeutic])
+
+
+def load_fixture(path: str | None = None, scale: float = 1, seed: int = 0) -> tuple[list[dict], dict]:
+    """
+    Loads the statements and service record served by the stub.
+
+    Args:
+        path (str | None): A fixture recorded with `record` or written by benchmarks.fixtures. If None, statements
+            are generated.
+        scale (float): The size of the knowledgebase to generate relative to the default instance's cache, if no
+            fixture is given.
+        seed (int): The seed used to generate statements, if no fixture is given.
+
+    Returns:
+        tuple[list[dict], dict]: The statements and the service record.
+    """
+    if path is not None:
+        with open(path) as fp:
+            fixture = json.load(fp)
+    else:
+        fixture = fixtures.make_fixture(scale=scale, seed=seed)
+    return fixture["statements"], fixture["about"]
+
+
+def record(api_url: str, output: str):
+    """
+    Saves the statements and service record of a running API as a fixture.
+
+    Args:
+        api_url (str): URL of the MOAlmanac API.
+        output (str): Path to write the fixture to.
+    """
+    about = requests.get(f"{api_url}/about", timeout=60)
+    about.raise_for_status()
+    statements = requests.get(f"{api_url}/statements", timeout=300)
+    statements.raise_for_status()
+    with open(output, "w") as fp:
+        json.dump({"about": about.json()["service"], "statements": statements.json()["data"]}, fp)
+
+
+def serve(api: StubAPI, host: str = "127.0.0.1", port: int = 0) -> http.server.ThreadingHTTPServer:
+    """
+    Serves a stub API from a background thread.
+
+    Args:
+        api (StubAPI): The stub to serve.
+        host (str): The address to listen on.
+        port (int): The port to listen on, or 0 for any free port.
+
+    Returns:
+        http.server.ThreadingHTTPServer: The running server. Its URL is `http://{host}:{server.server_port}`, and it
+            is stopped with `server.shutdown()`.
+    """
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            status_code, body = api.get(target=self.path)
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        prog="MOAlmanac API stub",
+        description="Serve the MOAlmanac API endpoints used by the browser from fixture statements",
+    )
+    subparsers = arg_parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="Serve the stub API")
+    serve_parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    serve_parser.add_argument("--fixture", default=None, help="Fixture recorded with `record`")
+    serve_parser.add_argument(
+        "--scale", type=float, default=1, help="Size of the knowledgebase to generate without a fixture"
+    )
+    record_parser = subparsers.add_parser("record", help="Record a fixture from a running API")
+    record_parser.add_argument(
+        "--api",
+        choices=["http://localhost:8000", "https://api.moalmanac.org"],
+        default="https://api.moalmanac.org",
+        help="URL for the MOAlmanac API",
+    )
+    record_parser.add_argument("--output", required=True, help="Path to write the fixture to")
+    args = arg_parser.parse_args()
+
+    if args.command == "record":
+        record(api_url=args.api, output=args.output)
+    else:
+        statements, about = load_fixture(path=args.fixture, scale=args.scale)
+        server = serve(api=StubAPI(statements=statements, about=about), port=args.port)
+        print(f"Serving {len(statements)} statements at http://127.0.0.1:{server.server_port}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
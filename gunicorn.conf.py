@@ -0,0 +1,17 @@
+"""
+gunicorn.conf.py
+
+Gunicorn settings read when gunicorn is started from this directory, as the systemd service does.
+"""
+
+import os
+
+
+def child_exit(server, worker):
+    """
+    Removes the metrics files of a worker that has exited, so /metrics no longer reports its gauges.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
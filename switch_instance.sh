@@ -19,6 +19,7 @@ if [[ ! " ${VALID_INSTANCES[*]} " =~ " ${INSTANCE} " ]]; then
 fi
 
 ln -sf "cache-$INSTANCE.sqlite3" data/cache.sqlite3
+ln -sfn "static-$INSTANCE" data/static
 ln -sf "deploy/$INSTANCE/config.ini" config.ini
 ln -sf "../deploy/$INSTANCE/nginx.conf" service/moalmanac-browser
 ln -sf "../deploy/$INSTANCE/secure-application.sh" service/secure-application.sh